@@ -1,17 +1,93 @@
-import yt_dlp
-import whisper
-import ollama
+import cliente_ollama
+import prompts
+import telemetria
 import cv2
+import numpy as np
 import os
-import shutil
 import time
+import threading
+import json
+import re
+import shutil
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TempoEsgotado
+from registro_modelos import obter_modelo_whisper
+import transcricao
+from pastas_trabalho import pasta_trabalho, verificar_cota, LIMITE_POR_JOB_MB
+import cache_resultados as cache
+from amostragem_frames import (amostrar_frames, selecionar_cenas, selecionar_cenas_de_frames, redimensionar,
+                               codificar_imagem, PONTOS_PADRAO, ORCAMENTO_CHAMADAS_VISAO, FORMATO_IMAGEM)
+from plano_formatos import LARGURA_VIDEO
+import baixador
+from streaming_midia import resolver_stream, iterar_audio, iterar_frames, escolher_pontos, TAXA_AUDIO
+from regras_rapidas import compilar_regras, avaliar_texto, padroes_relevantes, indicios_para_juiz
+from empacotar_evidencias import empacotar, ORCAMENTO_TOKENS_EVIDENCIAS
+from vad_audio import carregar_audio, transcrever_com_vad, registrar_metricas, FILTRAR_MUSICA
 
 # --- CONFIGURAÇÕES DO SISTEMA ---
-PASTA_TEMP = "temp_moderacao_unificada"
-MODELO_AUDIO = "medium"           # Whisper (Ouvido)
+# Cada análise roda na sua própria pasta (ver pastas_trabalho.py)
+MODELO_AUDIO = "medium"           # Whisper (Ouvido) — motor escolhido em transcricao.py
 MODELO_VISAO = "llama3.2-vision"  # Llama Vision (Olhos)
 MODELO_JUIZ = "llama3.1"          # Llama (Cérebro)
 
+# Como escolher os frames para o modelo de visão:
+#   "cenas"  -> adaptativo, por troca de cena, até ORCAMENTO_CHAMADAS_VISAO frames
+#   "pontos" -> fixo em 15% / 50% / 85% do vídeo
+MODO_AMOSTRAGEM = "cenas"
+
+# Como enviar os frames ao modelo de visão (pode ser trocado por requisição):
+#   "individual" -> uma chamada por frame
+#   "lote"       -> todos os frames numa chamada
+#   "mosaico"    -> grade numerada com timestamps numa imagem só
+MODO_VISAO = "individual"
+MODOS_VISAO = ("individual", "lote", "mosaico")
+LARGURA_MOSAICO = 480  # Largura de cada quadro dentro do mosaico
+COLUNAS_MOSAICO = 2
+# Grava os frames enviados ao modelo na pasta do job (só para depuração)
+SALVAR_FRAMES_DEBUG = False
+
+# Analisar enquanto baixa (áudio em blocos pelo ffmpeg, frames conforme chegam).
+# Se o link não permitir, cai automaticamente no download completo.
+USAR_STREAMING = False
+
+# Baixar áudio e vídeo separados, no menor tamanho útil (ver plano_formatos.py)
+USAR_PLANO_FORMATOS = True
+
+# Aceitar links file:// (mídia local, sem yt-dlp). Só para benchmarks e testes:
+# ligado na API, qualquer arquivo do servidor poderia ser lido
+ACEITAR_ARQUIVOS_LOCAIS = False
+
+# Detecção de voz antes do Whisper: transcreve só os trechos com fala
+USAR_VAD = True
+SEM_FALA = "(Sem fala detectada no áudio)"
+
+# Regras rápidas (regex + classificador de texto) sobre a transcrição: se já houver
+# violação clara, o veredito sai na hora e a visão/juiz são pulados
+SAIDA_ANTECIPADA = True
+
+# Veredito do juiz: "json" (saída restrita ao ESQUEMA_VEREDITO) ou "texto" (STATUS/MOTIVO livre)
+FORMATO_VEREDITO = "json"
+MAX_TOKENS_JUIZ = 200  # Teto de geração do juiz; o motivo é curto de propósito
+ESQUEMA_VEREDITO = {
+    "type": "object",
+    "properties": {
+        "status": {"type": "string", "enum": ["APROVADO", "REPROVADO"]},
+        "regras_violadas": {"type": "array", "items": {"type": "integer"}},
+        "evidencias": {"type": "array", "items": {"type": "string"}},
+        "confianca": {"type": "number", "minimum": 0, "maximum": 1},
+        "motivo": {"type": "string"},
+    },
+    "required": ["status", "regras_violadas", "evidencias", "confianca", "motivo"],
+}
+
+# Etapas que contam como progresso do job; os demais eventos ("frame", "token") são parciais
+ETAPAS_PIPELINE = ("download", "transcricao", "analise_visual", "veredito")
+
+# Tempo máximo de cada ramo (áudio e visão rodam em paralelo)
+TIMEOUT_AUDIO_S = 600
+TIMEOUT_VISUAL_S = 600
+
 # --- REGRAS DO CLIENTE (SEU DASHBOARD) ---
 REGRAS_COMPETICAO = """
 1. PROIBIDO: Conteúdo sobre "ficar rico fácil", "ganância", "urubu do pix" ou promessas financeiras.
@@ -20,163 +96,647 @@ REGRAS_COMPETICAO = """
 4. PERMITIDO: Conteúdo motivacional, esportes, academia e humor saudável.
 """
 
-def limpar_ambiente():
-    """Remove a pasta temporária para começar limpo."""
-    if os.path.exists(PASTA_TEMP):
-        shutil.rmtree(PASTA_TEMP)
-    os.makedirs(PASTA_TEMP)
-
-def baixar_midia_unica(url):
+def baixar_midia(url, pasta, metricas):
     """
-    Baixa o arquivo MP4 uma única vez. 
-    Serve tanto para o áudio quanto para o vídeo.
+    Entrega a mídia do job na pasta, pelo serviço de download (ver baixador.py:
+    armazém compartilhado, downloads iguais juntados, limites por site).
+    Com USAR_PLANO_FORMATOS, busca o menor áudio e o vídeo no tamanho da análise
+    (ver plano_formatos.py); se o plano falhar, cai no MP4 único.
+    Retorna {"audio": caminho, "video": caminho, ...} ou None.
     """
-    print(f"📥 Baixando mídia completa (Áudio + Vídeo)...")
-    caminho_saida = os.path.join(PASTA_TEMP, "midia_analise")
-    
-    # Detecção automática de Cookies
-    cookies = None
-    if "tiktok.com" in url: cookies = "cookies_tiktok.txt"
-    elif "instagram.com" in url: cookies = "cookies_instagram.txt"
-    
-    if cookies and not os.path.exists(cookies): 
-        print(f"⚠️  Aviso: Arquivo de cookies '{cookies}' não encontrado.")
-        cookies = None
-
-    # Configuração para baixar MP4 de qualidade média (bom para OCR, leve para baixar)
-    opcoes = {
-        'format': 'best[ext=mp4]', 
-        'outtmpl': f"{caminho_saida}.%(ext)s",
-        'quiet': True, 'no_warnings': True, 'nocheckcertificate': True,
-        'http_headers': {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0.4472.124 Safari/537.36'},
-        'cookiefile': cookies,
-    }
+    with telemetria.span("download", metricas) as s:
+        midia = _baixar_midia(url, pasta, metricas)
+        s["bytes"] = metricas.get("download_bytes", 0)
+        s["origem"] = metricas.get("download_origem")
+        s["ok"] = midia is not None
+    if s["origem"] not in ("armazem", "compartilhado"):  # Só o que passou pela rede
+        telemetria.contar("download_bytes_total", s["bytes"])
+    return midia
+
+def copiar_midia_local(url, pasta):
+    """Copia o arquivo de um link file:// para a pasta do job (mesmo caminho que um download)."""
+    origem = url2pathname(urlsplit(url).path)
+    if not os.path.isfile(origem):
+        print(f"❌ Arquivo local não encontrado: {origem}")
+        return None
+    destino = os.path.join(pasta, "midia_analise" + os.path.splitext(origem)[1])
+    shutil.copyfile(origem, destino)
+    verificar_cota(pasta)
+    return destino
 
+def _baixar_midia(url, pasta, metricas):
+    if url.startswith("file://"):
+        if not ACEITAR_ARQUIVOS_LOCAIS:
+            print("❌ Links file:// estão desligados (ACEITAR_ARQUIVOS_LOCAIS).")
+            return None
+        arquivo = copiar_midia_local(url, pasta)
+        if not arquivo:
+            return None
+        metricas["download_bytes"] = os.path.getsize(arquivo)
+        return {"audio": arquivo, "video": arquivo}
+
+    if USAR_PLANO_FORMATOS:
+        print(f"📥 Buscando mídia pelo plano de formatos (áudio leve + vídeo {LARGURA_VIDEO}px)...")
+        formato = None
+    else:
+        print("📥 Buscando mídia completa (Áudio + Vídeo)...")
+        formato = baixador.FORMATO_UNICO
     try:
-        with yt_dlp.YoutubeDL(opcoes) as ydl:
-            ydl.download([url])
-        
-        arquivo_final = f"{caminho_saida}.mp4"
-        if os.path.exists(arquivo_final):
-            return arquivo_final
+        midia = baixador.baixar_para(url, pasta, formato, limite_bytes=LIMITE_POR_JOB_MB * 1024 * 1024)
+        verificar_cota(pasta)
     except Exception as e:
         print(f"❌ Erro download: {e}")
-    
-    return None
+        return None
+    metricas["download_bytes"] = midia["bytes"]
+    metricas["download_origem"] = midia["origem"]  # download, armazem ou compartilhado
+    if midia["formatos"]:
+        metricas["formatos"] = midia["formatos"]
+    return midia
 
-def processar_audio(caminho_mp4):
-    """Usa o Whisper para transcrever o áudio do MP4."""
+def processar_audio(caminho_mp4, metricas=None):
+    """Usa o Whisper para transcrever o áudio do arquivo (MP4 ou só áudio)."""
     print("👂 [1/3] Whisper ouvindo o arquivo...")
     try:
-        model = whisper.load_model(MODELO_AUDIO)
-        # O Whisper aceita MP4 direto e extrai o áudio internamente
-        result = model.transcribe(caminho_mp4, language="pt", fp16=False)
-        return result["text"].strip()
+        # O modelo fica carregado no registro entre uma requisição e outra
+        with telemetria.span("carga_modelo", metricas, modelo=MODELO_AUDIO) as s:
+            model, economia = obter_modelo_whisper(MODELO_AUDIO)
+            s["reaproveitado"] = economia > 0
+        if metricas is not None:
+            metricas["whisper_tempo_economizado_s"] = round(economia, 2)
+        with telemetria.span("transcricao", metricas, vad=USAR_VAD) as s:
+            if USAR_VAD:
+                # Só os trechos com fala vão para o Whisper (música e silêncio ficam de fora)
+                resultado = transcrever_com_vad(model, carregar_audio(caminho_mp4), language="pt", fp16=False)
+                registrar_metricas(metricas, [resultado])
+                s["audio_s"] = round(resultado["duracao_total_s"], 2)
+                s["fala_s"] = round(resultado["duracao_fala_s"], 2)
+                print(f"   🗣️  Fala em {resultado['duracao_fala_s']:.0f}s de {resultado['duracao_total_s']:.0f}s de áudio.")
+                return resultado["texto"] or SEM_FALA
+            # O Whisper decodifica o arquivo direto para PCM 16 kHz mono (via ffmpeg),
+            # sem passar por MP3
+            result = model.transcribe(caminho_mp4, language="pt", fp16=False)
+            return result["text"].strip()
     except Exception as e:
         return f"Erro na transcrição: {e}"
 
-def processar_frames(caminho_mp4):
-    """Usa o Llama 3.2 Vision para descrever 3 momentos do vídeo."""
-    print("👀 [2/3] Llama 3.2 Vision analisando frames...")
+def _somar_tokens(metricas, resp):
+    if metricas is None:
+        return
+    metricas["visao_chamadas"] = metricas.get("visao_chamadas", 0) + 1
+    metricas["visao_tokens_prompt"] = metricas.get("visao_tokens_prompt", 0) + (resp.get("prompt_eval_count") or 0)
+    metricas["visao_tokens_gerados"] = metricas.get("visao_tokens_gerados", 0) + (resp.get("eval_count") or 0)
+
+def _preparar_imagem(frame, nome, pasta, metricas):
+    """
+    Codifica o frame uma única vez em memória; o ollama recebe os bytes direto.
+    Só grava em disco se SALVAR_FRAMES_DEBUG estiver ligado.
+    """
+    dados, ms = codificar_imagem(frame)
+    if metricas is not None:
+        metricas.setdefault("frames_codificados", []).append(
+            {"nome": nome, "formato": FORMATO_IMAGEM, "bytes": len(dados), "ms": round(ms, 2)}
+        )
+    if SALVAR_FRAMES_DEBUG:
+        extensao = "webp" if FORMATO_IMAGEM == "webp" else "jpg"
+        with open(os.path.join(pasta, f"{nome}.{extensao}"), "wb") as f:
+            f.write(dados)
+    return dados
+
+def montar_mosaico(amostras, largura_quadro=LARGURA_MOSAICO, colunas=COLUNAS_MOSAICO):
+    """Junta os frames numa grade, cada um com a etiqueta '#N  12.3s' no topo."""
+    quadros = []
+    for i, amostra in enumerate(amostras):
+        quadro = redimensionar(amostra["frame"], largura_quadro).copy()
+        etiqueta = f"#{i+1}  {amostra['timestamp_s']:.1f}s"
+        cv2.rectangle(quadro, (0, 0), (largura_quadro, 44), (0, 0, 0), -1)
+        cv2.putText(quadro, etiqueta, (10, 32), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2, cv2.LINE_AA)
+        quadros.append(quadro)
+
+    altura = max(q.shape[0] for q in quadros)
+    quadros = [cv2.copyMakeBorder(q, 0, altura - q.shape[0], 0, 0, cv2.BORDER_CONSTANT) for q in quadros]
+    vazio = np.zeros_like(quadros[0])
+    while len(quadros) % colunas:
+        quadros.append(vazio)
+    linhas = [cv2.hconcat(quadros[i:i + colunas]) for i in range(0, len(quadros), colunas)]
+    return cv2.vconcat(linhas)
+
+def processar_frames(caminho_mp4, pasta, modo_visao=None, metricas=None, cancelar=None, avisar=None):
+    """
+    Usa o Llama 3.2 Vision para descrever os momentos-chave do vídeo.
+
+    modo_visao:
+      "individual" -> uma chamada por frame (padrão antigo)
+      "lote"       -> todos os frames numa única chamada (o modelo precisa aceitar várias imagens)
+      "mosaico"    -> os frames viram uma grade numerada com timestamps, enviada numa chamada só
+    """
+    modo_visao = modo_visao or MODO_VISAO
+    print(f"👀 [2/3] Llama 3.2 Vision analisando frames (modo {modo_visao})...")
     
-    cap = cv2.VideoCapture(caminho_mp4)
-    if not cap.isOpened(): return "Erro ao abrir vídeo."
+    with telemetria.span("selecao_frames", metricas, modo=MODO_AMOSTRAGEM) as s:
+        if MODO_AMOSTRAGEM == "cenas":
+            # Um frame por cena, sem quase-duplicatas, dentro do orçamento de chamadas
+            amostras = selecionar_cenas(caminho_mp4, orcamento=ORCAMENTO_CHAMADAS_VISAO)
+        else:
+            # Uma única passada de decodificação, sem seeks (Início, Meio, Fim)
+            amostras = amostrar_frames(caminho_mp4, modo="pontos", pontos=PONTOS_PADRAO)
+        s["frames"] = len(amostras or [])
+    if not amostras: return "Erro ao abrir vídeo."
+    return descrever_amostras(amostras, pasta, modo_visao, metricas, cancelar, avisar)
 
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    pontos = [0.15, 0.50, 0.85] # Início, Meio, Fim
-    relatorio_visual = []
+def descrever_amostras(amostras, pasta, modo_visao, metricas=None, cancelar=None, avisar=None):
+    """
+    Manda os frames já selecionados ao modelo de visão e monta o relatório.
+    Se o evento `cancelar` for acionado (saída antecipada), para entre uma chamada e outra.
+    Cada descrição pronta é repassada a `avisar("frame", ...)`, se houver.
+    """
+    print(f"   {len(amostras)} frame(s) selecionado(s) para o modelo de visão.")
+    if cancelar is not None and cancelar.is_set():
+        return ""
+
+    if modo_visao in ("lote", "mosaico") and len(amostras) > 1:
+        instantes = ", ".join(f"#{i+1}={a['timestamp_s']:.1f}s" for i, a in enumerate(amostras))
+        if modo_visao == "mosaico":
+            imagens = [_preparar_imagem(montar_mosaico(amostras), "mosaico", pasta, metricas)]
+            origem = "organizados numa grade, com o número e o instante escritos no topo de cada quadro"
+        else:
+            imagens = [
+                _preparar_imagem(redimensionar(amostra["frame"]), f"frame_{i}", pasta, metricas)
+                for i, amostra in enumerate(amostras)
+            ]
+            origem = "enviados como imagens separadas, na ordem"
+
+        mensagens = prompts.montar("visao_agrupado", n=len(amostras), origem=origem)
+        mensagens[-1]['images'] = imagens
+        try:
+            resp = cliente_ollama.chat(
+                MODELO_VISAO,
+                mensagens,
+                opcoes={'temperature': 0.1, 'num_predict': 300 * len(amostras)},
+                metricas=metricas, etapa=f"visao_{modo_visao}",
+            )
+            _somar_tokens(metricas, resp)
+            if avisar:
+                avisar("frame", momentos_s=[a["timestamp_s"] for a in amostras], descricao=resp['message']['content'])
+            return f"--- QUADROS {instantes} ---\n{resp['message']['content']}"
+        except Exception as e:
+            # Se o modelo recusar o agrupamento, cai para uma chamada por frame
+            print(f"⚠️  Modo {modo_visao} falhou ({e}). Voltando para uma chamada por frame.")
 
-    for i, p in enumerate(pontos):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, int(total_frames * p))
-        ret, frame = cap.read()
-        if not ret: continue
+    relatorio_visual = []
 
+    for i, amostra in enumerate(amostras):
+        if cancelar is not None and cancelar.is_set():
+            break
         # --- OTIMIZAÇÃO (Resize 960px) ---
-        altura, largura = frame.shape[:2]
-        nova_largura = 960
-        fator = nova_largura / largura
-        nova_altura = int(altura * fator)
-        frame_redimensionado = cv2.resize(frame, (nova_largura, nova_altura))
-
-        # Salva temporariamente
-        img_path = os.path.join(PASTA_TEMP, f"frame_{i}.jpg")
-        cv2.imwrite(img_path, frame_redimensionado)
-        
-        # --- PROMPT OTIMIZADO (PT-BR) ---
-        prompt = """
-        Atue como um especialista em Moderação de Conteúdo Brasileiro.
-        
-        1. CENA: Descreva quem está na imagem e o que fazem.
-        2. TEXTO: Transcreva TODO texto visível na tela (Título e Legendas). Se não houver, diga "Sem texto".
-        3. ALERTA: Cite se há nudez, violência ou armas.
-        
-        Responda APENAS em Português do Brasil.
-        """
+        frame_redimensionado = redimensionar(amostra["frame"])
+
+        # Codifica em memória (sem passar pelo disco)
+        imagem = _preparar_imagem(frame_redimensionado, f"frame_{i}", pasta, metricas)
         
+        mensagens = prompts.montar("visao_frame")
+        mensagens[-1]['images'] = [imagem]
         try:
-            resp = ollama.chat(
-                model=MODELO_VISAO, 
-                messages=[{'role': 'user', 'content': prompt, 'images': [img_path]}],
-                options={'temperature': 0.1, 'num_predict': 400}
+            resp = cliente_ollama.chat(
+                MODELO_VISAO,
+                mensagens,
+                opcoes={'temperature': 0.1, 'num_predict': 400},
+                metricas=metricas, etapa="visao_frame",
             )
-            relatorio_visual.append(f"--- MOMENTO {int(p*100)}% ---\n{resp['message']['content']}")
-        except:
-            pass
+            _somar_tokens(metricas, resp)
+            if avisar:
+                avisar("frame", momentos_s=[amostra["timestamp_s"]], descricao=resp['message']['content'])
+            relatorio_visual.append(f"--- MOMENTO {amostra['timestamp_s']:.1f}s ---\n{resp['message']['content']}")
+        except Exception as e:
+            # Um frame sem descrição não derruba o relatório; a falha fica em metricas["chamadas_llm"]
+            print(f"⚠️  Frame {amostra['timestamp_s']:.1f}s sem descrição: {e}")
     
-    cap.release()
     return "\n".join(relatorio_visual)
 
-def juiz_final(texto_audio, relatorio_visual):
-    """O Llama 3.1 cruza os dados e dá o veredito."""
+def juiz_final(texto_audio, relatorio_visual, avisar=None, metricas=None):
+    """
+    O Llama 3.1 cruza os dados e dá o veredito.
+    Com `avisar`, a resposta vem em streaming e cada pedaço é repassado como
+    avisar("token", texto=...) enquanto o modelo ainda está gerando.
+    """
     print("⚖️  [3/3] O Juiz (Llama 3.1) está batendo o martelo...")
+    with telemetria.span("juiz", metricas, modelo=MODELO_JUIZ, streaming=avisar is not None):
+        return _julgar_com_modelo(texto_audio, relatorio_visual, avisar, metricas)
+
+def _julgar_com_modelo(texto_audio, relatorio_visual, avisar, metricas):
+    # Palavras-chave que não bastaram para a saída antecipada viram pista para o juiz
+    indicios = indicios_para_juiz(texto_audio, compilar_regras(REGRAS_COMPETICAO)) or "Nenhum"
+    # O prompt do juiz tem tamanho limitado, não importa a duração do vídeo
+    texto_audio, relatorio_visual = empacotar(
+        texto_audio, relatorio_visual, padroes_relevantes(compilar_regras(REGRAS_COMPETICAO)), MODELO_JUIZ, metricas
+    )
     
-    prompt_sistema = f"""
-    Você é o Auditor Chefe de uma competição de vídeos.
-    Sua decisão é final. Analise as evidências abaixo e aplique as regras rigorosamente.
+    # Regras e instruções num prefixo fixo (reaproveitado pelo KV-cache do Ollama); evidências no fim
+    mensagens = prompts.montar(
+        "juiz", regras=REGRAS_COMPETICAO.strip(), formato_resposta=prompts.FORMATOS_RESPOSTA_JUIZ[FORMATO_VEREDITO],
+        texto_audio=texto_audio, relatorio_visual=relatorio_visual, indicios=indicios,
+    )
+    opcoes = {'num_predict': MAX_TOKENS_JUIZ}
+    formato = ESQUEMA_VEREDITO if FORMATO_VEREDITO == "json" else None
+    if avisar is None:
+        res = cliente_ollama.chat(MODELO_JUIZ, mensagens, opcoes, metricas, "juiz", formato)
+        return res['message']['content']
 
-    AS REGRAS:
-    {REGRAS_COMPETICAO}
+    partes = []
+    for texto in cliente_ollama.chat_stream(MODELO_JUIZ, mensagens, opcoes, metricas, "juiz", formato):
+        partes.append(texto)
+        avisar("token", texto=texto)
+    return "".join(partes)
 
-    EVIDÊNCIAS COLETADAS:
-    ---------------------
-    1. TRANSCRIÇÃO (O que foi falado):
-    "{texto_audio}"
-    
-    2. ANÁLISE VISUAL (O que foi visto):
-    {relatorio_visual}
-    ---------------------
+def interpretar_veredito(resposta):
+    """
+    Converte a resposta do juiz em campos: status, regras_violadas, evidencias,
+    confianca e motivo. Aceita o JSON do modo estruturado (mesmo cortado pelo
+    limite de tokens) e, como reserva, o formato antigo "STATUS: ... MOTIVO: ...".
+    """
+    try:
+        dados = json.loads(resposta)
+        status = str(dados.get("status", "")).upper()
+        confianca = dados.get("confianca")
+        return {
+            "status": status if status in ("APROVADO", "REPROVADO") else None,
+            "regras_violadas": [int(r) for r in dados.get("regras_violadas") or [] if str(r).isdigit()],
+            "evidencias": [str(e) for e in dados.get("evidencias") or []],
+            "confianca": min(1.0, max(0.0, float(confianca))) if isinstance(confianca, (int, float)) else None,
+            "motivo": str(dados.get("motivo", "")).strip(),
+        }
+    except (ValueError, AttributeError):
+        cortado = _veredito_json_cortado(resposta)
+        if cortado is not None:
+            return cortado
+        status = re.search(r"STATUS:\s*\[?\s*(APROVADO|REPROVADO)", resposta.upper())
+        motivo = re.search(r"MOTIVO:\s*(.+)", resposta, re.DOTALL)
+        return {
+            "status": status.group(1) if status else None,
+            "regras_violadas": sorted({int(n) for n in re.findall(r"[Rr]egra\s*(\d+)", resposta)}),
+            "evidencias": [],
+            "confianca": None,
+            "motivo": motivo.group(1).strip() if motivo else resposta.strip(),
+        }
 
-    VEREDITO:
-    Baseado nas regras, o vídeo foi APROVADO ou REPROVADO?
-    Responda no seguinte formato:
-    
-    STATUS: [APROVADO / REPROVADO]
-    MOTIVO: [Explicação curta citando a regra violada e a evidência encontrada]
+def _veredito_json_cortado(resposta):
     """
+    JSON do juiz cortado no meio (MAX_TOKENS_JUIZ acabou): aproveita os campos
+    que já chegaram inteiros. None se nem o status chegou.
+    """
+    status = re.search(r'"status"\s*:\s*"(APROVADO|REPROVADO)"', resposta, re.IGNORECASE)
+    if not status:
+        return None
+    regras = re.search(r'"regras_violadas"\s*:\s*\[([^\]]*)', resposta)
+    evidencias = re.search(r'"evidencias"\s*:\s*\[((?:[^\]"]|"(?:[^"\\]|\\.)*")*)', resposta)
+    confianca = re.search(r'"confianca"\s*:\s*([0-9]+(?:\.[0-9]+)?)', resposta)
+    motivo = re.search(r'"motivo"\s*:\s*"((?:[^"\\]|\\.)*)', resposta, re.DOTALL)
+    return {
+        "status": status.group(1).upper(),
+        "regras_violadas": sorted({int(n) for n in re.findall(r"\d+", regras.group(1))}) if regras else [],
+        # Só as evidências com as aspas fechadas
+        "evidencias": [json.loads(f'"{e}"') for e in re.findall(r'"((?:[^"\\]|\\.)*)"', evidencias.group(1))]
+                      if evidencias else [],
+        "confianca": min(1.0, max(0.0, float(confianca.group(1)))) if confianca else None,
+        "motivo": motivo.group(1).replace('\\"', '"').strip() if motivo else "",
+    }
 
-    res = ollama.chat(model=MODELO_JUIZ, messages=[{'role': 'user', 'content': prompt_sistema}])
-    return res['message']['content']
+def _texto_veredito(veredito):
+    """Versão legível (STATUS/MOTIVO) do veredito estruturado."""
+    return f"STATUS: {veredito['status'] or 'INDEFINIDO'}\nMOTIVO: {veredito['motivo']}"
 
-def executar_analise_completa(url_video):
-    limpar_ambiente()
-    print(f"🚀 Iniciando análise via API: {url_video}")
-    
-    arquivo_video = baixar_midia_unica(url_video)
-    
-    if arquivo_video:
-        texto_audio = processar_audio(arquivo_video)
-        analise_visual = processar_frames(arquivo_video)
-        decisao = juiz_final(texto_audio, analise_visual)
-        
-        # Retorna um Dicionário (JSON) limpo
-        return {
-            "status": "sucesso",
-            "audio_transcricao": texto_audio,
-            "analise_visual": analise_visual,
-            "veredito_final": decisao
+def _aguardar_ramo(futuro, nome, prazo, metricas):
+    """Espera um ramo até o prazo. Em caso de erro/timeout devolve um aviso no lugar da evidência."""
+    try:
+        return futuro.result(timeout=max(0, prazo - time.time()))
+    except TempoEsgotado:
+        metricas.setdefault("ramos_com_falha", {})[nome] = "timeout"
+        print(f"⏱️  Ramo '{nome}' estourou o tempo limite.")
+        return f"[Evidência indisponível: {nome} excedeu o tempo limite]"
+    except Exception as e:
+        metricas.setdefault("ramos_com_falha", {})[nome] = str(e)
+        print(f"❌ Ramo '{nome}' falhou: {e}")
+        return f"[Evidência indisponível: falha em {nome}: {e}]"
+
+def _juntar_metricas(metricas, do_ramo):
+    """Soma as métricas de um ramo terminado às do job (listas concatenam, contadores somam)."""
+    for chave, valor in do_ramo.items():
+        atual = metricas.get(chave)
+        if isinstance(atual, list) and isinstance(valor, list):
+            atual.extend(valor)
+        elif isinstance(atual, dict) and isinstance(valor, dict):
+            atual.update(valor)
+        elif (isinstance(atual, (int, float)) and isinstance(valor, (int, float))
+              and not isinstance(atual, bool) and not isinstance(valor, bool)):
+            metricas[chave] = atual + valor
+        else:
+            metricas[chave] = valor
+
+def _rodar_ramos(tarefa_audio, tarefa_visual, metricas, avisar, prontos, cancelar=None):
+    """
+    Roda os dois ramos de evidência em paralelo, cada um com seu prazo.
+    Ramos já presentes em `prontos` (vindos do cache) não são executados.
+
+    Cada tarefa recebe um dict de métricas só seu, juntado às do job apenas
+    se o ramo terminar: um ramo abandonado por timeout continua rodando em
+    segundo plano e não pode mexer no dict que vai para o cache e a resposta.
+
+    Com SAIDA_ANTECIPADA, a transcrição passa pelas regras rápidas assim que
+    fica pronta; se já houver violação clara, o ramo visual é cancelado
+    (via `cancelar`) e não é esperado.
+    Retorna (texto_audio, analise_visual, decisao_rapida ou None).
+    """
+    inicio = time.time()
+    cancelar = cancelar or threading.Event()
+    metricas_audio, metricas_visual = {}, {}
+    with telemetria.span("evidencias", metricas, em_cache=sorted(prontos)):
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ramo")
+        try:
+            fut_audio = None
+            fut_visual = None
+            if "transcricao" not in prontos:
+                fut_audio = executor.submit(tarefa_audio, metricas_audio)
+            if "analise_visual" not in prontos:
+                fut_visual = executor.submit(tarefa_visual, metricas_visual)
+
+            if fut_audio is None:
+                texto_audio = prontos["transcricao"]
+            else:
+                texto_audio = _aguardar_ramo(fut_audio, "transcricao", inicio + TIMEOUT_AUDIO_S, metricas)
+                if fut_audio.done():
+                    _juntar_metricas(metricas, metricas_audio)
+            avisar("transcricao", texto=texto_audio)
+
+            decisao_rapida = None
+            if SAIDA_ANTECIPADA and _evidencia_valida("transcricao", texto_audio, metricas):
+                decisao_rapida = avaliar_texto(texto_audio, compilar_regras(REGRAS_COMPETICAO))
+
+            if fut_visual is None:
+                analise_visual = prontos["analise_visual"]
+            elif decisao_rapida is not None:
+                print(f"⚡ Saída antecipada: {decisao_rapida['decidido_por']} (regra {decisao_rapida['regra']}).")
+                cancelar.set()
+                metricas.setdefault("ramos_com_falha", {})["analise_visual"] = "cancelado (saída antecipada)"
+                analise_visual = "[Análise visual cancelada: a transcrição já viola as regras]"
+            else:
+                analise_visual = _aguardar_ramo(fut_visual, "analise_visual", inicio + TIMEOUT_VISUAL_S, metricas)
+                if fut_visual.done():
+                    _juntar_metricas(metricas, metricas_visual)
+            avisar("analise_visual", texto=analise_visual)
+        finally:
+            # Não espera ramos que estouraram o tempo: o juiz segue com o que tem.
+            # O ramo visual para na próxima chamada ao modelo e libera a vaga no cliente_ollama.
+            cancelar.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    metricas["tempo_evidencias_s"] = round(time.time() - inicio, 2)
+    return texto_audio, analise_visual, decisao_rapida
+
+def coletar_evidencias(midia, pasta, metricas, avisar=lambda etapa, **dados: None, prontos=None, modo_visao=None):
+    """
+    Roda a transcrição e a análise de frames ao mesmo tempo (os dois só
+    dependem da mídia baixada). Se um ramo falhar, o outro continua valendo.
+    `midia` é o dict de baixar_midia: {"audio": caminho, "video": caminho}.
+    """
+    cancelar = threading.Event()
+    return _rodar_ramos(
+        lambda m: processar_audio(midia["audio"], m),
+        lambda m: processar_frames(midia["video"], pasta, modo_visao, m, cancelar, avisar),
+        metricas, avisar, prontos or {}, cancelar,
+    )
+
+def transcrever_stream(stream, metricas, inicio):
+    """Transcreve o áudio em blocos conforme ele chega pelo ffmpeg."""
+    print("👂 [1/3] Whisper ouvindo o stream em blocos...")
+    with telemetria.span("carga_modelo", metricas, modelo=MODELO_AUDIO) as s:
+        model, economia = obter_modelo_whisper(MODELO_AUDIO)
+        s["reaproveitado"] = economia > 0
+    metricas["whisper_tempo_economizado_s"] = round(economia, 2)
+
+    textos = []
+    resultados_vad = []
+    deslocamento = 0.0
+    with telemetria.span("transcricao", metricas, vad=USAR_VAD, stream=True) as s:
+        for bloco in iterar_audio(stream):
+            # O fim do bloco anterior ajuda o Whisper a não cortar frases na emenda
+            contexto = textos[-1][-200:] if textos else None
+            if USAR_VAD:
+                resultado = transcrever_com_vad(model, bloco, deslocamento, language="pt", fp16=False,
+                                                initial_prompt=contexto)
+                resultados_vad.append(resultado)
+                texto = resultado["texto"]
+            else:
+                texto = model.transcribe(bloco, language="pt", fp16=False, initial_prompt=contexto)["text"].strip()
+            deslocamento += len(bloco) / TAXA_AUDIO
+            if texto:
+                textos.append(texto)
+                metricas.setdefault("tempo_primeira_evidencia_s", round(time.time() - inicio, 2))
+        s["audio_s"] = round(deslocamento, 2)
+    if resultados_vad:
+        registrar_metricas(metricas, resultados_vad)
+    return " ".join(textos) or SEM_FALA
+
+def analisar_frames_stream(stream, pasta, modo_visao, metricas, cancelar=None, avisar=None):
+    """Seleciona frames enquanto o vídeo chega e depois manda ao modelo de visão."""
+    print(f"👀 [2/3] Llama 3.2 Vision analisando frames do stream (modo {modo_visao})...")
+    if MODO_AMOSTRAGEM == "cenas":
+        amostras = selecionar_cenas_de_frames(iterar_frames(stream), stream["duracao_s"], ORCAMENTO_CHAMADAS_VISAO)
+    else:
+        amostras = escolher_pontos(iterar_frames(stream), stream["duracao_s"], PONTOS_PADRAO)
+    if not amostras: return "Erro ao abrir vídeo."
+    return descrever_amostras(amostras, pasta, modo_visao, metricas, cancelar, avisar)
+
+def coletar_evidencias_stream(stream, pasta, metricas, avisar=lambda etapa, **dados: None, modo_visao=None):
+    """Mesmo que coletar_evidencias, mas lendo a mídia enquanto ela é baixada."""
+    inicio = time.time()
+    cancelar = threading.Event()
+    return _rodar_ramos(
+        lambda m: transcrever_stream(stream, m, inicio),
+        lambda m: analisar_frames_stream(stream, pasta, modo_visao, m, cancelar, avisar),
+        metricas, avisar, {}, cancelar,
+    )
+
+def versoes_cache(modo_visao):
+    """
+    Assinatura da configuração de cada etapa. Trocar regras ou modelos muda
+    a assinatura e as entradas antigas deixam de ser encontradas.
+    """
+    return {
+        "transcricao": cache.assinatura(transcricao.MOTOR_TRANSCRICAO, MODELO_AUDIO, str(USAR_VAD),
+                                         str(FILTRAR_MUSICA), str(transcricao.VAD_SILERO_CT2)),
+        "analise_visual": cache.assinatura(MODELO_VISAO, MODO_AMOSTRAGEM, str(ORCAMENTO_CHAMADAS_VISAO), modo_visao,
+                                          prompts.assinatura("visao_frame"), prompts.assinatura("visao_agrupado")),
+        "veredito": cache.assinatura(REGRAS_COMPETICAO, MODELO_AUDIO, MODELO_VISAO, MODELO_JUIZ, modo_visao,
+                                    str(SAIDA_ANTECIPADA), FORMATO_VEREDITO, str(MAX_TOKENS_JUIZ),
+                                    str(ORCAMENTO_TOKENS_EVIDENCIAS), prompts.assinatura("juiz"),
+                                    prompts.assinatura("resumo_transcricao")),
+    }
+
+def _evidencia_valida(etapa, valor, metricas):
+    """Não guardamos no cache respostas de erro ou ramos que falharam."""
+    if etapa in metricas.get("ramos_com_falha", {}):
+        return False
+    return bool(valor) and not valor.startswith("Erro")
+
+def _montar_resultado(texto_audio, analise_visual, decisao, decisao_rapida, metricas):
+    """
+    Resposta final da análise; `decidido_por` diz se foi o juiz ou as regras rápidas.
+    `veredito` traz os campos já interpretados e `veredito_final` a versão em texto.
+    """
+    if decisao_rapida:
+        veredito = {
+            "status": "REPROVADO",
+            "regras_violadas": [decisao_rapida["regra"]],
+            "evidencias": [f"transcrição: {termo}" for termo in decisao_rapida["evidencias"]],
+            "confianca": 1.0,
+            "motivo": decisao_rapida["motivo"],
         }
     else:
-        return {"status": "erro", "mensagem": "Falha no download"}
+        veredito = interpretar_veredito(decisao)
+    resultado = {
+        "status": "sucesso",
+        "audio_transcricao": texto_audio,
+        "analise_visual": analise_visual,
+        "veredito_final": _texto_veredito(veredito) if veredito["status"] else decisao,
+        "veredito": veredito,
+        "decidido_por": decisao_rapida["decidido_por"] if decisao_rapida else "juiz",
+        "tokens": cliente_ollama.resumir_tokens(metricas),
+        "metricas": metricas
+    }
+    if decisao_rapida:
+        resultado["regra_violada"] = decisao_rapida["regra"]
+        resultado["evidencias_regra"] = decisao_rapida["evidencias"]
+    return resultado
+
+def _analisar_stream(url_video, stream, pasta, versoes, modo_visao, avisar):
+    """Caminho de streaming: sem arquivo local, então só o cache por URL se aplica."""
+    print("📡 Analisando a mídia enquanto ela é baixada...")
+    metricas = {"streaming": True}
+    avisar("download")  # Mídia acessível; o download segue junto com a análise
+    texto_audio, analise_visual, decisao_rapida = coletar_evidencias_stream(stream, pasta, metricas, avisar, modo_visao)
+    decisao = decisao_rapida["veredito"] if decisao_rapida else juiz_final(texto_audio, analise_visual, avisar, metricas)
+
+    resultado = _montar_resultado(texto_audio, analise_visual, decisao, decisao_rapida, metricas)
+    avisar("veredito", veredito=resultado["veredito"], decidido_por=resultado["decidido_por"])
+    evidencias = {"transcricao": texto_audio, "analise_visual": analise_visual}
+    if decisao_rapida or all(_evidencia_valida(e, v, metricas) for e, v in evidencias.items()):
+        cache.guardar_por_url(url_video, versoes["veredito"], resultado)
+    resultado["cache"] = {"url": "miss"}
+    return resultado
+
+def coletar_inferencia(url_video, midia, pasta, metricas, versoes, modo_visao, avisar=lambda etapa, **dados: None):
+    """
+    Etapa de inferência de uma mídia já baixada: Whisper e visão, com o cache
+    por hash de arquivo. Devolve o estado que julgar() precisa; depois disso a
+    pasta do job já pode ser apagada (as evidências são só texto).
+    """
+    # Nível 2: o mesmo arquivo (hash da mídia) pode ter vindo de outro link
+    # O armazém de downloads já devolve o SHA-256 de cada arquivo
+    hashes_midia = midia.get("hashes") or {}
+    hash_audio = hashes_midia.get("audio") or cache.hash_arquivo(midia["audio"])
+    hash_video = hashes_midia.get("video") or (
+        hash_audio if midia["video"] == midia["audio"] else cache.hash_arquivo(midia["video"]))
+    hashes = {"transcricao": hash_audio, "analise_visual": hash_video,
+              "veredito": f"{hash_audio}+{hash_video}"}
+    prontos = {}
+    status_cache = {"url": "miss"}
+    for etapa in ("transcricao", "analise_visual"):
+        valor = cache.buscar_etapa(hashes[etapa], etapa, versoes[etapa])
+        status_cache[etapa] = "hit" if valor is not None else "miss"
+        if valor is not None:
+            prontos[etapa] = valor
+
+    texto_audio, analise_visual, decisao_rapida = coletar_evidencias(midia, pasta, metricas, avisar, prontos, modo_visao)
+    evidencias = {"transcricao": texto_audio, "analise_visual": analise_visual}
+    for etapa, valor in evidencias.items():
+        if etapa not in prontos and _evidencia_valida(etapa, valor, metricas):
+            cache.guardar_etapa(hashes[etapa], etapa, versoes[etapa], valor)
+
+    return {
+        "url": url_video,
+        "texto_audio": texto_audio,
+        "analise_visual": analise_visual,
+        "decisao_rapida": decisao_rapida,
+        "hashes": hashes,
+        "status_cache": status_cache,
+        "evidencias_completas": all(_evidencia_valida(e, v, metricas) for e, v in evidencias.items()),
+        "metricas": metricas,
+    }
+
+def julgar(estado, versoes, avisar=lambda etapa, **dados: None):
+    """Etapa do juiz (ou das regras rápidas) sobre o estado de coletar_inferencia()."""
+    texto_audio, analise_visual = estado["texto_audio"], estado["analise_visual"]
+    decisao_rapida, hashes, metricas = estado["decisao_rapida"], estado["hashes"], estado["metricas"]
+    status_cache = estado["status_cache"]
+    evidencias_completas = estado["evidencias_completas"]
+
+    if decisao_rapida:
+        # Regras rápidas já decidiram: o juiz nem é chamado
+        decisao = decisao_rapida["veredito"]
+    else:
+        decisao = cache.buscar_etapa(hashes["veredito"], "veredito", versoes["veredito"]) if evidencias_completas else None
+        status_cache["veredito"] = "hit" if decisao is not None else "miss"
+        if decisao is None:
+            decisao = juiz_final(texto_audio, analise_visual, avisar, metricas)
+            if evidencias_completas:
+                cache.guardar_etapa(hashes["veredito"], "veredito", versoes["veredito"], decisao)
+
+    # Retorna um Dicionário (JSON) limpo
+    resultado = _montar_resultado(texto_audio, analise_visual, decisao, decisao_rapida, metricas)
+    avisar("veredito", veredito=resultado["veredito"], decidido_por=resultado["decidido_por"])
+    if evidencias_completas or decisao_rapida:
+        cache.guardar_por_url(estado["url"], versoes["veredito"], resultado)
+    resultado["cache"] = status_cache
+    return resultado
+
+def executar_analise_completa(url_video, ao_progresso=None, modo_visao=None, streaming=None, ao_evento=None):
+    """
+    Roda o pipeline inteiro. Se `ao_progresso` for passado, ele é chamado
+    com o nome de cada etapa concluída (usado pela fila de jobs da API).
+    `ao_evento(tipo, dados)` recebe também as evidências parciais: etapas com
+    seu conteúdo, cada descrição de frame e os tokens do juiz (usado pelo SSE).
+    `modo_visao` escolhe como os frames vão ao modelo (ver MODOS_VISAO).
+    `streaming` analisa a mídia enquanto ela baixa (padrão: USAR_STREAMING).
+    """
+    modo_visao = modo_visao or MODO_VISAO
+    streaming = USAR_STREAMING if streaming is None else streaming
+    if modo_visao not in MODOS_VISAO:
+        return {"status": "erro", "mensagem": f"modo_visao inválido: {modo_visao}"}
+
+    def avisar(etapa, **dados):
+        if ao_progresso and etapa in ETAPAS_PIPELINE:
+            ao_progresso(etapa)
+        if ao_evento:
+            ao_evento(etapa, dados)
+
+    print(f"🚀 Iniciando análise via API: {url_video}")
+
+    versoes = versoes_cache(modo_visao)
+
+    # Nível 1: a mesma URL (normalizada) já foi analisada com esta configuração
+    resultado = cache.buscar_por_url(url_video, versoes["veredito"])
+    if resultado is not None:
+        print("⚡ Resultado encontrado no cache (URL).")
+        avisar("veredito", veredito=resultado["veredito"], decidido_por=resultado["decidido_por"])
+        resultado["cache"] = {"url": "hit"}
+        return resultado
+
+    # Pasta exclusiva do job: apagada no fim, mesmo se der erro
+    with pasta_trabalho() as pasta:
+        if streaming and not url_video.startswith("file://"):
+            # Um arquivo só com áudio + vídeo; o padrão do yt-dlp (bv*+ba) nunca dá streaming
+            stream = resolver_stream(url_video, {**baixador.opcoes_ytdlp(url_video), "format": baixador.FORMATO_UNICO})
+            if stream is not None:
+                return _analisar_stream(url_video, stream, pasta, versoes, modo_visao, avisar)
+            print("↩️  Streaming indisponível para este link, baixando o arquivo completo.")
+
+        metricas = {}
+        midia = baixar_midia(url_video, pasta, metricas)
+        avisar("download")
+
+        if not midia:
+            return {"status": "erro", "mensagem": "Falha no download"}
+        estado = coletar_inferencia(url_video, midia, pasta, metricas, versoes, modo_visao, avisar)
+    return julgar(estado, versoes, avisar)
 
 # Deixamos isso aqui pro caso de você ainda querer testar via terminal
 if __name__ == "__main__":
@@ -0,0 +1,321 @@
+import cv2
+import json
+import queue
+import subprocess
+import threading
+import time
+import numpy as np
+
+# --- CONFIGURAÇÕES DA AMOSTRAGEM ---
+LARGURA_ANALISE = 960             # Largura usada na análise visual (bom para OCR)
+PONTOS_PADRAO = [0.15, 0.50, 0.85] # Início, Meio, Fim
+FORMATO_IMAGEM = "jpeg"            # "jpeg" ou "webp" (enviado ao modelo em memória)
+QUALIDADE_IMAGEM = 85
+
+# --- SELEÇÃO ADAPTATIVA (troca de cena) ---
+ORCAMENTO_CHAMADAS_VISAO = 4  # Máximo de frames enviados ao modelo de visão por vídeo
+FPS_DETECCAO = 2.0            # Frequência das miniaturas usadas para detectar cortes
+LIMIAR_CORTE = 0.35           # Distância de histograma que conta como troca de cena
+LIMIAR_DUPLICATA = 6          # Bits diferentes no dHash (de 64) para considerar "mesma imagem"
+
+def info_video(caminho):
+    """
+    Lê largura, altura e duração pelo ffprobe (o CAP_PROP_FRAME_COUNT do
+    OpenCV costuma errar em vídeos VFR do TikTok/Instagram).
+    Retorna None se o ffprobe não estiver disponível.
+    """
+    try:
+        saida = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=width,height:format=duration", "-of", "json", caminho],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        dados = json.loads(saida)
+        stream = dados["streams"][0]
+        return {
+            "largura": int(stream["width"]),
+            "altura": int(stream["height"]),
+            "duracao_s": float(dados["format"]["duration"]),
+        }
+    except Exception:
+        return None
+
+def _duracao_opencv(cap):
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    return cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+
+def redimensionar(frame, largura=LARGURA_ANALISE):
+    altura_orig, largura_orig = frame.shape[:2]
+    if largura_orig == largura:
+        return frame
+    fator = largura / largura_orig
+    return cv2.resize(frame, (largura, int(altura_orig * fator)))
+
+def codificar_imagem(frame, formato=FORMATO_IMAGEM, qualidade=QUALIDADE_IMAGEM):
+    """
+    Codifica o frame uma vez, em memória, para mandar direto ao modelo.
+    Retorna (bytes, milissegundos gastos).
+    """
+    inicio = time.perf_counter()
+    if formato == "webp":
+        ok, buffer = cv2.imencode(".webp", frame, [cv2.IMWRITE_WEBP_QUALITY, qualidade])
+    else:
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, qualidade])
+    if not ok:
+        raise ValueError(f"Falha ao codificar frame em {formato}.")
+    return buffer.tobytes(), (time.perf_counter() - inicio) * 1000
+
+def _alvos(modo, duracao_s, pontos, fps, timestamps):
+    """Converte o modo de amostragem numa lista ordenada de instantes (segundos)."""
+    if modo == "pontos":
+        return sorted(duracao_s * p for p in pontos)
+    if modo == "fps":
+        passo = 1.0 / fps
+        return [i * passo for i in range(int(duracao_s / passo) + 1)]
+    if modo == "timestamps":
+        return sorted(timestamps)
+    raise ValueError(f"Modo de amostragem desconhecido: {modo}")
+
+def _passada_unica(caminho, alvos):
+    """
+    Decodifica o vídeo uma vez, em ordem. grab() avança sem converter a
+    imagem; retrieve() só roda nos frames escolhidos.
+    """
+    cap = cv2.VideoCapture(caminho)
+    if not cap.isOpened():
+        return []
+
+    escolhidos = []
+    proximo = 0
+    indice = 0
+    while proximo < len(alvos) and cap.grab():
+        ts = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if ts >= alvos[proximo]:
+            ret, frame = cap.retrieve()
+            if ret:
+                escolhidos.append({"indice": indice, "timestamp_s": round(ts, 3), "frame": frame})
+            # Um frame pode cobrir vários alvos próximos (ex: fps alto em vídeo curto)
+            while proximo < len(alvos) and alvos[proximo] <= ts:
+                proximo += 1
+        indice += 1
+
+    cap.release()
+    return escolhidos
+
+def _keyframes_ffmpeg(caminho, info, alvos):
+    """
+    Decodifica só os keyframes (-skip_frame nokey) e lê os pixels direto do
+    pipe do ffmpeg. Os timestamps reais vêm do filtro showinfo (stderr).
+    Para cada alvo fica o keyframe mais próximo; só o keyframe anterior é
+    mantido em memória.
+    """
+    largura, altura = info["largura"], info["altura"]
+    tamanho = largura * altura * 3
+    proc = subprocess.Popen(
+        ["ffmpeg", "-v", "info", "-nostats", "-noautorotate", "-skip_frame", "nokey", "-i", caminho,
+         "-vf", "showinfo", "-vsync", "vfr", "-f", "rawvideo", "-pix_fmt", "bgr24", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+
+    tempos = queue.Queue()
+    def _ler_stderr():
+        for linha in proc.stderr:
+            linha = linha.decode("utf-8", "ignore")
+            if "pts_time:" in linha:
+                tempos.put(float(linha.split("pts_time:")[1].split()[0]))
+    threading.Thread(target=_ler_stderr, daemon=True).start()
+
+    escolhidos = []
+    anterior = None
+    proximo = 0
+    indice = 0
+    try:
+        while proximo < len(alvos):
+            dados = proc.stdout.read(tamanho)
+            if len(dados) < tamanho:
+                break
+            try:
+                ts = tempos.get(timeout=5)
+            except queue.Empty:
+                break
+            atual = {"indice": indice, "timestamp_s": round(ts, 3),
+                     "frame": np.frombuffer(dados, np.uint8).reshape((altura, largura, 3))}
+            while proximo < len(alvos) and ts >= alvos[proximo]:
+                alvo = alvos[proximo]
+                melhor = atual
+                if anterior is not None and alvo - anterior["timestamp_s"] < ts - alvo:
+                    melhor = anterior
+                if not escolhidos or escolhidos[-1] is not melhor:
+                    escolhidos.append(melhor)
+                proximo += 1
+            anterior = atual
+            indice += 1
+        # Alvos depois do último keyframe ficam com ele
+        if proximo < len(alvos) and anterior is not None and (not escolhidos or escolhidos[-1] is not anterior):
+            escolhidos.append(anterior)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+    return escolhidos
+
+def amostrar_frames(caminho, modo="pontos", pontos=PONTOS_PADRAO, fps=1.0, timestamps=None,
+                    somente_keyframes=False):
+    """
+    Extrai frames do vídeo em memória, com uma única passada de decodificação.
+
+    Modos:
+      - "pontos": frações da duração (ex: [0.15, 0.5, 0.85])
+      - "fps": N frames por segundo de vídeo
+      - "timestamps": instantes exatos, em segundos
+    Com somente_keyframes=True, decodifica apenas keyframes e escolhe, para
+    cada alvo, o keyframe mais próximo (bem mais rápido em H.264 de GOP longo).
+
+    Retorna uma lista de dicts: {"indice", "timestamp_s", "frame" (numpy BGR)}.
+    """
+    info = info_video(caminho)
+    if info is not None:
+        duracao = info["duracao_s"]
+    else:
+        cap = cv2.VideoCapture(caminho)
+        if not cap.isOpened():
+            return []
+        duracao = _duracao_opencv(cap)
+        cap.release()
+
+    alvos = _alvos(modo, duracao, pontos, fps, timestamps)
+    if not alvos:
+        return []
+
+    if somente_keyframes and info is not None:
+        escolhidos = _keyframes_ffmpeg(caminho, info, alvos)
+        if escolhidos:
+            return escolhidos
+
+    return _passada_unica(caminho, alvos)
+
+def amostrar_com_seek(caminho, pontos=PONTOS_PADRAO):
+    """Método antigo (um seek por ponto). Mantido só para o benchmark."""
+    cap = cv2.VideoCapture(caminho)
+    if not cap.isOpened():
+        return []
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for p in pontos:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(total_frames * p))
+        ret, frame = cap.read()
+        if ret:
+            frames.append({"indice": int(total_frames * p),
+                           "timestamp_s": round(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, 3),
+                           "frame": frame})
+    cap.release()
+    return frames
+
+def _assinatura(frame):
+    """Miniatura barata do frame: histograma HSV + dHash 8x8."""
+    mini = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(mini, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+    cv2.normalize(hist, hist)
+    cinza = cv2.resize(cv2.cvtColor(mini, cv2.COLOR_BGR2GRAY), (9, 8), interpolation=cv2.INTER_AREA)
+    dhash = (cinza[:, 1:] > cinza[:, :-1]).flatten()
+    return hist, dhash
+
+def _distancia_hash(a, b):
+    return int(np.count_nonzero(a != b))
+
+def _escolher_no_orcamento(candidatos, orcamento, duracao_s):
+    """
+    Divide o vídeo em `orcamento` janelas de tempo e pega, em cada uma, o
+    corte mais forte. Sobrando vaga, completa com os cortes mais fortes.
+    """
+    if len(candidatos) <= orcamento:
+        return candidatos
+    janela = max(duracao_s, 1e-6) / orcamento
+    escolhidos = []
+    for j in range(orcamento):
+        na_janela = [c for c in candidatos if j * janela <= c["timestamp_s"] < (j + 1) * janela]
+        if na_janela:
+            escolhidos.append(max(na_janela, key=lambda c: c["pontuacao"]))
+    ja_escolhidos = {id(c) for c in escolhidos}
+    restantes = sorted((c for c in candidatos if id(c) not in ja_escolhidos), key=lambda c: c["pontuacao"], reverse=True)
+    escolhidos += restantes[:orcamento - len(escolhidos)]
+    return sorted(escolhidos, key=lambda c: c["timestamp_s"])
+
+def _frames_espacados(cap, fps):
+    """Gera (indice, timestamp, frame) a cada 1/fps segundos; grab() nos demais."""
+    passo = 1.0 / fps
+    proximo_ts = 0.0
+    indice = 0
+    while cap.grab():
+        ts = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        indice += 1
+        if ts < proximo_ts:
+            continue
+        proximo_ts = ts + passo
+        ret, frame = cap.retrieve()
+        if ret:
+            yield indice - 1, ts, frame
+
+def selecionar_cenas_de_frames(frames, duracao_s, orcamento=ORCAMENTO_CHAMADAS_VISAO,
+                               limiar_corte=LIMIAR_CORTE, limiar_duplicata=LIMIAR_DUPLICATA):
+    """
+    Núcleo da seleção por troca de cena. `frames` é qualquer iterável de
+    (indice, timestamp_s, frame BGR) — vindo do OpenCV ou de um pipe do ffmpeg.
+    """
+    hist_anterior = None
+    candidatos = []
+    max_candidatos = orcamento * 8  # Limita a memória em vídeos com muitos cortes
+
+    for indice, ts, frame in frames:
+        hist, dhash = _assinatura(frame)
+
+        if hist_anterior is None:
+            pontuacao = 1.0  # O primeiro frame sempre abre uma cena
+        else:
+            pontuacao = cv2.compareHist(hist_anterior, hist, cv2.HISTCMP_BHATTACHARYYA)
+        hist_anterior = hist
+
+        if pontuacao < limiar_corte:
+            continue
+        if any(_distancia_hash(dhash, c["dhash"]) <= limiar_duplicata for c in candidatos):
+            continue
+
+        candidatos.append({"indice": indice, "timestamp_s": round(ts, 3), "pontuacao": round(float(pontuacao), 3),
+                           "dhash": dhash, "frame": redimensionar(frame)})
+        if len(candidatos) > max_candidatos:
+            # Descarta o corte mais fraco (nunca o primeiro frame)
+            fraco = min(range(1, len(candidatos)), key=lambda i: candidatos[i]["pontuacao"])
+            del candidatos[fraco]
+
+    escolhidos = _escolher_no_orcamento(candidatos, orcamento, duracao_s)
+    for c in escolhidos:
+        c.pop("dhash", None)
+    return escolhidos
+
+def selecionar_cenas(caminho, orcamento=ORCAMENTO_CHAMADAS_VISAO, fps_deteccao=FPS_DETECCAO,
+                     limiar_corte=LIMIAR_CORTE, limiar_duplicata=LIMIAR_DUPLICATA):
+    """
+    Escolhe frames representativos por troca de cena, numa única passada.
+
+    Compara o histograma de miniaturas amostradas a `fps_deteccao`; cada
+    corte vira um candidato. Quase-duplicatas (dHash parecido com um frame
+    já escolhido, ex: vídeo de "cabeça falante" ou cenas A-B-A) são
+    descartadas antes de chegar no modelo de visão. No fim, no máximo
+    `orcamento` frames são devolvidos, espalhados pelo vídeo.
+
+    Retorna o mesmo formato de amostrar_frames, com "pontuacao" do corte.
+    Os frames já vêm redimensionados para LARGURA_ANALISE.
+    """
+    info = info_video(caminho)
+    cap = cv2.VideoCapture(caminho)
+    if not cap.isOpened():
+        return []
+    duracao = info["duracao_s"] if info else _duracao_opencv(cap)
+
+    try:
+        return selecionar_cenas_de_frames(_frames_espacados(cap, fps_deteccao), duracao,
+                                          orcamento, limiar_corte, limiar_duplicata)
+    finally:
+        cap.release()
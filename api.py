@@ -1,7 +1,20 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
+import json
 import uvicorn
-from agente_moderador import executar_analise_completa
+from agente_moderador import executar_analise_completa, MODELO_AUDIO, MODOS_VISAO
+from registro_modelos import aquecer_modelos, estatisticas_modelos
+import fila_jobs
+from pastas_trabalho import iniciar_faxineiro
+from cache_resultados import estatisticas_cache
+from cliente_ollama import estatisticas_ollama
+import lote_analises
+from baixador import estatisticas_baixador
+import telemetria
+
+MAX_JOBS_POR_CONSULTA = 50  # Limite de ids em GET /jobs
 
 # Cria a aplicação
 app = FastAPI(title="API Moderador Supremo")
@@ -9,27 +22,178 @@ app = FastAPI(title="API Moderador Supremo")
 # Define o formato do pedido (o que o site tem que mandar)
 class PedidoAnalise(BaseModel):
     url: str
+    modo_visao: Optional[str] = None  # "individual", "lote" ou "mosaico"
+    streaming: Optional[bool] = None  # Analisar enquanto baixa (None = padrão do servidor)
+
+class PedidoLote(BaseModel):
+    urls: List[str]
+    modo_visao: Optional[str] = None
+    lote_id: Optional[str] = None     # Retoma um lote anterior, pulando o que já foi gravado
+
+@app.on_event("startup")
+def carregar_modelos():
+    # Carrega e aquece o Whisper uma vez, antes da primeira requisição
+    aquecer_modelos([MODELO_AUDIO])
+    # Sobe o pool de workers que processa a fila de análises
+    fila_jobs.iniciar_workers(executar_analise_completa)
+    # Faxina periódica das pastas de jobs que ficaram para trás
+    iniciar_faxineiro()
+    # Medidores lidos a cada coleta do /metrics
+    telemetria.registrar_medidor("fila_jobs_aguardando", "Análises esperando na fila", fila_jobs.tamanho_fila)
+    telemetria.registrar_medidor("fila_jobs_processando", "Análises em andamento", fila_jobs.em_processamento)
+    telemetria.registrar_medidor("modelos_carregados", "Modelos de áudio carregados em memória",
+                                 lambda: len(estatisticas_modelos()["carregados"]))
+    telemetria.registrar_medidor("cache_entradas", "Entradas no cache de resultados",
+                                 lambda: estatisticas_cache()["entradas"])
+    telemetria.registrar_medidor("armazem_midias_mb", "Tamanho do armazém de mídias baixadas",
+                                 lambda: estatisticas_baixador()["armazem_mb"])
 
 @app.get("/")
 def home():
     return {"mensagem": "O Agente Moderador está online! 🤖"}
 
-@app.post("/analisar")
+@app.get("/modelos")
+def endpoint_modelos():
+    """Mostra os modelos carregados e o tempo de carga economizado."""
+    return estatisticas_modelos()
+
+@app.get("/cache")
+def endpoint_cache():
+    """Quantidade de entradas guardadas no cache de resultados."""
+    return estatisticas_cache()
+
+@app.get("/ollama")
+def endpoint_ollama():
+    """Chamadas, falhas, latência média e tokens por modelo do Ollama."""
+    return estatisticas_ollama()
+
+@app.get("/downloads")
+def endpoint_downloads():
+    """Downloads feitos, reaproveitados do armazém ou juntados com outro job, e tamanho do armazém."""
+    return estatisticas_baixador()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def endpoint_metricas():
+    """Histogramas por etapa, contadores e medidores no formato do Prometheus."""
+    return PlainTextResponse(telemetria.exportar_prometheus(), media_type="text/plain; version=0.0.4")
+
+def _enfileirar_pedido(pedido):
+    print(f"📨 Recebido pedido para: {pedido.url}")
+
+    if pedido.modo_visao and pedido.modo_visao not in MODOS_VISAO:
+        raise HTTPException(status_code=422, detail=f"modo_visao deve ser um de: {', '.join(MODOS_VISAO)}")
+
+    try:
+        return fila_jobs.enfileirar(pedido.url, modo_visao=pedido.modo_visao, streaming=pedido.streaming)
+    except fila_jobs.FilaCheia as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+def _fluxo_sse(job_id, a_partir=0):
+    """
+    Gera os eventos do job no formato Server-Sent Events.
+    O `id` de cada evento permite retomar com o cabeçalho Last-Event-ID.
+    """
+    yield f"event: job\ndata: {json.dumps({'job_id': job_id})}\n\n"
+    while True:
+        lote = fila_jobs.eventos_desde(job_id, a_partir)
+        if lote is None:
+            return
+        eventos, finalizado = lote
+        if not eventos and not finalizado:
+            yield ": ping\n\n"  # Mantém a conexão viva em proxies
+            continue
+        for evento in eventos:
+            dados = json.dumps({**evento["dados"], "t": evento["t"]}, ensure_ascii=False, default=str)
+            yield f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {dados}\n\n"
+        a_partir += len(eventos)
+        if finalizado:
+            return
+
+def _resposta_sse(job_id, a_partir=0):
+    return StreamingResponse(
+        _fluxo_sse(job_id, a_partir),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/analisar", status_code=202)
 def endpoint_analisar(pedido: PedidoAnalise):
     """
     Recebe um JSON: {"url": "https://..."}
-    Retorna o veredito da IA.
+    Coloca a análise na fila e devolve o job_id na hora.
+    O veredito é consultado depois em GET /jobs/{job_id}.
     """
-    print(f"📨 Recebido pedido para: {pedido.url}")
-    
+    job_id = _enfileirar_pedido(pedido)
+    return {"job_id": job_id, "status": "na_fila", "consultar_em": f"/jobs/{job_id}",
+            "eventos_em": f"/jobs/{job_id}/eventos"}
+
+@app.post("/analisar/stream")
+def endpoint_analisar_stream(pedido: PedidoAnalise):
+    """
+    Mesmo pedido de /analisar, mas a resposta é um fluxo SSE com o progresso:
+    processando, download, transcricao, frame (um por descrição), analise_visual,
+    token (pedaços do veredito enquanto o juiz escreve), veredito e fim.
+    """
+    return _resposta_sse(_enfileirar_pedido(pedido))
+
+@app.get("/jobs")
+def endpoint_jobs(ids: str):
+    """
+    Status de vários jobs numa requisição só: ?ids=a,b,c (usado pelo painel,
+    que acompanha várias análises ao mesmo tempo). Jobs inexistentes vêm como null.
+    """
+    lista = [i for i in ids.split(",") if i][:MAX_JOBS_POR_CONSULTA]
+    return {job_id: fila_jobs.consultar_job(job_id) for job_id in lista}
+
+@app.get("/jobs/{job_id}")
+def endpoint_job(job_id: str):
+    """Retorna status, progresso por etapa e (quando pronto) o resultado."""
+    job = fila_jobs.consultar_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job
+
+@app.get("/jobs/{job_id}/eventos")
+def endpoint_eventos(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """Fluxo SSE de um job já criado. Reconexões continuam de onde pararam."""
+    if fila_jobs.consultar_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    a_partir = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+    return _resposta_sse(job_id, a_partir)
+
+@app.post("/lotes", status_code=202)
+def endpoint_lote(pedido: PedidoLote):
+    """
+    Modera uma lista de URLs em esteira (download -> inferência -> juiz).
+    Links repetidos são analisados uma vez só. O progresso fica em GET /lotes/{lote_id}.
+    """
+    if pedido.modo_visao and pedido.modo_visao not in MODOS_VISAO:
+        raise HTTPException(status_code=422, detail=f"modo_visao deve ser um de: {', '.join(MODOS_VISAO)}")
+    if pedido.lote_id and not pedido.lote_id.isalnum():
+        raise HTTPException(status_code=422, detail="lote_id inválido.")
     try:
-        # Chama a inteligência que criamos no outro arquivo
-        resultado = executar_analise_completa(pedido.url)
-        return resultado
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        estado = lote_analises.iniciar_lote(pedido.urls, pedido.modo_visao, pedido.lote_id)
+    except lote_analises.LotesOcupados as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    lote_id = estado["lote_id"]
+    return {**estado, "consultar_em": f"/lotes/{lote_id}", "resultados_em": f"/lotes/{lote_id}/resultados"}
+
+@app.get("/lotes/{lote_id}")
+def endpoint_consultar_lote(lote_id: str):
+    """Contadores do lote: concluídos, erros, pulados e quantos estão em cada etapa."""
+    estado = lote_analises.consultar_lote(lote_id)
+    if estado is None:
+        raise HTTPException(status_code=404, detail="Lote não encontrado.")
+    return estado
+
+@app.get("/lotes/{lote_id}/resultados")
+def endpoint_resultados_lote(lote_id: str):
+    """Resultados em JSONL, entregues conforme cada URL termina."""
+    if lote_analises.consultar_lote(lote_id) is None:
+        raise HTTPException(status_code=404, detail="Lote não encontrado.")
+    return StreamingResponse(lote_analises.acompanhar_resultados(lote_id), media_type="application/x-ndjson")
 
 # Para rodar o servidor
 if __name__ == "__main__":
     # Roda na porta 8000
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
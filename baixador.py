@@ -0,0 +1,350 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+import yt_dlp
+import telemetria
+from cache_resultados import normalizar_url
+from plano_formatos import baixar_midia_planejada, baixar_formato
+
+# --- SERVIÇO DE DOWNLOAD ---
+# Todo download de mídia passa por aqui (pipeline, lote, testes de áudio e de visão):
+#   - um extrator do yt-dlp por plataforma, reaproveitado entre downloads
+#     (sessão HTTP, cookies e extratores já inicializados)
+#   - a mesma URL pedida por dois jobs ao mesmo tempo vira um download só
+#   - os arquivos ficam num armazém endereçado pelo SHA-256 do conteúdo: o mesmo
+#     vídeo vindo de links diferentes ocupa o disco uma vez só; quando o armazém
+#     passa de LIMITE_ARMAZEM_MB, saem os menos usados
+#   - limite de downloads simultâneos no total e por site, e um intervalo
+#     mínimo entre downloads no mesmo site (evita bloqueio por excesso de pedidos)
+# Cada job recebe um hard link do arquivo na sua pasta de trabalho, então a
+# faxina do armazém nunca apaga uma mídia que está sendo analisada.
+PASTA_ARMAZEM = "midias_baixadas"
+LIMITE_ARMAZEM_MB = 5000
+TTL_URL_S = 7 * 24 * 60 * 60       # Depois disso a URL é baixada de novo (o arquivo continua se for igual)
+DOWNLOADS_SIMULTANEOS = 4
+DOWNLOADS_POR_SITE = 2
+INTERVALO_MIN_POR_SITE_S = {"tiktok.com": 1.0, "instagram.com": 2.0}
+INTERVALO_MIN_PADRAO_S = 0.5
+FORMATO_UNICO = "best[ext=mp4]"    # Um arquivo com áudio + vídeo (quando o plano de formatos falha)
+
+COOKIES_POR_SITE = {"tiktok.com": "cookies_tiktok.txt", "instagram.com": "cookies_instagram.txt"}
+OPCOES_BASE = {
+    'quiet': True, 'no_warnings': True, 'nocheckcertificate': True,
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-us,en;q=0.5',
+    },
+}
+OPCOES_POR_SITE = {
+    # Clientes que não pedem login agressivo (emula Android ou TV se a Web falhar)
+    "youtube.com": {'extractor_args': {'youtube': {'player_client': ['android', 'ios', 'web']}}},
+}
+APELIDOS_SITE = {"youtu.be": "youtube.com"}
+
+_trava = threading.Lock()
+_extratores = {}        # site -> (YoutubeDL, trava)
+_em_andamento = {}      # chave -> Future (downloads iguais em paralelo esperam o mesmo)
+_vagas = threading.BoundedSemaphore(DOWNLOADS_SIMULTANEOS)
+_vagas_site = {}        # site -> BoundedSemaphore
+_proximo_inicio = {}    # site -> time.monotonic() a partir do qual o próximo download pode começar
+_iniciado = False
+_avisos_cookies = set()  # Sites cujo arquivo de cookies faltando já foi avisado
+_estatisticas = {"downloads": 0, "do_armazem": 0, "compartilhados": 0, "removidos": 0, "bytes_baixados": 0}
+
+def site(url):
+    """Domínio principal do link (www.tiktok.com, vm.tiktok.com -> tiktok.com; globo.com.br fica inteiro)."""
+    partes = (urlsplit(url).hostname or "").lower().split(".")
+    # Domínios como .com.br têm três partes
+    principal = ".".join(partes[-3:] if len(partes) > 2 and partes[-2] == "com" else partes[-2:])
+    return APELIDOS_SITE.get(principal, principal)
+
+def opcoes_ytdlp(url):
+    """Opções do yt-dlp para o site do link: cabeçalhos, cookies e ajustes por plataforma."""
+    nome = site(url)
+    opcoes = {**OPCOES_BASE, **OPCOES_POR_SITE.get(nome, {})}
+    cookies = COOKIES_POR_SITE.get(nome)
+    if cookies:
+        if os.path.exists(cookies):
+            opcoes['cookiefile'] = cookies
+        elif cookies not in _avisos_cookies:
+            _avisos_cookies.add(cookies)
+            print(f"⚠️  Aviso: Arquivo de cookies '{cookies}' não encontrado.")
+    return opcoes
+
+def _extrator(nome, url):
+    """
+    YoutubeDL do site, criado uma vez. Não é thread-safe: usar com a trava
+    devolvida. Só a extração (rápida) passa por ele; os downloads de cada
+    formato rodam em paralelo a partir do info já extraído.
+    """
+    with _trava:
+        if nome not in _extratores:
+            _extratores[nome] = (yt_dlp.YoutubeDL(opcoes_ytdlp(url)), threading.Lock())
+        return _extratores[nome]
+
+def extrair_info(url):
+    """Metadados e formatos do link, pelo extrator compartilhado do site."""
+    ydl, trava = _extrator(site(url), url)
+    with trava:
+        return ydl.sanitize_info(ydl.extract_info(url, download=False))
+
+# --- ARMAZÉM ---
+def _conectar():
+    global _iniciado
+    if not _iniciado:
+        os.makedirs(os.path.join(PASTA_ARMAZEM, "tmp"), exist_ok=True)
+    conn = sqlite3.connect(os.path.join(PASTA_ARMAZEM, "indice.sqlite3"), timeout=30)
+    if not _iniciado:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS arquivos (
+                hash TEXT PRIMARY KEY,
+                extensao TEXT NOT NULL,
+                bytes INTEGER NOT NULL,
+                acessado_em REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                chave TEXT PRIMARY KEY,
+                audio TEXT NOT NULL,
+                video TEXT NOT NULL,
+                formatos TEXT,
+                criado_em REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_arquivos_acesso ON arquivos (acessado_em)")
+        conn.commit()
+        _iniciado = True
+    return conn
+
+def _caminho_armazem(hash_arquivo, extensao):
+    return os.path.join(PASTA_ARMAZEM, hash_arquivo[:2], hash_arquivo + extensao)
+
+def _hash(caminho, bloco=1024 * 1024):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for pedaco in iter(lambda: f.read(bloco), b""):
+            h.update(pedaco)
+    return h.hexdigest()
+
+def _guardar_arquivo(conn, caminho, hash_arquivo):
+    """Move o arquivo baixado para o armazém (se o conteúdo já existir, descarta a cópia nova). Chamar com a trava."""
+    extensao = os.path.splitext(caminho)[1]
+    destino = _caminho_armazem(hash_arquivo, extensao)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    if os.path.exists(destino):
+        os.remove(caminho)
+    else:
+        os.replace(caminho, destino)
+    conn.execute(
+        "INSERT OR REPLACE INTO arquivos (hash, extensao, bytes, acessado_em) VALUES (?, ?, ?, ?)",
+        (hash_arquivo, extensao, os.path.getsize(destino), time.time()),
+    )
+
+def _liberar_espaco(conn):
+    """Remove os arquivos menos usados até o armazém caber em LIMITE_ARMAZEM_MB. Chamar com a trava."""
+    total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM arquivos").fetchone()[0]
+    limite = LIMITE_ARMAZEM_MB * 1024 * 1024
+    if total <= limite:
+        return
+    for hash_arquivo, extensao, tamanho in conn.execute(
+            "SELECT hash, extensao, bytes FROM arquivos ORDER BY acessado_em").fetchall():
+        if total <= limite:
+            break
+        try:
+            os.remove(_caminho_armazem(hash_arquivo, extensao))
+        except FileNotFoundError:
+            pass
+        conn.execute("DELETE FROM arquivos WHERE hash=?", (hash_arquivo,))
+        conn.execute("DELETE FROM urls WHERE audio=? OR video=?", (hash_arquivo, hash_arquivo))
+        total -= tamanho
+        _estatisticas["removidos"] += 1
+
+def _entregar(conn, registro, pasta):
+    """
+    Hard link dos arquivos do registro na pasta do job (cópia se o disco for outro).
+    Chamar com a trava, para a faxina não apagar o arquivo no meio.
+    Retorna None se algum arquivo sumiu do armazém.
+    """
+    caminhos, hashes, total = {}, {}, 0
+    for papel in ("audio", "video"):
+        hash_arquivo = registro[papel]
+        linha = conn.execute("SELECT extensao, bytes FROM arquivos WHERE hash=?", (hash_arquivo,)).fetchone()
+        if linha is None or not os.path.exists(_caminho_armazem(hash_arquivo, linha[0])):
+            return None
+        if hash_arquivo in hashes.values():
+            caminhos[papel] = caminhos["audio"]
+        else:
+            destino = os.path.join(pasta, registro["nomes"][papel] + linha[0])
+            if os.path.exists(destino):
+                os.remove(destino)
+            try:
+                os.link(_caminho_armazem(hash_arquivo, linha[0]), destino)
+            except OSError:
+                shutil.copyfile(_caminho_armazem(hash_arquivo, linha[0]), destino)
+            caminhos[papel] = destino
+            total += linha[1]
+        hashes[papel] = hash_arquivo
+        conn.execute("UPDATE arquivos SET acessado_em=? WHERE hash=?", (time.time(), hash_arquivo))
+    conn.commit()
+    return {**caminhos, "hashes": hashes, "bytes": total, "formatos": registro.get("formatos")}
+
+def _buscar_url(conn, chave):
+    linha = conn.execute("SELECT audio, video, formatos, criado_em FROM urls WHERE chave=?", (chave,)).fetchone()
+    if linha is None or time.time() - linha[3] > TTL_URL_S:
+        return None
+    return {"audio": linha[0], "video": linha[1], "formatos": json.loads(linha[2] or "null")}
+
+# --- DOWNLOAD ---
+def _vaga_site(nome):
+    with _trava:
+        if nome not in _vagas_site:
+            _vagas_site[nome] = threading.BoundedSemaphore(DOWNLOADS_POR_SITE)
+        return _vagas_site[nome]
+
+def _esperar_vez(nome):
+    """Espaça o início dos downloads do mesmo site em INTERVALO_MIN_POR_SITE_S."""
+    intervalo = INTERVALO_MIN_POR_SITE_S.get(nome, INTERVALO_MIN_PADRAO_S)
+    with _trava:
+        agora = time.monotonic()
+        inicio = max(agora, _proximo_inicio.get(nome, 0.0))
+        _proximo_inicio[nome] = inicio + intervalo
+    if inicio > agora:
+        time.sleep(inicio - agora)
+
+def _baixar_para_armazem(url, formato, limite_bytes):
+    """Baixa numa pasta temporária e guarda no armazém. Retorna o registro {"audio", "video", "formatos"}."""
+    nome = site(url)
+    with _vaga_site(nome):
+        _esperar_vez(nome)
+        with _vagas:
+            return _baixar_agora(url, nome, formato, limite_bytes)
+
+def _baixar_agora(url, nome, formato, limite_bytes):
+    with telemetria.span("download_rede", site=nome) as s:
+        info = extrair_info(url)
+        opcoes = {**opcoes_ytdlp(url)}
+        if limite_bytes:
+            opcoes['max_filesize'] = limite_bytes
+        temporaria = tempfile.mkdtemp(dir=os.path.join(PASTA_ARMAZEM, "tmp"))
+        try:
+            formatos = None
+            if formato is None:
+                try:
+                    baixado = baixar_midia_planejada(url, temporaria, opcoes, info)
+                    formatos = baixado["formatos"]
+                except Exception as e:
+                    print(f"⚠️  Plano de formatos falhou ({e}). Usando o MP4 único.")
+                    caminho = baixar_formato(opcoes, info, FORMATO_UNICO, os.path.join(temporaria, "midia_analise"))
+                    baixado = {"audio": caminho, "video": caminho}
+            else:
+                caminho = baixar_formato(opcoes, info, formato, os.path.join(temporaria, "midia_analise"))
+                baixado = {"audio": caminho, "video": caminho}
+            if not baixado["audio"] or not baixado["video"]:
+                raise RuntimeError("O yt-dlp não gerou o arquivo (limite de tamanho ou formato indisponível).")
+
+            s["bytes"] = sum(os.path.getsize(c) for c in {baixado["audio"], baixado["video"]})
+            # O hash (leitura do arquivo inteiro) fica fora da trava
+            hash_audio = _hash(baixado["audio"])
+            hash_video = hash_audio if baixado["video"] == baixado["audio"] else _hash(baixado["video"])
+            with _trava:
+                conn = _conectar()
+                try:
+                    _guardar_arquivo(conn, baixado["audio"], hash_audio)
+                    if hash_video != hash_audio:
+                        _guardar_arquivo(conn, baixado["video"], hash_video)
+                    conn.commit()
+                finally:
+                    conn.close()
+                _estatisticas["downloads"] += 1
+                _estatisticas["bytes_baixados"] += s["bytes"]
+        finally:
+            shutil.rmtree(temporaria, ignore_errors=True)
+    return {"audio": hash_audio, "video": hash_video, "formatos": formatos}
+
+def _chave(url, formato):
+    return f"{formato or 'plano'}|{normalizar_url(url)}"
+
+def _nomes(registro):
+    if registro["audio"] == registro["video"]:
+        return {"audio": "midia_analise", "video": "midia_analise"}
+    return {"audio": "audio_analise", "video": "video_analise"}
+
+def baixar_para(url, pasta, formato=None, limite_bytes=None):
+    """
+    Entrega a mídia do link na `pasta` (baixando só se o armazém ainda não tiver).
+    `formato` None = plano de formatos (menor áudio + vídeo no tamanho da análise,
+    ver plano_formatos.py); um seletor do yt-dlp = um arquivo só.
+    Retorna {"audio", "video", "hashes", "bytes", "formatos", "origem"}; levanta exceção se falhar.
+    """
+    chave = _chave(url, formato)
+    esperou = False
+    while True:
+        with _trava:
+            conn = _conectar()
+            try:
+                registro = _buscar_url(conn, chave)
+                if registro is not None:
+                    registro["nomes"] = _nomes(registro)
+                    midia = _entregar(conn, registro, pasta)
+                    if midia is not None:
+                        if not esperou:
+                            _estatisticas["do_armazem"] += 1
+                        return {**midia, "origem": "compartilhado" if esperou else "armazem"}
+            finally:
+                conn.close()
+            futuro = _em_andamento.get(chave)
+            dono = futuro is None
+            if dono:
+                futuro = _em_andamento[chave] = Future()
+            else:
+                _estatisticas["compartilhados"] += 1
+
+        if not dono:
+            # Outro job já está baixando este link: espera e pega do armazém
+            futuro.result()
+            esperou = True
+            continue
+
+        try:
+            registro = _baixar_para_armazem(url, formato, limite_bytes)
+            with _trava:
+                conn = _conectar()
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO urls (chave, audio, video, formatos, criado_em) VALUES (?, ?, ?, ?, ?)",
+                        (chave, registro["audio"], registro["video"], json.dumps(registro["formatos"]), time.time()),
+                    )
+                    registro["nomes"] = _nomes(registro)
+                    midia = _entregar(conn, registro, pasta)
+                    _liberar_espaco(conn)
+                    conn.commit()
+                finally:
+                    conn.close()
+            futuro.set_result(True)
+            return {**midia, "origem": "download"}
+        except Exception as e:
+            futuro.set_exception(e)
+            raise
+        finally:
+            with _trava:
+                _em_andamento.pop(chave, None)
+
+def estatisticas_baixador():
+    with _trava:
+        conn = _conectar()
+        try:
+            arquivos, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM arquivos").fetchone()
+        finally:
+            conn.close()
+        return {**_estatisticas, "arquivos": arquivos, "armazem_mb": round(total / 2**20, 1),
+                "em_andamento": len(_em_andamento)}
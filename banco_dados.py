@@ -0,0 +1,177 @@
+import json
+import os
+import queue
+import threading
+from contextlib import contextmanager
+import pymysql
+
+# --- BANCO DE DADOS DO PAINEL ---
+# Um pool pequeno de conexões pymysql, criado uma vez por processo do Streamlit
+# (main.py guarda com st.cache_resource). Cada consulta pega uma conexão, usa
+# e devolve, em vez de abrir um socket novo a cada login ou página.
+CONFIG_BANCO = {
+    "host": os.environ.get("MYSQL_HOST", "127.0.0.1"),
+    "user": os.environ.get("MYSQL_USER", "root"),
+    "password": os.environ.get("MYSQL_PASSWORD", ""),
+    "database": os.environ.get("MYSQL_DATABASE", "ia"),
+    "port": int(os.environ.get("MYSQL_PORT", "3306")),  # CONFIRA SE NO SEU XAMPP É 3306 MESMO
+    "connect_timeout": 10,
+    "charset": "utf8mb4",
+}
+TAMANHO_POOL = 5
+ESPERA_CONEXAO_S = 10  # Todas as conexões ocupadas: espera isso antes de desistir
+
+# Índice (usuario_id, id): o histórico é paginado por "id menor que o último
+# visto" (keyset), então cada página custa o mesmo na linha 10 ou na 50.000,
+# e COUNT(*) por usuário lê só o índice.
+TABELAS = ["""
+CREATE TABLE IF NOT EXISTS analises (
+    id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    usuario_id INT NOT NULL,
+    tipo VARCHAR(10) NOT NULL,
+    link VARCHAR(2048) NOT NULL,
+    job_id CHAR(32) NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'na_fila',
+    resultado VARCHAR(20) NULL,
+    motivo TEXT NULL,
+    confianca DECIMAL(4, 3) NULL,
+    veredito JSON NULL,
+    erro TEXT NULL,
+    feedback VARCHAR(10) NULL,
+    criado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finalizado_em DATETIME NULL,
+    feedback_em DATETIME NULL,
+    KEY idx_analises_usuario (usuario_id, id),
+    KEY idx_analises_job (job_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""]
+
+class PoolConexoes:
+    """Pool fixo de conexões; conexões caídas são refeitas no ping ao sair do pool."""
+
+    def __init__(self, tamanho=TAMANHO_POOL, **config):
+        self._config = {**CONFIG_BANCO, **config, "cursorclass": pymysql.cursors.DictCursor, "autocommit": True}
+        self._livres = queue.LifoQueue(maxsize=tamanho)
+        self._criadas = 0
+        self._tamanho = tamanho
+        self._trava = threading.Lock()
+
+    def _pegar(self):
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+        with self._trava:
+            if self._criadas < self._tamanho:
+                self._criadas += 1
+                criar = True
+            else:
+                criar = False
+        if criar:
+            try:
+                return pymysql.connect(**self._config)
+            except Exception:
+                with self._trava:
+                    self._criadas -= 1
+                raise
+        try:
+            return self._livres.get(timeout=ESPERA_CONEXAO_S)
+        except queue.Empty:
+            raise pymysql.OperationalError(f"Nenhuma conexão livre no pool em {ESPERA_CONEXAO_S}s.")
+
+    @contextmanager
+    def conexao(self):
+        conn = self._pegar()
+        try:
+            conn.ping(reconnect=True)
+            yield conn
+        except Exception:
+            # Conexão em estado incerto: fecha e libera a vaga
+            try:
+                conn.close()
+            except Exception:
+                pass
+            with self._trava:
+                self._criadas -= 1
+            raise
+        else:
+            self._livres.put(conn)
+
+    @contextmanager
+    def cursor(self):
+        with self.conexao() as conn:
+            with conn.cursor() as cursor:
+                yield cursor
+
+def criar_tabelas(pool):
+    with pool.cursor() as cursor:
+        for sql in TABELAS:
+            cursor.execute(sql)
+
+def buscar_usuario(pool, email):
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT * FROM usuarios WHERE email=%s", (email,))
+        return cursor.fetchone()
+
+def registrar_analise(pool, usuario_id, tipo, link, job_id):
+    """Grava a análise assim que o job entra na fila da API. Retorna o id da linha."""
+    with pool.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO analises (usuario_id, tipo, link, job_id, status) VALUES (%s, %s, %s, %s, 'na_fila')",
+            (usuario_id, tipo, link, job_id),
+        )
+        return cursor.lastrowid
+
+def concluir_analise(pool, analise_id, status, veredito=None, erro=None):
+    """Guarda o veredito (ou o erro) quando o job termina."""
+    veredito = veredito or {}
+    confianca = veredito.get("confianca")
+    with pool.cursor() as cursor:
+        cursor.execute(
+            """UPDATE analises SET status=%s, resultado=%s, motivo=%s, confianca=%s, veredito=%s, erro=%s,
+                   finalizado_em=CURRENT_TIMESTAMP
+               WHERE id=%s""",
+            (status, veredito.get("status"), veredito.get("motivo"),
+             float(confianca) if confianca is not None else None,
+             json.dumps(veredito, ensure_ascii=False) if veredito else None, erro, analise_id),
+        )
+
+def registrar_feedback(pool, analise_id, usuario_id, feedback):
+    with pool.cursor() as cursor:
+        cursor.execute(
+            "UPDATE analises SET feedback=%s, feedback_em=CURRENT_TIMESTAMP WHERE id=%s AND usuario_id=%s",
+            (feedback, analise_id, usuario_id),
+        )
+
+def contar_analises(pool, usuario_id):
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) AS total FROM analises WHERE usuario_id=%s", (usuario_id,))
+        return cursor.fetchone()["total"]
+
+def listar_historico(pool, usuario_id, limite=20, antes_de=None):
+    """
+    Uma página do histórico, da mais recente para a mais antiga.
+    `antes_de` é o menor id da página anterior (None = primeira página).
+    """
+    sql = """SELECT id, criado_em, tipo, link, status, resultado, confianca, feedback
+             FROM analises WHERE usuario_id=%s"""
+    parametros = [usuario_id]
+    if antes_de is not None:
+        sql += " AND id < %s"
+        parametros.append(antes_de)
+    sql += " ORDER BY id DESC LIMIT %s"
+    parametros.append(limite)
+    with pool.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return cursor.fetchall()
+
+def listar_em_andamento(pool, usuario_id, limite=20):
+    """Análises do usuário ainda sem veredito (para voltar a acompanhar depois de um novo login)."""
+    with pool.cursor() as cursor:
+        cursor.execute(
+            """SELECT id, job_id, tipo, link, status, criado_em FROM analises
+               WHERE usuario_id=%s AND status IN ('na_fila', 'processando')
+               ORDER BY id DESC LIMIT %s""",
+            (usuario_id, limite),
+        )
+        return cursor.fetchall()
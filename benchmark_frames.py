@@ -0,0 +1,41 @@
+import sys
+import time
+from amostragem_frames import amostrar_frames, amostrar_com_seek, PONTOS_PADRAO
+
+# Compara o método antigo (seek por ponto) com a amostragem em passada única.
+# Uso: python benchmark_frames.py video1.mp4 [video2.mp4 ...]
+REPETICOES = 3
+
+def medir(funcao, *args, **kwargs):
+    tempos = []
+    frames = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        frames = funcao(*args, **kwargs)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), frames
+
+def main():
+    videos = sys.argv[1:]
+    if not videos:
+        videos = [input("👉 Caminho do vídeo local (.mp4): ")]
+
+    metodos = [
+        ("seek (antigo)", lambda v: amostrar_com_seek(v, PONTOS_PADRAO)),
+        ("passada única", lambda v: amostrar_frames(v, modo="pontos", pontos=PONTOS_PADRAO)),
+        ("só keyframes", lambda v: amostrar_frames(v, modo="pontos", pontos=PONTOS_PADRAO, somente_keyframes=True)),
+        ("1 fps", lambda v: amostrar_frames(v, modo="fps", fps=1.0)),
+    ]
+
+    for video in videos:
+        print("\n" + "=" * 60)
+        print(f"🎬 {video}")
+        print("=" * 60)
+        for nome, funcao in metodos:
+            tempo, frames = medir(funcao, video)
+            instantes = ", ".join(f"{f['timestamp_s']:.1f}s" for f in frames[:6])
+            if len(frames) > 6: instantes += ", ..."
+            print(f"   {nome:<15} {tempo*1000:8.1f} ms  | {len(frames):3d} frames  | {instantes}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import resource
+except ImportError:  # Windows: sem tempo de CPU (as colunas de CPU ficam vazias)
+    resource = None
+import cache_resultados
+import cliente_ollama
+import telemetria
+import ollama_falso
+
+# Benchmark de ponta a ponta num corpus local de vídeos, sem TikTok e sem yt-dlp.
+#
+# Para cada clipe (pasta com .mp4) roda:
+#   - as etapas isoladas, uma por vez: transcrição, frames + visão, juiz
+#   - executar_analise_completa via file://, com N jobs simultâneos (como os workers da API)
+# e reporta p50/p95 de cada etapa (pelos spans de telemetria.py) e do job inteiro,
+# vazão, uso de CPU e pico de RSS. O cache de resultados fica desligado.
+#
+# --ollama-falso troca o Ollama pelo servidor de ollama_falso.py (latência fixa e
+# configurável), para medir o pipeline sem GPU e com números repetíveis.
+# --salvar-base grava o resultado; --comparar aponta regressões contra ele e
+# termina com código 1 se alguma passar da tolerância.
+#
+# Uso: python benchmark_pipeline.py pasta_corpus [--gerar 4] [--concorrencia 1 2 4] [--repeticoes 2]
+#        [--ollama-falso --latencia-ms 300 --ms-por-token 20] [--modelo-audio small]
+#        [--salvar-base base.json] [--comparar base.json]
+#
+# Os clipes gerados por --gerar têm só tom senoidal (o VAD não acha fala): medem
+# download, decodificação, seleção de frames, visão e juiz. Para o custo do
+# Whisper, use clipes reais com fala no corpus.
+TOLERANCIA_REGRESSAO = 0.15      # 15% mais lento que a base = regressão
+DIFERENCA_MINIMA_S = 0.05        # Abaixo disso é ruído, não regressão
+DURACOES_GERADAS_S = (10, 20, 30, 45)
+
+def gerar_corpus(pasta, quantidade):
+    """Gera clipes verticais sintéticos com ffmpeg (imagem de teste + tom)."""
+    os.makedirs(pasta, exist_ok=True)
+    for i in range(quantidade):
+        duracao = DURACOES_GERADAS_S[i % len(DURACOES_GERADAS_S)]
+        destino = os.path.join(pasta, f"sintetico_{i + 1:02d}_{duracao}s.mp4")
+        if os.path.exists(destino):
+            continue
+        subprocess.run([
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size=720x1280:rate=30:duration={duracao}",
+            "-f", "lavfi", "-i", f"sine=frequency={220 * (i + 1)}:duration={duracao}",
+            "-shortest", "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac", destino,
+        ], check=True)
+        print(f"   🎞️  Gerado {destino}")
+
+def listar_corpus(pasta):
+    return sorted(glob.glob(os.path.join(pasta, "*.mp4")))
+
+def url_local(caminho):
+    return "file://" + os.path.abspath(caminho)
+
+def percentil(valores, p):
+    """Percentil com interpolação linear (p entre 0 e 100)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    baixo = int(posicao)
+    alto = min(baixo + 1, len(ordenados) - 1)
+    return ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (posicao - baixo)
+
+def _resumo(valores):
+    return {"p50_s": round(percentil(valores, 50), 3), "p95_s": round(percentil(valores, 95), 3), "n": len(valores)}
+
+def _tempo_cpu():
+    """CPU do processo e dos filhos já encerrados (ffmpeg); None sem o módulo resource."""
+    if resource is None:
+        return None
+    proprio = resource.getrusage(resource.RUSAGE_SELF)
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return proprio.ru_utime + proprio.ru_stime + filhos.ru_utime + filhos.ru_stime
+
+def _duracoes_por_etapa(lista_metricas):
+    etapas = {}
+    for metricas in lista_metricas:
+        for span in metricas.get("spans", []):
+            etapas.setdefault(span["nome"], []).append(span["duracao_s"])
+    return {nome: _resumo(duracoes) for nome, duracoes in sorted(etapas.items())}
+
+def medir_etapas(agente, clipes, repeticoes):
+    """Cada etapa sozinha, em sequência, sem os ramos paralelos do pipeline."""
+    from pastas_trabalho import pasta_trabalho
+    todas = []
+    for _ in range(repeticoes):
+        for caminho in clipes:
+            metricas = {}
+            with pasta_trabalho() as pasta:
+                texto_audio = agente.processar_audio(caminho, metricas)
+                relatorio = agente.processar_frames(caminho, pasta, metricas=metricas)
+                agente.juiz_final(texto_audio, relatorio, metricas=metricas)
+            todas.append(metricas)
+    return _duracoes_por_etapa(todas)
+
+def medir_pipeline(agente, clipes, concorrencia, repeticoes):
+    """executar_analise_completa em todos os clipes, com `concorrencia` jobs ao mesmo tempo."""
+    urls = [url_local(c) for c in clipes] * repeticoes
+    latencias, metricas, erros = [], [], 0
+
+    def rodar(url):
+        inicio = time.perf_counter()
+        resultado = agente.executar_analise_completa(url, streaming=False)
+        return time.perf_counter() - inicio, resultado
+
+    cpu_inicio = _tempo_cpu()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        for latencia, resultado in executor.map(rodar, urls):
+            if resultado.get("status") != "sucesso":
+                erros += 1
+                continue
+            latencias.append(latencia)
+            metricas.append(resultado.get("metricas") or {})
+    parede = time.perf_counter() - inicio
+    cpu = _tempo_cpu() - cpu_inicio if cpu_inicio is not None else None
+
+    return {
+        "jobs": len(urls),
+        "erros": erros,
+        "job": _resumo(latencias),
+        "etapas": _duracoes_por_etapa(metricas),
+        "vazao_jobs_min": round(len(latencias) / parede * 60, 2) if parede else 0.0,
+        "cpu_pct": round(cpu / parede * 100, 1) if parede and cpu is not None else None,
+        "pico_rss_mb": telemetria.memoria_mb().get("pico_rss_processo_mb"),
+    }
+
+def comparar(atual, base, tolerancia=TOLERANCIA_REGRESSAO):
+    """Lista de regressões (texto) do resultado atual em relação à base."""
+    regressoes = []
+
+    def checar(rotulo, novo, antigo):
+        if antigo and novo > antigo * (1 + tolerancia) and novo - antigo > DIFERENCA_MINIMA_S:
+            regressoes.append(f"{rotulo}: {antigo:.3f}s -> {novo:.3f}s (+{(novo / antigo - 1) * 100:.0f}%)")
+
+    for etapa, r in atual.get("etapas_isoladas", {}).items():
+        antigo = base.get("etapas_isoladas", {}).get(etapa)
+        if antigo:
+            checar(f"etapa isolada {etapa} p95", r["p95_s"], antigo["p95_s"])
+    for n, r in atual.get("pipeline", {}).items():
+        antigo = base.get("pipeline", {}).get(n)
+        if not antigo:
+            continue
+        checar(f"{n} job(s) simultâneo(s) p50", r["job"]["p50_s"], antigo["job"]["p50_s"])
+        checar(f"{n} job(s) simultâneo(s) p95", r["job"]["p95_s"], antigo["job"]["p95_s"])
+        if antigo["vazao_jobs_min"] and r["vazao_jobs_min"] < antigo["vazao_jobs_min"] / (1 + tolerancia):
+            regressoes.append(f"{n} job(s) simultâneo(s) vazão: {antigo['vazao_jobs_min']:.1f} -> "
+                              f"{r['vazao_jobs_min']:.1f} jobs/min")
+    return regressoes
+
+def _imprimir_etapas(etapas):
+    for nome, r in etapas.items():
+        print(f"      {nome:<28} p50 {r['p50_s']:7.2f}s  p95 {r['p95_s']:7.2f}s  (n={r['n']})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta do moderador num corpus local.")
+    parser.add_argument("corpus", help="Pasta com os .mp4 do corpus")
+    parser.add_argument("--gerar", type=int, default=0, help="Gera N clipes sintéticos na pasta, se faltarem")
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--repeticoes", type=int, default=2)
+    parser.add_argument("--sem-etapas", action="store_true", help="Pula a medição das etapas isoladas")
+    parser.add_argument("--modelo-audio", help="Tamanho do Whisper (padrão: o do agente)")
+    parser.add_argument("--ollama-falso", action="store_true", help="Usa o servidor de ollama_falso.py")
+    parser.add_argument("--latencia-ms", type=float, default=ollama_falso.LATENCIA_BASE_S * 1000)
+    parser.add_argument("--ms-por-token", type=float, default=ollama_falso.LATENCIA_POR_TOKEN_S * 1000)
+    parser.add_argument("--saida", help="Grava o resultado em JSON")
+    parser.add_argument("--salvar-base", help="Grava o resultado como base para comparações futuras")
+    parser.add_argument("--comparar", help="JSON de uma base anterior")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_REGRESSAO)
+    args = parser.parse_args()
+
+    if args.gerar:
+        gerar_corpus(args.corpus, args.gerar)
+    clipes = listar_corpus(args.corpus)
+    if not clipes:
+        print("❌ Nenhum .mp4 no corpus (use --gerar N para criar clipes sintéticos).")
+        return 2
+
+    if args.ollama_falso:
+        # Precisa vir antes da primeira chamada: o cliente do Ollama é criado uma vez só
+        _, cliente_ollama.HOST_OLLAMA = ollama_falso.iniciar_servidor(
+            latencia_base_s=args.latencia_ms / 1000, latencia_por_token_s=args.ms_por_token / 1000)
+        print(f"🤖 Ollama falso em {cliente_ollama.HOST_OLLAMA}")
+    cache_resultados.USAR_CACHE = False
+
+    import agente_moderador as agente
+    agente.ACEITAR_ARQUIVOS_LOCAIS = True
+    if args.modelo_audio:
+        agente.MODELO_AUDIO = args.modelo_audio
+
+    resultado = {
+        "ambiente": {
+            "python": platform.python_version(), "maquina": platform.machine(), "cpus": os.cpu_count(),
+            "modelo_audio": agente.MODELO_AUDIO, "modelo_visao": agente.MODELO_VISAO,
+            "modelo_juiz": agente.MODELO_JUIZ, "modo_visao": agente.MODO_VISAO,
+            "ollama": (f"falso ({args.latencia_ms:.0f}ms + {args.ms_por_token:.0f}ms/token)"
+                       if args.ollama_falso else cliente_ollama.HOST_OLLAMA or "local"),
+            "clipes": [os.path.basename(c) for c in clipes], "repeticoes": args.repeticoes,
+            "data": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+    }
+    print(f"📊 {len(clipes)} clipe(s) x {args.repeticoes} repetição(ões).")
+
+    # Aquecimento: carrega o Whisper e os modelos do Ollama fora da medição
+    agente.executar_analise_completa(url_local(clipes[0]), streaming=False)
+
+    if not args.sem_etapas:
+        print("\n   ⏱️  Etapas isoladas:")
+        resultado["etapas_isoladas"] = medir_etapas(agente, clipes, args.repeticoes)
+        _imprimir_etapas(resultado["etapas_isoladas"])
+
+    resultado["pipeline"] = {}
+    for n in args.concorrencia:
+        r = medir_pipeline(agente, clipes, n, args.repeticoes)
+        resultado["pipeline"][str(n)] = r
+        cpu = f"{r['cpu_pct']:.0f}%" if r["cpu_pct"] is not None else "—"
+        print(f"\n   🚀 {n} job(s) simultâneo(s): p50 {r['job']['p50_s']:.2f}s | p95 {r['job']['p95_s']:.2f}s | "
+              f"{r['vazao_jobs_min']:.1f} jobs/min | CPU {cpu} | pico RSS {r['pico_rss_mb']}MB | "
+              f"{r['erros']} erro(s)")
+        _imprimir_etapas(r["etapas"])
+
+    for caminho in (args.saida, args.salvar_base):
+        if caminho:
+            with open(caminho, "w", encoding="utf-8") as f:
+                json.dump(resultado, f, ensure_ascii=False, indent=2)
+            print(f"\n💾 Resultado gravado em {caminho}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        regressoes = comparar(resultado, base, args.tolerancia)
+        if regressoes:
+            print(f"\n⚠️  {len(regressoes)} regressão(ões) contra {args.comparar} (tolerância {args.tolerancia:.0%}):")
+            for r in regressoes:
+                print(f"   - {r}")
+            return 1
+        print(f"\n✅ Sem regressões contra {args.comparar} (tolerância {args.tolerancia:.0%}).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import json
+import sys
+import cliente_ollama
+import prompts
+from agente_moderador import MODELO_JUIZ, REGRAS_COMPETICAO, FORMATO_VEREDITO, MAX_TOKENS_JUIZ
+
+# Mede quanto prefill o layout "prefixo fixo + sufixo variável" (v2) economiza
+# em relação ao layout antigo com a evidência no meio do prompt (v1).
+#
+# Roda N chamadas seguidas do juiz com evidências diferentes em cada versão do
+# template e compara os tokens realmente avaliados (prompt_eval_count) e o
+# tempo de prefill. A primeira chamada de cada versão só aquece o cache e não entra na média.
+#
+# Uso: python benchmark_prefixo.py [evidencias.jsonl] [repeticoes]
+#      cada linha do .jsonl: {"texto_audio": "...", "relatorio_visual": "..."}
+
+EVIDENCIAS_PADRAO = [
+    {"texto_audio": "Fala galera, hoje é treino de perna! Bora pra academia.",
+     "relatorio_visual": "--- MOMENTO 1.0s ---\nCENA: homem fazendo agachamento.\nTEXTO: DIA DE PERNA\nALERTA: nenhum"},
+    {"texto_audio": "Comprei um tênis novo e vou mostrar como ficou no pé.",
+     "relatorio_visual": "--- MOMENTO 2.5s ---\nCENA: pessoa mostrando um tênis.\nTEXTO: Sem texto\nALERTA: nenhum"},
+    {"texto_audio": "Vem comigo nessa receita de bolo de cenoura que é sucesso.",
+     "relatorio_visual": "--- MOMENTO 0.5s ---\nCENA: cozinha com ingredientes.\nTEXTO: BOLO DA VÓ\nALERTA: nenhum"},
+    {"texto_audio": "Meu filho fez o primeiro gol no campeonato da escola!",
+     "relatorio_visual": "--- MOMENTO 3.0s ---\nCENA: criança comemorando no campo.\nTEXTO: Sem texto\nALERTA: nenhum"},
+]
+
+def carregar_evidencias(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+def medir(versao, evidencias, repeticoes):
+    chamadas = []
+    for _ in range(repeticoes):
+        for evidencia in evidencias:
+            metricas = {}
+            mensagens = prompts.montar(
+                "juiz", versao, regras=REGRAS_COMPETICAO.strip(),
+                formato_resposta=prompts.FORMATOS_RESPOSTA_JUIZ[FORMATO_VEREDITO], indicios="Nenhum", **evidencia,
+            )
+            cliente_ollama.chat(MODELO_JUIZ, mensagens, {'num_predict': MAX_TOKENS_JUIZ}, metricas, f"juiz_v{versao}")
+            chamadas.append(metricas["chamadas_llm"][-1])
+    medidas = chamadas[1:] or chamadas  # Descarta o aquecimento
+    return {
+        "tokens_avaliados": sum(c["tokens_prompt"] for c in medidas) / len(medidas),
+        "prefill_s": sum(c["prefill_s"] for c in medidas) / len(medidas),
+        "latencia_s": sum(c["latencia_s"] for c in medidas) / len(medidas),
+    }
+
+def main():
+    evidencias = carregar_evidencias(sys.argv[1]) if len(sys.argv) > 1 else EVIDENCIAS_PADRAO
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    print(f"⚖️  {len(evidencias)} evidência(s) x {repeticoes} repetição(ões) no modelo {MODELO_JUIZ}.\n")
+
+    resultados = {}
+    for versao in sorted(prompts.MODELOS_PROMPT["juiz"]):
+        resultados[versao] = r = medir(versao, evidencias, repeticoes)
+        print(f"   {prompts.assinatura('juiz', versao):<22} tokens avaliados {r['tokens_avaliados']:7.0f} | "
+              f"prefill {r['prefill_s']*1000:7.0f}ms | latência {r['latencia_s']:5.2f}s")
+
+    antiga, ativa = resultados[min(resultados)], resultados[prompts.VERSOES_ATIVAS["juiz"]]
+    if antiga is not ativa:
+        print(f"\n   💾 Prefill economizado por requisição: {(antiga['prefill_s'] - ativa['prefill_s'])*1000:.0f}ms "
+              f"({antiga['tokens_avaliados'] - ativa['tokens_avaliados']:.0f} tokens a menos avaliados)")
+    print("   (Com OLLAMA_NUM_PARALLEL > 1, chamadas seguidas podem cair em slots diferentes e não reaproveitar o cache.)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import glob
+import multiprocessing
+import os
+import re
+import sys
+import time
+import unicodedata
+
+# Compara motores/tamanhos de transcrição num corpus local de clipes em português.
+#
+# Estrutura do corpus (pasta passada na linha de comando):
+#   corpus/clipe1.mp4   + corpus/clipe1.txt   (transcrição de referência)
+#   corpus/clipe2.wav   + corpus/clipe2.txt
+#
+# Cada configuração roda num processo separado, para o pico de RSS de uma
+# não contaminar a outra. Reporta: tempo de carga, RTF (tempo de
+# transcrição / duração do áudio), pico de memória e WER.
+#
+# Uso: python benchmark_transcricao.py pasta_corpus [motor:tamanho ...]
+#      ex: python benchmark_transcricao.py corpus whisper:medium ctranslate2:medium ctranslate2:small
+
+CONFIGURACOES_PADRAO = ["whisper:medium", "ctranslate2:medium", "ctranslate2:small"]
+EXTENSOES = ("*.mp4", "*.wav", "*.mp3", "*.m4a", "*.webm", "*.ogg")
+
+def normalizar(texto):
+    """Minúsculas, sem pontuação e sem acentos — para o WER medir palavras, não grafia."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"[^\w\s]", " ", texto).split()
+
+def wer(referencia, hipotese):
+    """Word Error Rate por distância de edição entre palavras."""
+    ref, hip = normalizar(referencia), normalizar(hipotese)
+    if not ref:
+        return 0.0 if not hip else 1.0
+    anterior = list(range(len(hip) + 1))
+    for i, palavra_ref in enumerate(ref, 1):
+        atual = [i] + [0] * len(hip)
+        for j, palavra_hip in enumerate(hip, 1):
+            custo = 0 if palavra_ref == palavra_hip else 1
+            atual[j] = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + custo)
+        anterior = atual
+    return anterior[-1] / len(ref)
+
+def pico_rss_mb():
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa em KB, macOS em bytes
+        return pico / 1024 if sys.platform != "darwin" else pico / (1024 * 1024)
+    except ImportError:
+        import psutil  # Windows
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+def listar_corpus(pasta):
+    clipes = []
+    for padrao in EXTENSOES:
+        for caminho in glob.glob(os.path.join(pasta, padrao)):
+            referencia = os.path.splitext(caminho)[0] + ".txt"
+            if os.path.exists(referencia):
+                with open(referencia, encoding="utf-8") as f:
+                    clipes.append((caminho, f.read()))
+    return sorted(clipes)
+
+def _rodar_configuracao(configuracao, clipes, fila):
+    """Executa dentro de um processo filho."""
+    import transcricao
+    from vad_audio import carregar_audio, TAXA_AUDIO
+
+    motor, tamanho = configuracao.split(":")
+    inicio = time.perf_counter()
+    modelo = transcricao.criar_motor(motor, tamanho)
+    tempo_carga = time.perf_counter() - inicio
+
+    duracao_total = 0.0
+    tempo_total = 0.0
+    erros = []
+    for caminho, referencia in clipes:
+        audio = carregar_audio(caminho)
+        duracao_total += len(audio) / TAXA_AUDIO
+        inicio = time.perf_counter()
+        resultado = modelo.transcribe(audio, language="pt", fp16=False)
+        tempo_total += time.perf_counter() - inicio
+        erros.append(wer(referencia, resultado["text"]))
+
+    fila.put({
+        "configuracao": configuracao,
+        "carga_s": tempo_carga,
+        "rtf": tempo_total / duracao_total if duracao_total else 0.0,
+        "pico_rss_mb": pico_rss_mb(),
+        "wer": sum(erros) / len(erros) if erros else 0.0,
+    })
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python benchmark_transcricao.py pasta_corpus [motor:tamanho ...]")
+        return
+    clipes = listar_corpus(sys.argv[1])
+    if not clipes:
+        print("❌ Nenhum clipe com transcrição de referência (.txt) encontrado.")
+        return
+    configuracoes = sys.argv[2:] or CONFIGURACOES_PADRAO
+
+    print(f"🎧 {len(clipes)} clipe(s) no corpus.\n")
+    print(f"   {'configuração':<22} {'carga':>8} {'RTF':>7} {'pico RSS':>10} {'WER':>7}")
+    contexto = multiprocessing.get_context("spawn")
+    for configuracao in configuracoes:
+        fila = contexto.Queue()
+        processo = contexto.Process(target=_rodar_configuracao, args=(configuracao, clipes, fila))
+        processo.start()
+        processo.join()
+        if fila.empty():
+            print(f"   {configuracao:<22} ❌ falhou (motor instalado?)")
+            continue
+        r = fila.get()
+        print(f"   {r['configuracao']:<22} {r['carga_s']:7.1f}s {r['rtf']:7.3f} "
+              f"{r['pico_rss_mb']:8.0f}MB {r['wer']*100:6.1f}%")
+
+if __name__ == "__main__":
+    main()
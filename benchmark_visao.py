@@ -0,0 +1,41 @@
+import sys
+import time
+import tempfile
+from agente_moderador import processar_frames, processar_audio, juiz_final, interpretar_veredito, MODOS_VISAO
+
+# Compara os modos de envio de frames ao modelo de visão: latência, tokens e
+# se o veredito do juiz bate com o modo "individual" (referência).
+# Uso: python benchmark_visao.py video1.mp4 [video2.mp4 ...]
+
+def extrair_status(veredito):
+    return interpretar_veredito(veredito)["status"] or "?"
+
+def main():
+    videos = sys.argv[1:]
+    if not videos:
+        videos = [input("👉 Caminho do vídeo local (.mp4): ")]
+
+    for video in videos:
+        print("\n" + "=" * 70)
+        print(f"🎬 {video}")
+        print("=" * 70)
+        # A transcrição é a mesma para todos os modos: roda uma vez só
+        transcricao = processar_audio(video)
+
+        referencia = None
+        for modo in MODOS_VISAO:
+            metricas = {}
+            with tempfile.TemporaryDirectory() as pasta:
+                inicio = time.perf_counter()
+                relatorio = processar_frames(video, pasta, modo, metricas)
+                tempo = time.perf_counter() - inicio
+            status = extrair_status(juiz_final(transcricao, relatorio))
+            if referencia is None:
+                referencia = status
+            concorda = "✅" if status == referencia else "❌"
+            print(f"   {modo:<11} {tempo:7.1f}s | chamadas {metricas.get('visao_chamadas', 0):2d} | "
+                  f"tokens prompt {metricas.get('visao_tokens_prompt', 0):6d} | "
+                  f"gerados {metricas.get('visao_tokens_gerados', 0):5d} | veredito {status:<9} {concorda}")
+
+if __name__ == "__main__":
+    main()
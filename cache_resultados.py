@@ -0,0 +1,156 @@
+import sqlite3
+import hashlib
+import json
+import threading
+import time
+import telemetria
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# --- CONFIGURAÇÕES DO CACHE ---
+ARQUIVO_CACHE = "cache_moderacao.sqlite3"
+TTL_CACHE_S = 7 * 24 * 60 * 60   # Entradas valem por 7 dias
+MAX_ENTRADAS_CACHE = 5000        # Acima disso, as menos acessadas saem (LRU)
+USAR_CACHE = True                # False = toda análise roda do zero (usado nos benchmarks)
+
+# Parâmetros de rastreamento que não mudam o vídeo
+PARAMETROS_IGNORADOS = {"igshid", "igsh", "si", "feature", "is_from_webapp", "sender_device",
+                        "is_copy_url", "_r", "_t", "share_app_id", "share_link_id", "ref", "t"}
+
+_trava = threading.Lock()
+_iniciado = False
+
+def _conectar():
+    global _iniciado
+    conn = sqlite3.connect(ARQUIVO_CACHE, timeout=30)
+    if not _iniciado:
+        with _trava:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    chave TEXT PRIMARY KEY,
+                    valor TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_acesso ON cache (acessado_em)")
+            conn.commit()
+            _iniciado = True
+    return conn
+
+def normalizar_url(url):
+    """
+    Deixa links equivalentes iguais: sem www/m., sem parâmetros de
+    compartilhamento e com youtu.be/shorts convertidos para watch?v=.
+    """
+    partes = urlsplit(url.strip())
+    host = partes.netloc.lower()
+    for prefixo in ("www.", "m."):
+        if host.startswith(prefixo):
+            host = host[len(prefixo):]
+    caminho = partes.path.rstrip("/") or "/"
+    query = [(k, v) for k, v in parse_qsl(partes.query) if k not in PARAMETROS_IGNORADOS and not k.startswith("utm_")]
+
+    if host == "youtu.be":
+        host, query, caminho = "youtube.com", [("v", caminho.strip("/"))], "/watch"
+    elif host == "youtube.com" and caminho.startswith("/shorts/"):
+        query, caminho = [("v", caminho.split("/")[2])], "/watch"
+
+    return urlunsplit(("https", host, caminho, urlencode(sorted(query)), ""))
+
+def assinatura(*partes):
+    """Hash curto da configuração (regras, modelos). Mudou a config, muda a chave."""
+    return hashlib.sha256("\x00".join(partes).encode("utf-8")).hexdigest()[:16]
+
+def hash_arquivo(caminho, bloco=1024 * 1024):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for pedaco in iter(lambda: f.read(bloco), b""):
+            h.update(pedaco)
+    return h.hexdigest()
+
+def _chave_url(url, versao):
+    return f"url:{versao}:{normalizar_url(url)}"
+
+def _chave_midia(hash_midia, etapa, versao):
+    return f"midia:{versao}:{hash_midia}:{etapa}"
+
+def _buscar(chave):
+    if not USAR_CACHE:
+        return None
+    conn = _conectar()
+    try:
+        linha = conn.execute("SELECT valor, criado_em FROM cache WHERE chave=?", (chave,)).fetchone()
+        if linha is None:
+            return None
+        if time.time() - linha[1] > TTL_CACHE_S:
+            conn.execute("DELETE FROM cache WHERE chave=?", (chave,))
+            conn.commit()
+            return None
+        conn.execute("UPDATE cache SET acessado_em=? WHERE chave=?", (time.time(), chave))
+        conn.commit()
+        return json.loads(linha[0])
+    finally:
+        conn.close()
+
+def _guardar(chave, valor):
+    if not USAR_CACHE:
+        return
+    agora = time.time()
+    conn = _conectar()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (chave, valor, criado_em, acessado_em) VALUES (?, ?, ?, ?)",
+            (chave, json.dumps(valor, ensure_ascii=False), agora, agora),
+        )
+        # Expira o que passou do TTL e corta o excesso pelos menos acessados
+        conn.execute("DELETE FROM cache WHERE criado_em < ?", (agora - TTL_CACHE_S,))
+        conn.execute("""
+            DELETE FROM cache WHERE chave IN (
+                SELECT chave FROM cache ORDER BY acessado_em DESC LIMIT -1 OFFSET ?
+            )
+        """, (MAX_ENTRADAS_CACHE,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def _contar_consulta(nivel, valor):
+    telemetria.contar("cache_consultas_total", nivel=nivel, resultado="miss" if valor is None else "hit")
+    return valor
+
+# --- NÍVEL 1: URL normalizada -> resultado completo ---
+# Campos que descrevem a execução, não o vídeo: não vão para o cache
+CAMPOS_DA_EXECUCAO = ("metricas", "tokens", "cache")
+
+def buscar_por_url(url, versao):
+    """
+    Resultado completo já guardado para a URL. As métricas e os tokens são os
+    desta consulta (nenhuma chamada ao modelo), não os da análise original.
+    """
+    inicio = time.perf_counter()
+    resultado = _contar_consulta("url", _buscar(_chave_url(url, versao)))
+    if resultado is None:
+        return None
+    resultado = {k: v for k, v in resultado.items() if k not in CAMPOS_DA_EXECUCAO}
+    resultado["metricas"] = {"cache": "hit_url", "consulta_cache_s": round(time.perf_counter() - inicio, 4)}
+    resultado["tokens"] = {"prompt": 0, "gerados": 0, "por_etapa": {}}
+    return resultado
+
+def guardar_por_url(url, versao, resultado):
+    _guardar(_chave_url(url, versao), {k: v for k, v in resultado.items() if k not in CAMPOS_DA_EXECUCAO})
+
+# --- NÍVEL 2: hash do MP4 -> saída de cada etapa ---
+def buscar_etapa(hash_midia, etapa, versao):
+    return _contar_consulta(etapa, _buscar(_chave_midia(hash_midia, etapa, versao)))
+
+def guardar_etapa(hash_midia, etapa, versao, valor):
+    _guardar(_chave_midia(hash_midia, etapa, versao), valor)
+
+def estatisticas_cache():
+    conn = _conectar()
+    try:
+        total = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        por_url = conn.execute("SELECT COUNT(*) FROM cache WHERE chave LIKE 'url:%'").fetchone()[0]
+    finally:
+        conn.close()
+    return {"entradas": total, "entradas_url": por_url, "entradas_midia": total - por_url}
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+import httpx
+import ollama
+import telemetria
+
+# --- CLIENTE DE INFERÊNCIA COMPARTILHADO ---
+# Todas as chamadas ao Ollama passam por aqui:
+#   - um único Client por processo (conexões HTTP reaproveitadas)
+#   - limite de chamadas simultâneas por modelo (as demais esperam a vez)
+#   - novas tentativas com espera exponencial em erros transitórios
+#   - keep_alive para os modelos de visão e juiz continuarem carregados na GPU
+#   - latência e tokens de cada chamada, no dict de métricas do job e no acumulado
+HOST_OLLAMA = os.environ.get("OLLAMA_HOST")  # None = http://localhost:11434
+TIMEOUT_OLLAMA_S = 300
+KEEP_ALIVE = "30m"
+MAX_SIMULTANEAS_POR_MODELO = 2
+MAX_SIMULTANEAS = {}              # Exceções por modelo, ex: {"llama3.2-vision": 1}
+TENTATIVAS = 3
+ESPERA_BASE_S = 1.0               # 1s, 2s, 4s...
+STATUS_TRANSITORIOS = (429, 500, 502, 503, 504)
+
+_cliente = None
+_semaforos = {}
+_trava = threading.Lock()
+_estatisticas = {}  # modelo -> contadores
+
+def _obter_cliente():
+    global _cliente
+    with _trava:
+        if _cliente is None:
+            _cliente = ollama.Client(host=HOST_OLLAMA, timeout=TIMEOUT_OLLAMA_S)
+        return _cliente
+
+def _semaforo(modelo):
+    """Um semáforo por modelo, compartilhado entre as threads."""
+    with _trava:
+        if modelo not in _semaforos:
+            _semaforos[modelo] = threading.BoundedSemaphore(MAX_SIMULTANEAS.get(modelo, MAX_SIMULTANEAS_POR_MODELO))
+        return _semaforos[modelo]
+
+def _transitorio(erro):
+    if isinstance(erro, ollama.ResponseError):
+        return erro.status_code in STATUS_TRANSITORIOS
+    return isinstance(erro, (httpx.TransportError, ConnectionError))
+
+def _espera(tentativa):
+    return ESPERA_BASE_S * (2 ** tentativa)
+
+def _registrar(modelo, etapa, inicio, resp, tentativas, metricas, primeiro_token_s=None, erro=None):
+    """Guarda a chamada nas métricas do job e nos contadores do processo."""
+    latencia = time.time() - inicio
+    tokens_prompt = (resp or {}).get("prompt_eval_count") or 0
+    tokens_gerados = (resp or {}).get("eval_count") or 0
+    # Tempo de prefill: com o prefixo no KV-cache, só o sufixo novo é avaliado
+    prefill_s = ((resp or {}).get("prompt_eval_duration") or 0) / 1e9
+    with _trava:
+        est = _estatisticas.setdefault(modelo, {
+            "chamadas": 0, "falhas": 0, "novas_tentativas": 0, "latencia_total_s": 0.0,
+            "prefill_total_s": 0.0, "tokens_prompt": 0, "tokens_gerados": 0,
+        })
+        est["chamadas"] += 1
+        est["falhas"] += 1 if erro else 0
+        est["novas_tentativas"] += tentativas - 1
+        est["latencia_total_s"] += latencia
+        est["prefill_total_s"] += prefill_s
+        est["tokens_prompt"] += tokens_prompt
+        est["tokens_gerados"] += tokens_gerados
+    telemetria.contar("ollama_chamadas_total", modelo=modelo, resultado="erro" if erro else "ok")
+    telemetria.contar("ollama_novas_tentativas_total", tentativas - 1, modelo=modelo)
+    telemetria.contar("ollama_tokens_total", tokens_prompt, modelo=modelo, tipo="prompt")
+    telemetria.contar("ollama_tokens_total", tokens_gerados, modelo=modelo, tipo="gerados")
+    if metricas is not None:
+        chamada = {"modelo": modelo, "etapa": etapa, "latencia_s": round(latencia, 2),
+                   "prefill_s": round(prefill_s, 3), "tokens_prompt": tokens_prompt, "tokens_gerados": tokens_gerados, "tentativas": tentativas}
+        if primeiro_token_s is not None:
+            chamada["primeiro_token_s"] = round(primeiro_token_s, 2)
+        if erro:
+            chamada["erro"] = str(erro)
+        metricas.setdefault("chamadas_llm", []).append(chamada)
+
+def chat(modelo, mensagens, opcoes=None, metricas=None, etapa=None, formato=None):
+    """
+    ollama.chat com limite por modelo, novas tentativas e métricas. Devolve a resposta completa.
+    `formato` restringe a saída: "json" ou um JSON Schema (dict).
+    """
+    cliente = _obter_cliente()
+    inicio = time.time()
+    with telemetria.span(f"ollama_{etapa or 'chat'}", metricas, modelo=modelo) as s, _semaforo(modelo):
+        s["espera_s"] = round(time.time() - inicio, 3)  # Tempo na fila do semáforo
+        for tentativa in range(TENTATIVAS):
+            try:
+                resp = cliente.chat(model=modelo, messages=mensagens, options=opcoes, format=formato,
+                                    keep_alive=KEEP_ALIVE)
+                _registrar(modelo, etapa, inicio, resp, tentativa + 1, metricas)
+                s.update(tokens_prompt=resp.get("prompt_eval_count") or 0,
+                         tokens_gerados=resp.get("eval_count") or 0, tentativas=tentativa + 1)
+                return resp
+            except Exception as e:
+                if not _transitorio(e) or tentativa == TENTATIVAS - 1:
+                    _registrar(modelo, etapa, inicio, None, tentativa + 1, metricas, erro=e)
+                    raise
+                print(f"🔁 Ollama ({modelo}) falhou: {e}. Nova tentativa em {_espera(tentativa):.0f}s...")
+                time.sleep(_espera(tentativa))
+
+def chat_stream(modelo, mensagens, opcoes=None, metricas=None, etapa=None, formato=None):
+    """
+    Versão em streaming: gera os pedaços de texto conforme o modelo escreve.
+    Só tenta de novo se a falha vier antes do primeiro pedaço (depois disso o
+    texto parcial já foi entregue).
+    """
+    cliente = _obter_cliente()
+    inicio = time.time()
+    with _semaforo(modelo):
+        for tentativa in range(TENTATIVAS):
+            primeiro_token_s = None
+            try:
+                for pedaco in cliente.chat(model=modelo, messages=mensagens, options=opcoes, format=formato,
+                                           keep_alive=KEEP_ALIVE, stream=True):
+                    texto = pedaco["message"]["content"]
+                    if texto:
+                        if primeiro_token_s is None:
+                            primeiro_token_s = time.time() - inicio
+                        yield texto
+                    if pedaco.get("done"):
+                        _registrar(modelo, etapa, inicio, pedaco, tentativa + 1, metricas, primeiro_token_s)
+                return
+            except Exception as e:
+                if primeiro_token_s is not None or not _transitorio(e) or tentativa == TENTATIVAS - 1:
+                    _registrar(modelo, etapa, inicio, None, tentativa + 1, metricas, primeiro_token_s, erro=e)
+                    raise
+                print(f"🔁 Ollama ({modelo}) falhou: {e}. Nova tentativa em {_espera(tentativa):.0f}s...")
+                time.sleep(_espera(tentativa))
+
+def resumir_tokens(metricas):
+    """Soma os tokens das chamadas de um job, no total e por etapa."""
+    resumo = {"prompt": 0, "gerados": 0, "por_etapa": {}}
+    for chamada in metricas.get("chamadas_llm", []):
+        etapa = resumo["por_etapa"].setdefault(chamada["etapa"] or chamada["modelo"], {"prompt": 0, "gerados": 0})
+        for chave, campo in (("prompt", "tokens_prompt"), ("gerados", "tokens_gerados")):
+            etapa[chave] += chamada[campo]
+            resumo[chave] += chamada[campo]
+    return resumo
+
+def estatisticas_ollama():
+    """Contadores por modelo para expor na API."""
+    with _trava:
+        return {
+            modelo: {**est, "latencia_media_s": round(est["latencia_total_s"] / est["chamadas"], 2)}
+            for modelo, est in _estatisticas.items()
+        }
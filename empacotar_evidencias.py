@@ -0,0 +1,192 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+import cliente_ollama
+import prompts
+from regras_rapidas import normalizar
+
+# --- EMPACOTAMENTO DAS EVIDÊNCIAS ---
+# O juiz recebe a transcrição e o relatório visual dentro de um orçamento fixo
+# de tokens, não importa o tamanho do vídeo:
+#   - linhas repetidas entre frames (o mesmo título/legenda lido em vários quadros) saem
+#   - trechos da transcrição que citam termos das regras entram literais
+#   - o restante de transcrições longas é resumido em blocos (map) e os resumos
+#     são resumidos de novo até caberem (reduce)
+ORCAMENTO_TOKENS_EVIDENCIAS = 1500
+PARTE_TRANSCRICAO = 0.6           # Fração do orçamento para a transcrição; o resto vai para o visual
+PARTE_TRECHOS_LITERAIS = 0.5      # Dentro da transcrição, quanto pode ir para trechos literais relevantes
+CARACTERES_POR_TOKEN = 4          # Estimativa grosseira para português (sem carregar tokenizador)
+TOKENS_BLOCO_RESUMO = 1200        # Tamanho de cada bloco no "map"
+TOKENS_POR_RESUMO = 120           # num_predict de cada resumo de bloco
+MAX_RODADAS_RESUMO = 3
+USAR_RESUMO_LLM = True            # False = só corte extrativo (sem chamadas extras ao modelo)
+TAMANHO_MIN_DUPLICATA = 12        # Linhas curtas ("CENA:", "Sem texto") não contam como duplicata
+
+def estimar_tokens(texto):
+    return (len(texto) + CARACTERES_POR_TOKEN - 1) // CARACTERES_POR_TOKEN
+
+def _cortar(texto, tokens):
+    """Corta no limite de tokens, sem partir palavras."""
+    limite = tokens * CARACTERES_POR_TOKEN
+    if len(texto) <= limite:
+        return texto
+    return texto[:limite].rsplit(" ", 1)[0] + " [...]"
+
+def _frases(texto):
+    frases = [f for f in re.split(r"(?<=[.!?])\s+", texto.strip()) if f]
+    # Transcrição sem pontuação: cai para pedaços de 40 palavras
+    if len(frases) == 1 and len(texto) > 400:
+        palavras = texto.split()
+        frases = [" ".join(palavras[i:i + 40]) for i in range(0, len(palavras), 40)]
+    return frases
+
+def _dividir(texto, tokens_bloco):
+    """Agrupa frases em blocos de até `tokens_bloco` tokens."""
+    blocos, atual = [], ""
+    for frase in _frases(texto):
+        if atual and estimar_tokens(atual) + estimar_tokens(frase) > tokens_bloco:
+            blocos.append(atual)
+            atual = ""
+        atual = f"{atual} {frase}".strip()
+    if atual:
+        blocos.append(atual)
+    return blocos
+
+def trechos_relevantes(texto, padroes, orcamento_tokens):
+    """Frases que citam termos das regras (com a vizinha de cada lado), na ordem original."""
+    frases = _frases(texto)
+    normalizadas = [normalizar(f) for f in frases]
+    marcadas = set()
+    for i, frase in enumerate(normalizadas):
+        if any(p.search(frase) for p in padroes):
+            marcadas.update(j for j in (i - 1, i, i + 1) if 0 <= j < len(frases))
+
+    escolhidas, usados = [], 0
+    for i in sorted(marcadas):
+        custo = estimar_tokens(frases[i])
+        if usados + custo > orcamento_tokens:
+            break
+        escolhidas.append(frases[i])
+        usados += custo
+    return " ".join(escolhidas)
+
+def resumir(texto, orcamento_tokens, modelo, metricas=None):
+    """Map-reduce: resume cada bloco em paralelo e repete até o resultado caber no orçamento."""
+    for rodada in range(MAX_RODADAS_RESUMO):
+        if estimar_tokens(texto) <= orcamento_tokens:
+            break
+        blocos = _dividir(texto, TOKENS_BLOCO_RESUMO)
+        palavras = max(20, TOKENS_POR_RESUMO * 3 // 4)
+
+        def _resumir_bloco(bloco):
+            resp = cliente_ollama.chat(
+                modelo, prompts.montar("resumo_transcricao", palavras=palavras, texto=bloco),
+                opcoes={'temperature': 0.0, 'num_predict': TOKENS_POR_RESUMO},
+                metricas=metricas, etapa="resumo_transcricao",
+            )
+            return resp['message']['content'].strip()
+
+        with ThreadPoolExecutor(max_workers=cliente_ollama.MAX_SIMULTANEAS_POR_MODELO) as executor:
+            texto = "\n".join(executor.map(_resumir_bloco, blocos))
+        if metricas is not None:
+            metricas.setdefault("evidencias", {})["rodadas_resumo"] = rodada + 1
+    return _cortar(texto, orcamento_tokens)
+
+def compactar_transcricao(texto, orcamento_tokens, padroes, modelo, metricas=None):
+    """Trechos literais relevantes + resumo do resto, tudo dentro do orçamento."""
+    if estimar_tokens(texto) <= orcamento_tokens:
+        return texto
+
+    literais = trechos_relevantes(texto, padroes, int(orcamento_tokens * PARTE_TRECHOS_LITERAIS))
+    restante = orcamento_tokens - estimar_tokens(literais)
+    try:
+        if not USAR_RESUMO_LLM:
+            raise RuntimeError("resumo por LLM desligado")
+        contexto = resumir(texto, restante, modelo, metricas)
+        rotulo = "RESUMO DA FALA COMPLETA"
+    except Exception as e:
+        if USAR_RESUMO_LLM:
+            print(f"⚠️  Resumo da transcrição falhou ({e}). Usando corte extrativo.")
+        # Sem resumo: começo e fim da fala, que costumam ter o gancho e a chamada final
+        metade = restante // 2
+        fim = texto[-metade * CARACTERES_POR_TOKEN:].split(" ", 1)[-1]
+        contexto = f"{_cortar(texto, metade)}\n{fim}"
+        rotulo = "INÍCIO E FIM DA FALA"
+
+    partes = []
+    if literais:
+        partes.append(f"[TRECHOS LITERAIS QUE CITAM AS REGRAS]\n{literais}")
+    partes.append(f"[{rotulo}]\n{contexto}")
+    return "\n".join(partes)
+
+def _chave_linha(linha):
+    """Normaliza uma linha do relatório para achar repetições (ignora numeração e markdown)."""
+    linha = re.sub(r"^[\s\d.*#\-]+", "", normalizar(linha))
+    return re.sub(r"\s+", " ", linha.replace("*", "")).strip()
+
+def compactar_visual(relatorio, orcamento_tokens, padroes):
+    """
+    Remove linhas repetidas entre frames (OCR do mesmo título/legenda) e, se
+    ainda passar do orçamento, divide o espaço igualmente entre os frames
+    dando prioridade a ALERTA e às linhas que citam termos das regras.
+    Retorna (relatorio, linhas_removidas).
+    """
+    vistas = set()
+    linhas_removidas = 0
+    blocos = []
+    for linha in relatorio.splitlines():
+        if linha.startswith("--- "):
+            blocos.append([linha])
+            continue
+        if not blocos:
+            blocos.append([])
+        chave = _chave_linha(linha)
+        if len(chave) >= TAMANHO_MIN_DUPLICATA:
+            if chave in vistas:
+                linhas_removidas += 1
+                continue
+            vistas.add(chave)
+        if linha.strip():
+            blocos[-1].append(linha)
+
+    texto = "\n".join("\n".join(b) for b in blocos)
+    if estimar_tokens(texto) <= orcamento_tokens or not blocos:
+        return texto, linhas_removidas
+
+    por_bloco = max(1, orcamento_tokens // len(blocos))
+    compactados = []
+    for bloco in blocos:
+        cabecalho = [l for l in bloco if l.startswith("--- ")]
+        corpo = [l for l in bloco if not l.startswith("--- ")]
+        prioritarias = [l for l in corpo if "ALERTA" in l.upper() or any(p.search(normalizar(l)) for p in padroes)]
+        demais = [l for l in corpo if l not in prioritarias]
+        compactados.append("\n".join(cabecalho + [_cortar("\n".join(prioritarias + demais), por_bloco)]))
+    return "\n".join(compactados), linhas_removidas
+
+def empacotar(texto_audio, relatorio_visual, padroes, modelo_resumo, metricas=None,
+              orcamento_tokens=ORCAMENTO_TOKENS_EVIDENCIAS):
+    """
+    Deixa as duas evidências dentro de `orcamento_tokens` (estimados).
+    A sobra de uma parte vai para a outra. Registra os tamanhos em metricas["evidencias"].
+    """
+    tokens_audio = estimar_tokens(texto_audio)
+    visual, removidas = compactar_visual(relatorio_visual, float("inf"), padroes)  # Só tira duplicatas
+    tokens_visual = estimar_tokens(visual)
+
+    base_audio = int(orcamento_tokens * PARTE_TRANSCRICAO)
+    base_visual = orcamento_tokens - base_audio
+    # Reaproveita o que a outra parte não usa
+    orcamento_audio = base_audio + max(0, base_visual - tokens_visual)
+    orcamento_visual = base_visual + max(0, base_audio - tokens_audio)
+
+    audio = compactar_transcricao(texto_audio, orcamento_audio, padroes, modelo_resumo, metricas)
+    visual, _ = compactar_visual(visual, orcamento_visual, padroes)
+
+    if metricas is not None:
+        metricas.setdefault("evidencias", {}).update({
+            "tokens_transcricao_original": tokens_audio,
+            "tokens_transcricao_final": estimar_tokens(audio),
+            "tokens_visual_original": estimar_tokens(relatorio_visual),
+            "tokens_visual_final": estimar_tokens(visual),
+            "linhas_duplicadas_removidas": removidas,
+        })
+    return audio, visual
@@ -0,0 +1,168 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import telemetria
+
+# --- CONFIGURAÇÕES DA FILA ---
+NUM_WORKERS = 2          # Quantas análises rodam ao mesmo tempo
+TAMANHO_MAX_FILA = 20    # Pedidos esperando além disso recebem 429
+MAX_JOBS_GUARDADOS = 500 # Jobs finalizados mantidos em memória para consulta
+
+class FilaCheia(Exception):
+    """A fila de análises atingiu o limite configurado."""
+
+_fila = queue.Queue(maxsize=TAMANHO_MAX_FILA)
+_jobs = OrderedDict()
+_trava = threading.Lock()
+_novos_eventos = threading.Condition(_trava)  # Acorda quem está ouvindo os eventos de um job
+_workers = []
+
+def _novo_job(url, opcoes):
+    return {
+        "job_id": uuid.uuid4().hex,
+        "url": url,
+        "opcoes": opcoes,         # repassadas para a função de análise (ex: modo_visao)
+        "status": "na_fila",      # na_fila -> processando -> concluido / erro
+        "etapa_atual": None,
+        "etapas": {},             # etapa -> segundos desde o início do job
+        "criado_em": time.time(),
+        "iniciado_em": None,
+        "finalizado_em": None,
+        "resultado": None,
+        "erro": None,
+        "eventos": [],            # {"id", "tipo", "dados", "t"} — lidos pelo endpoint SSE
+    }
+
+def _descartar_antigos():
+    """Remove os jobs finalizados mais velhos. Chamar com a trava."""
+    while len(_jobs) > MAX_JOBS_GUARDADOS:
+        antigo = next((j for j in _jobs.values() if j["status"] in ("concluido", "erro")), None)
+        if antigo is None:
+            break
+        del _jobs[antigo["job_id"]]
+
+def _registrar_evento(job_id, tipo, dados):
+    """Guarda um evento no job e acorda os ouvintes. Chamar com a trava."""
+    job = _jobs.get(job_id)
+    if job is None:
+        return
+    inicio = job["iniciado_em"] or job["criado_em"]
+    job["eventos"].append({"id": len(job["eventos"]), "tipo": tipo, "dados": dados,
+                           "t": round(time.time() - inicio, 2)})
+    _novos_eventos.notify_all()
+
+def _finalizar(job_id, **campos):
+    """Marca o job como finalizado e emite o evento "fim" com o resultado."""
+    with _trava:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        job.update(campos, finalizado_em=time.time())
+        if job["iniciado_em"]:
+            telemetria.observar("job_espera_fila", job["iniciado_em"] - job["criado_em"])
+            telemetria.observar("job_total", job["finalizado_em"] - job["iniciado_em"])
+        telemetria.contar("jobs_total", status=job["status"])
+        _registrar_evento(job_id, "fim", {"status": job["status"], "resultado": job["resultado"],
+                                          "erro": job["erro"]})
+
+def _worker(funcao_analise):
+    while True:
+        job_id = _fila.get()
+        try:
+            with _trava:
+                job = _jobs.get(job_id)
+                if job is None:
+                    continue
+                job["status"] = "processando"
+                job["iniciado_em"] = time.time()
+                url = job["url"]
+                opcoes = job["opcoes"]
+                _registrar_evento(job_id, "processando", {})
+
+            def ao_progresso(etapa):
+                with _trava:
+                    j = _jobs[job_id]
+                    j["etapa_atual"] = etapa
+                    j["etapas"][etapa] = round(time.time() - j["iniciado_em"], 2)
+
+            def ao_evento(tipo, dados):
+                with _trava:
+                    _registrar_evento(job_id, tipo, dados)
+
+            try:
+                resultado = funcao_analise(url, ao_progresso=ao_progresso, ao_evento=ao_evento, **opcoes)
+                status = "erro" if resultado.get("status") == "erro" else "concluido"
+                _finalizar(job_id, status=status, resultado=resultado)
+            except Exception as e:
+                print(f"❌ Job {job_id} falhou: {e}")
+                _finalizar(job_id, status="erro", erro=str(e))
+        finally:
+            _fila.task_done()
+
+def iniciar_workers(funcao_analise, num_workers=NUM_WORKERS):
+    """Sobe o pool de workers que consome a fila (chamar uma vez na subida da API)."""
+    with _trava:
+        if _workers:
+            return
+        for i in range(num_workers):
+            t = threading.Thread(target=_worker, args=(funcao_analise,), name=f"worker-analise-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+    print(f"👷 {num_workers} workers de análise prontos (fila máx: {TAMANHO_MAX_FILA}).")
+
+def enfileirar(url, **opcoes):
+    """Cria o job e coloca na fila. Levanta FilaCheia se não houver espaço."""
+    job = _novo_job(url, opcoes)
+    with _trava:
+        _jobs[job["job_id"]] = job
+        _descartar_antigos()
+    try:
+        _fila.put_nowait(job["job_id"])
+    except queue.Full:
+        with _trava:
+            _jobs.pop(job["job_id"], None)
+        raise FilaCheia(f"Fila cheia ({TAMANHO_MAX_FILA} análises aguardando).")
+    return job["job_id"]
+
+def consultar_job(job_id):
+    """Retorna uma cópia do job (ou None se não existir)."""
+    with _trava:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        copia = dict(job)
+        copia["etapas"] = dict(job["etapas"])
+        del copia["eventos"]  # Acompanhados por GET /jobs/{job_id}/eventos
+    if copia["status"] == "na_fila":
+        copia["posicao_fila"] = _posicao(job_id)
+    return copia
+
+def eventos_desde(job_id, a_partir=0, espera_s=15.0):
+    """
+    Devolve os eventos do job com id >= a_partir, esperando até `espera_s`
+    se ainda não houver nenhum novo.
+    Retorna (eventos, finalizado) ou None se o job não existir.
+    """
+    finais = ("concluido", "erro")
+    with _novos_eventos:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        _novos_eventos.wait_for(
+            lambda: len(job["eventos"]) > a_partir or job["status"] in finais, timeout=espera_s
+        )
+        return list(job["eventos"][a_partir:]), job["status"] in finais
+
+def _posicao(job_id):
+    with _fila.mutex:
+        pendentes = list(_fila.queue)
+    return pendentes.index(job_id) + 1 if job_id in pendentes else None
+
+def tamanho_fila():
+    return _fila.qsize()
+
+def em_processamento():
+    with _trava:
+        return sum(1 for j in _jobs.values() if j["status"] == "processando")
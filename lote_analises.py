@@ -0,0 +1,309 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+import agente_moderador as agente
+import cache_resultados as cache
+from pastas_trabalho import pasta_trabalho
+
+# --- ANÁLISE EM LOTE ---
+# Para moderar milhares de envios de uma vez. As etapas rodam em esteira, cada
+# uma com seu próprio pool de threads, ligadas por filas:
+#
+#   download (rede)  ->  inferência (Whisper + visão, GPU)  ->  juiz (Ollama)
+#
+# Enquanto a GPU transcreve um vídeo, os próximos já estão baixando e o juiz
+# julga o anterior. A fila entre download e inferência é limitada para os
+# downloads não encherem o disco enquanto a GPU está ocupada.
+#
+# O arquivo de saída (JSONL, uma linha por URL, gravada assim que fica pronta)
+# também é o checkpoint: rodar de novo com a mesma saída pula o que já foi feito.
+DOWNLOADS_SIMULTANEOS = 4
+INFERENCIAS_SIMULTANEAS = 1       # Whisper e visão dividem a mesma GPU
+JULGAMENTOS_SIMULTANEOS = 2
+MIDIAS_EM_ESPERA = 4              # Mídias baixadas aguardando a GPU (cada uma ocupa disco)
+PASTA_LOTES = "lotes"             # Saídas dos lotes criados pela API
+MAX_LOTES_SIMULTANEOS = 1
+
+_FIM = object()  # Sentinela que encerra os workers de uma etapa
+
+_lotes = {}
+_trava = threading.Lock()
+
+def ler_urls(caminho):
+    """Lê URLs de um CSV (coluna "url" ou a primeira), JSONL ({"url": ...}) ou texto (uma por linha)."""
+    with open(caminho, encoding="utf-8-sig") as f:
+        if caminho.endswith(".jsonl"):
+            return [json.loads(linha)["url"] for linha in f if linha.strip()]
+        if caminho.endswith(".csv"):
+            linhas = list(csv.reader(f))
+            if not linhas:
+                return []
+            cabecalho = [c.strip().lower() for c in linhas[0]]
+            if "url" in cabecalho:
+                coluna = cabecalho.index("url")
+                return [l[coluna].strip() for l in linhas[1:] if len(l) > coluna and l[coluna].strip()]
+            return [l[0].strip() for l in linhas if l and l[0].strip().startswith("http")]
+        return [linha.strip() for linha in f if linha.strip() and not linha.startswith("#")]
+
+def deduplicar(urls):
+    """Remove links repetidos (comparando a URL normalizada), mantendo a ordem."""
+    vistas, unicas = set(), []
+    for url in urls:
+        chave = cache.normalizar_url(url)
+        if chave not in vistas:
+            vistas.add(chave)
+            unicas.append(url)
+    return unicas
+
+def ja_processadas(caminho_saida, refazer_erros=False):
+    """URLs (normalizadas) que já têm linha no arquivo de saída de uma rodada anterior."""
+    feitas = set()
+    if not os.path.exists(caminho_saida):
+        return feitas
+    with open(caminho_saida, encoding="utf-8") as f:
+        for linha in f:
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                continue  # Linha cortada por uma interrupção no meio da gravação
+            if refazer_erros and registro.get("status") != "sucesso":
+                continue
+            feitas.add(cache.normalizar_url(registro["url"]))
+    return feitas
+
+def _novo_estado(lote_id, total, caminho_saida):
+    return {
+        "lote_id": lote_id,
+        "status": "processando",   # processando -> concluido / erro
+        "total": total,
+        "pulados": 0,              # Já estavam na saída (checkpoint)
+        "concluidos": 0,
+        "erros": 0,
+        "em_andamento": {"download": 0, "inferencia": 0, "juiz": 0},
+        "saida": caminho_saida,
+        "iniciado_em": time.time(),
+        "finalizado_em": None,
+    }
+
+def executar_lote(urls, caminho_saida, modo_visao=None, refazer_erros=False, estado=None):
+    """
+    Processa a lista de URLs em esteira e grava cada resultado no JSONL de saída.
+    Retorna o dict de estado (contadores do lote).
+    """
+    modo_visao = modo_visao or agente.MODO_VISAO
+    versoes = agente.versoes_cache(modo_visao)
+    urls = deduplicar(urls)
+    feitas = ja_processadas(caminho_saida, refazer_erros)
+    pendentes = [u for u in urls if cache.normalizar_url(u) not in feitas]
+
+    estado = estado or _novo_estado(uuid.uuid4().hex, len(urls), caminho_saida)
+    estado["total"] = len(urls)
+    estado["pulados"] = len(urls) - len(pendentes)
+    print(f"📦 Lote {estado['lote_id'][:8]}: {len(urls)} URL(s) únicas, {estado['pulados']} já feitas, "
+          f"{len(pendentes)} a processar.")
+
+    pasta_saida = os.path.dirname(caminho_saida)
+    if pasta_saida:
+        os.makedirs(pasta_saida, exist_ok=True)
+    trava_saida = threading.Lock()
+    saida = open(caminho_saida, "a", encoding="utf-8")
+
+    def contar(etapa, delta):
+        with _trava:
+            estado["em_andamento"][etapa] += delta
+
+    def gravar(url, inicio, resultado):
+        registro = {"url": url, "tempo_s": round(time.time() - inicio, 2), **resultado}
+        with trava_saida:
+            saida.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+            saida.flush()
+        with _trava:
+            estado["concluidos" if resultado.get("status") == "sucesso" else "erros"] += 1
+            feitos = estado["pulados"] + estado["concluidos"] + estado["erros"]
+        status = resultado.get("veredito", {}).get("status") or resultado.get("mensagem", "erro")
+        print(f"   [{feitos}/{estado['total']}] {status} — {url}")
+
+    fila_download = queue.Queue()
+    fila_inferencia = queue.Queue(maxsize=MIDIAS_EM_ESPERA)
+    fila_juiz = queue.Queue()
+
+    def etapa_download():
+        while True:
+            url = fila_download.get()
+            if url is _FIM:
+                return
+            inicio = time.time()
+            resultado = cache.buscar_por_url(url, versoes["veredito"])
+            if resultado is not None:
+                resultado["cache"] = {"url": "hit"}
+                gravar(url, inicio, resultado)
+                continue
+            pilha = ExitStack()
+            contar("download", 1)
+            try:
+                pasta = pilha.enter_context(pasta_trabalho())
+                metricas = {"lote": estado["lote_id"]}
+                midia = agente.baixar_midia(url, pasta, metricas)
+                if not midia:
+                    raise RuntimeError("Falha no download")
+            except Exception as e:
+                pilha.close()
+                gravar(url, inicio, {"status": "erro", "mensagem": str(e)})
+                continue
+            finally:
+                contar("download", -1)
+            # A pasta só é apagada depois da inferência (ver etapa_inferencia)
+            fila_inferencia.put((url, inicio, midia, pasta, metricas, pilha))
+
+    def etapa_inferencia():
+        while True:
+            item = fila_inferencia.get()
+            if item is _FIM:
+                return
+            url, inicio, midia, pasta, metricas, pilha = item
+            contar("inferencia", 1)
+            try:
+                fila_juiz.put((url, inicio, agente.coletar_inferencia(url, midia, pasta, metricas, versoes, modo_visao)))
+            except Exception as e:
+                gravar(url, inicio, {"status": "erro", "mensagem": f"Falha na inferência: {e}"})
+            finally:
+                pilha.close()
+                contar("inferencia", -1)
+
+    def etapa_juiz():
+        while True:
+            item = fila_juiz.get()
+            if item is _FIM:
+                return
+            url, inicio, coleta = item
+            contar("juiz", 1)
+            try:
+                gravar(url, inicio, agente.julgar(coleta, versoes))
+            except Exception as e:
+                gravar(url, inicio, {"status": "erro", "mensagem": f"Falha no juiz: {e}"})
+            finally:
+                contar("juiz", -1)
+
+    def subir(alvo, n, nome):
+        threads = [threading.Thread(target=alvo, name=f"lote-{nome}-{i}", daemon=True) for i in range(n)]
+        for t in threads:
+            t.start()
+        return threads
+
+    def encerrar(threads, fila):
+        for _ in threads:
+            fila.put(_FIM)
+        for t in threads:
+            t.join()
+
+    try:
+        downloads = subir(etapa_download, DOWNLOADS_SIMULTANEOS, "download")
+        inferencias = subir(etapa_inferencia, INFERENCIAS_SIMULTANEAS, "inferencia")
+        juizes = subir(etapa_juiz, JULGAMENTOS_SIMULTANEOS, "juiz")
+        for url in pendentes:
+            fila_download.put(url)
+        # Cada etapa só termina depois que a anterior esvaziou
+        encerrar(downloads, fila_download)
+        encerrar(inferencias, fila_inferencia)
+        encerrar(juizes, fila_juiz)
+        estado["status"] = "concluido"
+    except Exception as e:
+        print(f"❌ Lote {estado['lote_id'][:8]} interrompido: {e}")
+        estado["status"] = "erro"
+        raise
+    finally:
+        saida.close()
+        estado["finalizado_em"] = time.time()
+
+    print(f"🏁 Lote {estado['lote_id'][:8]} concluído: {estado['concluidos']} ok, {estado['erros']} erro(s), "
+          f"{estado['pulados']} pulado(s) em {estado['finalizado_em'] - estado['iniciado_em']:.0f}s.")
+    return estado
+
+class LotesOcupados(Exception):
+    """Já há MAX_LOTES_SIMULTANEOS lotes rodando."""
+
+def iniciar_lote(urls, modo_visao=None, lote_id=None):
+    """
+    Dispara um lote em segundo plano (usado pela API). Passar o `lote_id` de um
+    lote anterior retoma a mesma saída, pulando o que já foi gravado.
+    """
+    lote_id = lote_id or uuid.uuid4().hex
+    caminho = os.path.join(PASTA_LOTES, f"{lote_id}.jsonl")
+    with _trava:
+        rodando = [l for l in _lotes.values() if l["status"] == "processando"]
+        if len(rodando) >= MAX_LOTES_SIMULTANEOS:
+            raise LotesOcupados(f"Já há {len(rodando)} lote(s) em andamento.")
+        if lote_id in _lotes and _lotes[lote_id]["status"] == "processando":
+            raise LotesOcupados(f"O lote {lote_id} já está em andamento.")
+        estado = _novo_estado(lote_id, len(urls), caminho)
+        _lotes[lote_id] = estado
+
+    def rodar():
+        try:
+            executar_lote(urls, caminho, modo_visao, estado=estado)
+        except Exception:
+            pass  # O status "erro" já ficou no estado
+
+    threading.Thread(target=rodar, name=f"lote-{lote_id[:8]}", daemon=True).start()
+    return consultar_lote(lote_id)
+
+def consultar_lote(lote_id):
+    with _trava:
+        estado = _lotes.get(lote_id)
+        if estado is None:
+            return None
+        return {**estado, "em_andamento": dict(estado["em_andamento"])}
+
+def acompanhar_resultados(lote_id, intervalo_s=1.0):
+    """Gera as linhas do JSONL do lote conforme são gravadas, até o lote terminar."""
+    estado = consultar_lote(lote_id)
+    if estado is None:
+        return
+    while not os.path.exists(estado["saida"]):
+        if consultar_lote(lote_id)["status"] != "processando":
+            # O arquivo pode ter sido criado junto com a mudança de status
+            if not os.path.exists(estado["saida"]):
+                return
+            break
+        time.sleep(intervalo_s)
+    with open(estado["saida"], encoding="utf-8") as f:
+        pendente = ""
+        terminado = False
+        while True:
+            linha = f.readline()
+            if linha:
+                pendente += linha
+                if pendente.endswith("\n"):
+                    yield pendente
+                    pendente = ""
+                continue
+            if terminado:
+                # Lote encerrado e arquivo lido até o fim depois disso: nada mais vai chegar
+                if pendente:
+                    yield pendente
+                return
+            if consultar_lote(lote_id)["status"] != "processando":
+                # As últimas linhas podem ter sido gravadas entre o EOF e a consulta: mais uma leitura
+                terminado = True
+                continue
+            time.sleep(intervalo_s)
+
+def main():
+    parser = argparse.ArgumentParser(description="Modera uma lista de URLs em lote.")
+    parser.add_argument("entrada", help="CSV (coluna url), JSONL ({\"url\": ...}) ou .txt com uma URL por linha")
+    parser.add_argument("saida", nargs="?", help="JSONL de resultados (padrão: <entrada>.resultados.jsonl)")
+    parser.add_argument("--modo-visao", choices=agente.MODOS_VISAO, default=None)
+    parser.add_argument("--refazer-erros", action="store_true", help="Processa de novo as URLs que deram erro")
+    args = parser.parse_args()
+
+    saida = args.saida or f"{os.path.splitext(args.entrada)[0]}.resultados.jsonl"
+    executar_lote(ler_urls(args.entrada), saida, args.modo_visao, args.refazer_erros)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,19 @@
 import streamlit as st
 import pandas as pd
-import time
+import os
+import html
 from datetime import datetime
+import httpx
 import pymysql
+import banco_dados
+
+# --- CONFIGURAÇÕES ---
+URL_API = os.environ.get("MODERADOR_API_URL", "http://127.0.0.1:8000")  # api.py
+TIMEOUT_API_S = 10
+TAMANHO_PAGINA_HISTORICO = 20
+INTERVALO_ATUALIZACAO_S = 2     # De quanto em quanto tempo o painel consulta os jobs em andamento
+MAX_ANALISES_SIMULTANEAS = 5    # Por usuário
+EM_ANDAMENTO = ("na_fila", "processando")
 
 # --- CONFIGURAÇÃO DA PÁGINA E TEMA ---
 st.set_page_config(
@@ -66,80 +77,69 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- CONEXÃO COM BANCO DE DADOS ---
-def get_db_connection():
+# --- CONEXÃO COM BANCO DE DADOS E COM A API ---
+# Criados uma vez por processo e compartilhados entre sessões e reruns
+@st.cache_resource
+def obter_pool():
+    pool = banco_dados.PoolConexoes()
+    banco_dados.criar_tabelas(pool)
+    return pool
+
+@st.cache_resource
+def obter_cliente_api():
+    return httpx.Client(base_url=URL_API, timeout=TIMEOUT_API_S)
+
+@st.cache_data(ttl=30, show_spinner=False)
+def total_analises(usuario_id):
+    return banco_dados.contar_analises(obter_pool(), usuario_id)
+
+def validar_login(email, senha):
+    print(f"--- Iniciando validação para: {email} ---") # Log no terminal
+
     try:
-        # Tenta conectar
-        connection = pymysql.connect(
-            host='127.0.0.1',
-            user='root',
-            password='',
-            database='ia',
-            port=3306, # CONFIRA SE NO SEU XAMPP É 3306 MESMO
-            cursorclass=pymysql.cursors.DictCursor, # Retorna dados como dicionário
-            connect_timeout=10
-        )
-        return connection
+        user = banco_dados.buscar_usuario(obter_pool(), email)
     except pymysql.MySQLError as e:
         st.error(f"❌ Erro de Conexão: {e}")
+        print(f"Erro detalhado: {e}")
         return None
 
-def validar_login(email, senha):
-    print(f"--- Iniciando validação para: {email} ---") # Log no terminal
-    
-    conn = get_db_connection()
-    if not conn:
+    if not user:
+        st.warning("E-mail não encontrado.")
         return None
 
-    try:
-        with conn.cursor() as cursor:
-            # Query simples para evitar erros de sintaxe
-            sql = "SELECT * FROM usuarios WHERE email=%s"
-            cursor.execute(sql, (email,))
-            user = cursor.fetchone()
-            
-            if user:
-                print(f"✅ Usuário encontrado no banco. Verificando senha...")
-                # Verificação de Senha e Status
-                # Importante: Como 'senha' e 'liberado' são texto/enum, convertemos pra string pra garantir
-                senha_banco = str(user['senha'])
-                status_conta = str(user['liberado'])
-                
-                if senha_banco == senha:
-                    if status_conta == 'aprovado':
-                        print("🎉 Login Aprovado!")
-                        return user
-                    else:
-                        st.error(f"Sua conta está com status: {status_conta}")
-                        return None
-                else:
-                    st.error("Senha incorreta.")
-                    return None
-            else:
-                st.warning("E-mail não encontrado.")
-                return None
-    except Exception as e:
-        st.error(f"Erro na consulta: {e}")
-        print(f"Erro detalhado: {e}")
+    print(f"✅ Usuário encontrado no banco. Verificando senha...")
+    # Verificação de Senha e Status
+    # Importante: Como 'senha' e 'liberado' são texto/enum, convertemos pra string pra garantir
+    senha_banco = str(user['senha'])
+    status_conta = str(user['liberado'])
+
+    if senha_banco != senha:
+        st.error("Senha incorreta.")
         return None
-    finally:
-        conn.close()
+    if status_conta != 'aprovado':
+        st.error(f"Sua conta está com status: {status_conta}")
+        return None
+    print("🎉 Login Aprovado!")
+    return user
 
 # --- GERENCIAMENTO DE ESTADO ---
 if 'page' not in st.session_state: st.session_state.page = 'login'
 if 'logged_in' not in st.session_state: st.session_state.logged_in = False
 if 'user_info' not in st.session_state: st.session_state.user_info = {}
-if 'history' not in st.session_state: st.session_state.history = []
-if 'last_analysis' not in st.session_state: st.session_state.last_analysis = None
+if 'historico_cursores' not in st.session_state: st.session_state.historico_cursores = [None]  # Início de cada página já vista
+if 'analises' not in st.session_state: st.session_state.analises = {}  # id no banco -> análise acompanhada na tela
 
 # --- FUNÇÕES DE NAVEGAÇÃO ---
 def navigate_to(page):
     st.session_state.page = page
+    if page == 'history':
+        st.session_state.historico_cursores = [None]  # Sempre abre na página mais recente
     st.rerun()
 
 def logout():
     st.session_state.logged_in = False
     st.session_state.user_info = {}
+    st.session_state.analises = {}
     st.session_state.page = 'login'
     st.rerun()
 
@@ -164,8 +164,8 @@ def show_login():
                     if user:
                         st.session_state.logged_in = True
                         st.session_state.user_info = user
+                        retomar_analises(user['id'])
                         st.toast(f"Login realizado! Bem-vindo(a): {user['apelido']}", icon="✅")
-                        time.sleep(1)
                         navigate_to('home')
                     else:
                         st.error("Acesso negado. Verifique e-mail, senha ou se sua conta foi aprovada.")
@@ -190,13 +190,18 @@ def show_sidebar():
 def show_home():
     st.markdown("## 📊 Painel de Controle")
     
+    try:
+        total = f"{total_analises(st.session_state.user_info.get('id')):,}".replace(",", ".")
+    except pymysql.MySQLError:
+        total = "—"
+
     # Cards de Resumo
     c1, c2, c3 = st.columns(3)
     with c1:
-        st.markdown("""
+        st.markdown(f"""
         <div class="css-card">
             <h3>Análises Feitas</h3>
-            <h1>12</h1>
+            <h1>{total}</h1>
         </div>
         """, unsafe_allow_html=True)
     with c2:
@@ -222,79 +227,220 @@ def show_home():
         if st.button("Novo Áudio 🎵", use_container_width=True): navigate_to('audio')
 
 # --- TELA 3 e 4: ANÁLISE ---
+# O script nunca espera a análise terminar: o pedido vai para a fila da API e
+# volta na hora. Um fragmento com run_every consulta os jobs em andamento
+# (uma requisição para todos) e só ele é refeito a cada intervalo, sem
+# prender a thread da sessão nem rodar a página inteira de novo.
+def _nova_analise(linha):
+    return {
+        "id": linha["id"], "job_id": linha["job_id"], "tipo": linha["tipo"], "link": linha["link"],
+        "status": linha["status"], "data": linha["criado_em"].strftime("%d/%m/%Y %H:%M"),
+    }
+
+def retomar_analises(usuario_id):
+    """No login, volta a acompanhar as análises que ficaram em andamento (ex: a aba foi fechada)."""
+    try:
+        linhas = banco_dados.listar_em_andamento(obter_pool(), usuario_id, MAX_ANALISES_SIMULTANEAS)
+    except pymysql.MySQLError:
+        linhas = []
+    st.session_state.analises = {l["id"]: _nova_analise(l) for l in reversed(linhas)}
+
+def enviar_para_api(tipo, link):
+    """Coloca o link na fila da API de moderação e grava a análise no banco."""
+    ativas = [a for a in st.session_state.analises.values() if a["status"] in EM_ANDAMENTO]
+    if len(ativas) >= MAX_ANALISES_SIMULTANEAS:
+        st.warning(f"Você já tem {len(ativas)} análises em andamento. Aguarde alguma terminar.")
+        return
+    try:
+        resposta = obter_cliente_api().post("/analisar", json={"url": link})
+        resposta.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 429:
+            st.warning("A fila de análises está cheia. Tente de novo em alguns minutos.")
+        else:
+            st.error(f"A API recusou o pedido: {e.response.text}")
+        return
+    except httpx.HTTPError as e:
+        st.error(f"❌ API de moderação indisponível ({URL_API}): {e}")
+        return
+
+    job_id = resposta.json()["job_id"]
+    usuario_id = st.session_state.user_info.get('id')
+    try:
+        analise_id = banco_dados.registrar_analise(obter_pool(), usuario_id, tipo, link, job_id)
+    except pymysql.MySQLError as e:
+        st.error(f"Análise enviada, mas não foi possível gravar no banco: {e}")
+        return
+    total_analises.clear()
+    st.session_state.analises[analise_id] = _nova_analise({
+        "id": analise_id, "job_id": job_id, "tipo": tipo, "link": link, "status": "na_fila",
+        "criado_em": datetime.now(),
+    })
+    st.toast("Análise enviada! Acompanhe o andamento abaixo.", icon="🚀")
+
+def atualizar_analises(analises):
+    """Consulta de uma vez os jobs em andamento; os que terminaram têm o veredito (ou o erro) gravado no banco."""
+    pendentes = [a for a in analises if a["status"] in EM_ANDAMENTO]
+    if not pendentes:
+        return
+    try:
+        resposta = obter_cliente_api().get("/jobs", params={"ids": ",".join(a["job_id"] for a in pendentes)})
+        resposta.raise_for_status()
+    except httpx.HTTPError as e:
+        st.caption(f"⚠️ Não foi possível consultar a API agora ({e}). Tentando de novo...")
+        return
+    jobs = resposta.json()
+
+    for analise in pendentes:
+        # A API guarda os jobs em memória: se reiniciou, o job sumiu
+        job = jobs.get(analise["job_id"]) or {"status": "erro", "erro": "O job não existe mais na API (ela foi reiniciada?)."}
+        analise["status"] = job["status"]
+        analise["etapa"] = job.get("etapa_atual")
+        analise["posicao"] = job.get("posicao_fila")
+        if job["status"] in EM_ANDAMENTO:
+            continue
+        resultado = job.get("resultado") or {}
+        try:
+            if job["status"] == "concluido":
+                analise["veredito"] = resultado.get("veredito") or {}
+                banco_dados.concluir_analise(obter_pool(), analise["id"], "concluido", veredito=analise["veredito"])
+            else:
+                analise["erro"] = job.get("erro") or resultado.get("mensagem") or "Erro desconhecido"
+                banco_dados.concluir_analise(obter_pool(), analise["id"], "erro", erro=analise["erro"])
+        except pymysql.MySQLError as e:
+            st.caption(f"⚠️ Resultado recebido, mas não gravado no banco: {e}")
+
+def salvar_feedback(analise_id, feedback):
+    """Callback dos botões de feedback (roda antes do rerun, sem esperar nada)."""
+    try:
+        banco_dados.registrar_feedback(obter_pool(), analise_id, st.session_state.user_info.get('id'), feedback)
+    except pymysql.MySQLError as e:
+        st.toast(f"Não foi possível salvar o feedback: {e}", icon="❌")
+        return
+    st.session_state.analises.pop(analise_id, None)
+    st.toast("Feedback salvo no banco de dados!", icon="💾")
+
+def dispensar(analise_id):
+    st.session_state.analises.pop(analise_id, None)
+
+def mostrar_analise(res):
+    icon = "🎵" if res["tipo"] == "Áudio" else "🎬"
+    with st.container(border=True):
+        # O link é digitado pelo usuário: escapado antes de entrar no HTML
+        st.markdown(f"{icon} **{res['tipo']}** · {res['data']}  \n<small>{html.escape(res['link'])}</small>",
+                    unsafe_allow_html=True)
+
+        if res["status"] == "na_fila":
+            st.info(f"⏳ Na fila da moderação (posição {res.get('posicao') or '?'}).")
+            return
+        if res["status"] == "processando":
+            st.info(f"⚙️ Analisando... etapa atual: {res.get('etapa') or 'iniciando'}")
+            return
+        if res["status"] == "erro":
+            st.error(f"A análise falhou: {res.get('erro')}")
+            st.button("Dispensar", key=f"dispensar_{res['id']}", on_click=dispensar, args=(res["id"],))
+            return
+
+        veredito = res.get("veredito") or {}
+        confianca = veredito.get("confianca")
+        texto_confianca = f"{confianca:.0%}" if confianca is not None else "—"
+        # O motivo vem do modelo, que lê texto do próprio vídeo (OCR): nunca entra cru no HTML
+        status = html.escape(str(veredito.get('status') or '?'))
+        motivo = html.escape(str(veredito.get('motivo') or ''))
+        st.markdown(f"""
+        <div style="background-color: #f0f2f6; padding: 20px; border-radius: 10px; border-left: 5px solid #FF6B6B; color: #333;">
+            <h3>Resultado: {status}</h3>
+            <p>{motivo}</p>
+            <p>Confiança do modelo: <b>{texto_confianca}</b></p>
+        </div>
+        """, unsafe_allow_html=True)
+
+        st.write("")
+        st.markdown("##### O veredito da IA está correto?")
+        c1, c2 = st.columns(2)
+        with c1:
+            st.button("✅ Sim, está correto", key=f"sim_{res['id']}", use_container_width=True,
+                      on_click=salvar_feedback, args=(res["id"], "Correto"))
+        with c2:
+            st.button("❌ Não, está errado", key=f"nao_{res['id']}", use_container_width=True,
+                      on_click=salvar_feedback, args=(res["id"], "Incorreto"))
+
+def _painel_analises(ao_vivo):
+    analises = list(st.session_state.analises.values())
+    atualizar_analises(analises)
+    if analises:
+        st.markdown("---")
+        st.markdown("### Suas análises")
+    for res in reversed(analises):
+        mostrar_analise(res)
+    if ao_vivo and not any(a["status"] in EM_ANDAMENTO for a in analises):
+        st.rerun()  # Tudo terminou: a página volta a usar o painel sem atualização automática
+
+# Mesmo painel em duas versões: a que se atualiza sozinha só é usada enquanto há job em andamento
+painel_ao_vivo = st.fragment(_painel_analises, run_every=INTERVALO_ATUALIZACAO_S)
+painel_parado = st.fragment(_painel_analises)
+
 def show_analysis(tipo):
     icon = "🎵" if tipo == "Áudio" else "🎬"
     st.markdown(f"## {icon} Nova Análise de {tipo}")
     st.markdown("<div class='css-card'>", unsafe_allow_html=True)
-    
-    link = st.text_input(f"Cole o link do {tipo.lower()} aqui:")
-    
-    if st.button("🔍 Iniciar Análise", use_container_width=True):
+
+    with st.form(f"form_{tipo}", clear_on_submit=True):
+        link = st.text_input(f"Cole o link do {tipo.lower()} aqui:")
+        enviado = st.form_submit_button("🔍 Iniciar Análise", use_container_width=True)
+    if enviado:
         if link:
-            with st.spinner("A IA está analisando os padrões..."):
-                time.sleep(2.5) # Simulação
-                st.session_state.last_analysis = {
-                    "tipo": tipo,
-                    "link": link,
-                    "resultado": "Aprovado com ressalvas",
-                    "confianca": "94%",
-                    "data": datetime.now().strftime("%d/%m/%Y %H:%M")
-                }
-                st.rerun()
+            enviar_para_api(tipo, link)
         else:
             st.warning("Precisamos do link para começar.")
     st.markdown("</div>", unsafe_allow_html=True)
 
-    # Exibição do Resultado
-    if st.session_state.last_analysis and st.session_state.last_analysis['tipo'] == tipo:
-        res = st.session_state.last_analysis
-        st.markdown("---")
-        st.success("Análise Finalizada!")
-        
-        # Container de Resultado Moderno
-        with st.container():
-            st.markdown(f"""
-            <div style="background-color: #f0f2f6; padding: 20px; border-radius: 10px; border-left: 5px solid #FF6B6B; color: #333;">
-                <h3>Resultado: {res['resultado']}</h3>
-                <p>Confiança do modelo: <b>{res['confianca']}</b></p>
-                <small>{res['link']}</small>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            st.write("")
-            st.markdown("##### O veredito da IA está correto?")
-            
-            c1, c2 = st.columns(2)
-            with c1:
-                if st.button("✅ Sim, está correto", key="yes", use_container_width=True):
-                    salvar_historico("Correto")
-            with c2:
-                if st.button("❌ Não, está errado", key="no", use_container_width=True):
-                    salvar_historico("Incorreto")
-
-def salvar_historico(feedback):
-    dados = st.session_state.last_analysis
-    dados['feedback'] = feedback
-    dados['usuario_id'] = st.session_state.user_info.get('id') # Salva quem fez
-    st.session_state.history.append(dados)
-    st.session_state.last_analysis = None
-    st.toast("Feedback salvo no banco de dados!", icon="💾")
-    time.sleep(1)
-    st.rerun()
+    if any(a["status"] in EM_ANDAMENTO for a in st.session_state.analises.values()):
+        painel_ao_vivo(True)
+    else:
+        painel_parado(False)
 
 # --- TELA 5: HISTÓRICO ---
 def show_history():
     st.markdown("## 📜 Histórico de Atividades")
-    
-    if st.session_state.history:
-        df = pd.DataFrame(st.session_state.history)
-        st.dataframe(
-            df[['data', 'tipo', 'resultado', 'feedback']],
-            use_container_width=True,
-            hide_index=True
-        )
-    else:
+    usuario_id = st.session_state.user_info.get('id')
+    cursores = st.session_state.historico_cursores
+    pagina = len(cursores) - 1
+
+    try:
+        # Um a mais que a página, só para saber se existe a próxima
+        linhas = banco_dados.listar_historico(obter_pool(), usuario_id, TAMANHO_PAGINA_HISTORICO + 1, cursores[-1])
+        total = total_analises(usuario_id)
+    except pymysql.MySQLError as e:
+        st.error(f"❌ Erro ao carregar o histórico: {e}")
+        return
+
+    if not linhas:
         st.info("Nenhum histórico encontrado para sua conta.")
+        return
+
+    tem_proxima = len(linhas) > TAMANHO_PAGINA_HISTORICO
+    linhas = linhas[:TAMANHO_PAGINA_HISTORICO]
+    df = pd.DataFrame(linhas)
+    df['data'] = pd.to_datetime(df['criado_em']).dt.strftime("%d/%m/%Y %H:%M")
+    df['confianca'] = df['confianca'].map(lambda c: f"{float(c):.0%}" if c is not None else "")
+    st.dataframe(
+        df[['data', 'tipo', 'status', 'resultado', 'confianca', 'feedback', 'link']],
+        use_container_width=True,
+        hide_index=True
+    )
+
+    primeira = pagina * TAMANHO_PAGINA_HISTORICO + 1
+    st.caption(f"{primeira}–{primeira + len(linhas) - 1} de {total} análises")
+    c1, c2 = st.columns(2)
+    with c1:
+        if pagina > 0 and st.button("← Mais recentes", use_container_width=True):
+            cursores.pop()
+            st.rerun()
+    with c2:
+        if tem_proxima and st.button("Mais antigas →", use_container_width=True):
+            cursores.append(linhas[-1]['id'])
+            st.rerun()
 
 # --- MAIN APP ---
 def main():
@@ -1,7 +1,8 @@
-import yt_dlp
-import whisper
 import os
 import sys
+from registro_modelos import obter_modelo_whisper
+from plano_formatos import FORMATO_AUDIO
+import baixador
 
 # --- CONFIGURAÇÕES ---
 # Modelos disponíveis: tiny, base, small, medium, large
@@ -11,52 +12,19 @@ PASTA_TEMP = "temp_download"
 
 def baixar_apenas_audio(url_video):
     """
-    Baixa o vídeo da URL, extrai o áudio em MP3 e deleta o vídeo.
-    Retorna o caminho do arquivo MP3.
+    Baixa só o stream de áudio de menor bitrate, no formato original (sem
+    converter para MP3: o Whisper já decodifica direto para 16 kHz mono).
+    Retorna o caminho do arquivo de áudio.
     """
     if not os.path.exists(PASTA_TEMP):
         os.makedirs(PASTA_TEMP)
     
     print(f"\n📥 [1/3] Baixando áudio de: {url_video}...")
-    
-    caminho_base = os.path.join(PASTA_TEMP, "audio_analise")
-    
-    # --- MUDANÇA AQUI: Camuflagem Anti-Bot ---
-    opcoes_download = {
-        'format': 'bestaudio/best',
-        'outtmpl': caminho_base,
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-        'quiet': True,
-        'no_warnings': True,
-        
-        # 1. Fingir ser um navegador Desktop moderno
-        'http_headers': {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-us,en;q=0.5',
-        },
-        
-        # 2. Truque Mestre: Tentar usar clientes que não pedem login agressivo
-        # Isso força o yt-dlp a tentar emular um Android ou TV se a Web falhar
-        'extractor_args': {
-            'youtube': {
-                'player_client': ['android', 'ios', 'web']
-            }
-        },
-        
-        # 3. Ignorar verificação de certificado SSL (ajuda em algumas redes)
-        'nocheckcertificate': True,
-    }
 
+    # Cookies, cabeçalhos e os clientes alternativos do YouTube vêm do serviço de download
     try:
-        with yt_dlp.YoutubeDL(opcoes_download) as ydl:
-            ydl.download([url_video])
-        
-        return f"{caminho_base}.mp3"
+        midia = baixador.baixar_para(url_video, PASTA_TEMP, formato=FORMATO_AUDIO)
+        return midia["audio"]
     except Exception as e:
         print(f"❌ Erro no download: {e}")
         return None
@@ -71,9 +39,9 @@ def transcrever_audio(caminho_arquivo):
     print(f"\n🧠 [2/3] Carregando modelo '{MODELO_ESCOLHIDO}'... (Aguarde)")
     
     # Aqui ele baixa o modelo na primeira vez (aprox 1.5GB)
-    # Device="cuda" usa sua placa de vídeo (se tiver NVIDIA). Se der erro, mude para "cpu".
+    # O registro mantém o modelo em memória, então as próximas chamadas não recarregam.
     try:
-        modelo = whisper.load_model(MODELO_ESCOLHIDO) # O sistema escolhe CPU ou GPU auto
+        modelo, _ = obter_modelo_whisper(MODELO_ESCOLHIDO) # O sistema escolhe CPU ou GPU auto
     except Exception as e:
         print(f"Erro ao carregar modelo: {e}")
         return None
@@ -1,8 +1,8 @@
-import yt_dlp
-import cv2
-import ollama
+import baixador
+import cliente_ollama
+import telemetria
 import os
-import time
+from amostragem_frames import amostrar_frames, redimensionar, codificar_imagem, PONTOS_PADRAO
 
 # --- MUDANÇA: USANDO O NOVO MODELO DA META ---
 PASTA_VISAO = "temp_visual"
@@ -17,55 +17,26 @@ def limpar_pasta():
 
 def baixar_video_visual(url):
     print(f"1. 📥 Baixando vídeo com {MODELO_VISAO}...")
-    caminho_saida = os.path.join(PASTA_VISAO, "video_teste.mp4")
-    
-    arquivo_cookies = None
-    if "tiktok.com" in url: arquivo_cookies = "cookies_tiktok.txt"
-    elif "instagram.com" in url: arquivo_cookies = "cookies_instagram.txt"
-    if arquivo_cookies and not os.path.exists(arquivo_cookies): arquivo_cookies = None
-
-    opcoes = {
-        'format': 'best[ext=mp4]',
-        'outtmpl': os.path.join(PASTA_VISAO, 'video_teste.%(ext)s'),
-        'quiet': True, 'no_warnings': True, 'nocheckcertificate': True,
-        'http_headers': {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0.4472.124 Safari/537.36'},
-        'cookiefile': arquivo_cookies,
-    }
-
     try:
-        with yt_dlp.YoutubeDL(opcoes) as ydl:
-            ydl.download([url])
-        if os.path.exists(caminho_saida):
-            return caminho_saida
+        return baixador.baixar_para(url, PASTA_VISAO, formato=baixador.FORMATO_UNICO)["video"]
     except Exception:
         return None
-    return None
 
 def analisar_frames(caminho_video):
     print("2. 📸 Extraindo frames...")
     
-    cap = cv2.VideoCapture(caminho_video)
-    if not cap.isOpened(): return
-
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    pontos = [0.15, 0.50, 0.85]
+    # Decodifica o vídeo uma vez só, sem seeks (timestamps reais de cada frame)
+    amostras = amostrar_frames(caminho_video, modo="pontos", pontos=PONTOS_PADRAO)
+    if not amostras: return
     
-    for i, p in enumerate(pontos):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, int(total_frames * p))
-        ret, frame = cap.read()
-        if not ret: continue
-
+    for i, amostra in enumerate(amostras):
         # --- AJUSTE 1: Aumentar para 960px (Melhor OCR) ---
-        altura, largura = frame.shape[:2]
-        nova_largura = 960 # Aumentei de 640 para 960 para ler legendas pequenas
-        fator = nova_largura / largura
-        nova_altura = int(altura * fator)
-        frame_redimensionado = cv2.resize(frame, (nova_largura, nova_altura))
+        frame_redimensionado = redimensionar(amostra["frame"]) # 960px para ler legendas pequenas
 
-        nome_foto = os.path.join(PASTA_VISAO, f"frame_{i}.jpg")
-        cv2.imwrite(nome_foto, frame_redimensionado)
+        # Codifica em memória e manda os bytes direto para o modelo
+        imagem, ms_codificacao = codificar_imagem(frame_redimensionado)
         
-        print(f"   ✅ Frame {i+1} capturado (960px). Analisando...")
+        print(f"   ✅ Frame {i+1} capturado em {amostra['timestamp_s']:.1f}s (960px, {len(imagem)/1024:.0f}KB em {ms_codificacao:.1f}ms). Analisando...")
 
         # --- AJUSTE 2: Prompt Específico para Legendas ---
         prompt = """
@@ -88,16 +59,16 @@ def analisar_frames(caminho_video):
         """
 
         try:
-            inicio_ia = time.time()
-            resposta = ollama.chat(
-                model=MODELO_VISAO, 
-                messages=[{'role': 'user', 'content': prompt, 'images': [nome_foto]}],
-                options={
-                    'temperature': 0.1,  # Um pouquinho de criatividade ajuda a ler textos difíceis
-                    'num_predict': 400,  # Aumentei o limite para caber o texto longo
-                }
-            )
-            tempo = time.time() - inicio_ia
+            with telemetria.span("visao_chamada") as s:
+                resposta = cliente_ollama.chat(
+                    MODELO_VISAO,
+                    [{'role': 'user', 'content': prompt, 'images': [imagem]}],
+                    opcoes={
+                        'temperature': 0.1,  # Um pouquinho de criatividade ajuda a ler textos difíceis
+                        'num_predict': 400,  # Aumentei o limite para caber o texto longo
+                    }
+                )
+            tempo = s["duracao_s"]
             conteudo = resposta['message']['content'].strip()
         except Exception as e:
             conteudo = f"Erro na IA: {e}"
@@ -108,8 +79,6 @@ def analisar_frames(caminho_video):
         print(f"   {conteudo}")
         print("   " + "-"*40 + "\n")
 
-    cap.release()
-
 def main():
     limpar_pasta()
     print("=== TESTE DE VISÃO (Llama 3.2 Vision) ===")
@@ -0,0 +1,154 @@
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- SERVIDOR OLLAMA FALSO ---
+# Responde /api/chat como o Ollama, sem GPU e sem modelo, com latência
+# configurável. Serve para medir o pipeline (filas, paralelismo, empacotamento,
+# parse do veredito) sem depender do hardware nem do humor do modelo.
+#
+# Latência de cada chamada:
+#   LATENCIA_BASE_S + tokens_prompt * PREFILL_POR_TOKEN_S + tokens_gerados * LATENCIA_POR_TOKEN_S
+# e no máximo PARALELO chamadas são atendidas ao mesmo tempo (como OLLAMA_NUM_PARALLEL).
+#
+# Uso: python ollama_falso.py [--porta 11435] [--latencia-ms 300] [--ms-por-token 20] [--paralelo 1]
+#      depois: OLLAMA_HOST=http://127.0.0.1:11435 python api.py
+LATENCIA_BASE_S = 0.3
+PREFILL_POR_TOKEN_S = 0.0002
+LATENCIA_POR_TOKEN_S = 0.02
+PARALELO = 1
+TOKENS_POR_IMAGEM = 600          # O que uma imagem custa de prompt num modelo de visão
+
+RESPOSTA_VISAO = "CENA: Pessoa falando para a câmera em ambiente interno.\nTEXTO: Sem texto\nALERTA: nenhum"
+VEREDITO = {"status": "APROVADO", "regras_violadas": [], "evidencias": [], "confianca": 0.9,
+            "motivo": "Nenhuma evidência de violação das regras."}
+
+def _contar_tokens(mensagens):
+    texto = sum(len(m.get("content") or "") for m in mensagens) // 4
+    imagens = sum(len(m.get("images") or []) for m in mensagens)
+    return texto + imagens * TOKENS_POR_IMAGEM
+
+def _responder(pedido):
+    """Texto da resposta conforme o tipo de chamada (visão, juiz ou resumo)."""
+    mensagens = pedido.get("messages") or []
+    ultima = (mensagens[-1].get("content") or "") if mensagens else ""
+    if any(m.get("images") for m in mensagens):
+        if "quadros" in ultima:
+            n = next((int(p) for p in ultima.split() if p.isdigit()), 1)
+            return "\n\n".join(f"QUADRO #{i}\n{RESPOSTA_VISAO}" for i in range(1, n + 1))
+        return RESPOSTA_VISAO
+    if isinstance(pedido.get("format"), dict) or pedido.get("format") == "json":
+        return json.dumps(VEREDITO, ensure_ascii=False)
+    if "Resuma" in ultima:
+        return "Resumo: a pessoa fala sobre o dia a dia, sem menção a dinheiro ou ofensas."
+    return f"STATUS: {VEREDITO['status']}\nMOTIVO: {VEREDITO['motivo']}"
+
+class _Manipulador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, formato, *args):
+        pass  # Sem log por requisição: atrapalha a saída do benchmark
+
+    def _json(self, corpo, status=200):
+        dados = json.dumps(corpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            return self._json({"version": "0.0.0-falso"})
+        if self.path in ("/api/tags", "/api/ps"):
+            return self._json({"models": []})
+        if self.path == "/":
+            return self._json({"status": "Ollama is running"})
+        self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        pedido = json.loads(self.rfile.read(tamanho) or b"{}")
+        if self.path != "/api/chat":
+            return self._json({"error": f"{self.path} não existe no servidor falso"}, 404)
+
+        servidor = self.server
+        conteudo = _responder(pedido)
+        tokens_prompt = _contar_tokens(pedido.get("messages") or [])
+        limite = (pedido.get("options") or {}).get("num_predict")
+        pedacos = conteudo.split(" ")
+        if limite:
+            pedacos = pedacos[:limite]
+        prefill_s = tokens_prompt * servidor.prefill_por_token_s
+
+        with servidor.vagas:
+            servidor.chamadas += 1
+            inicio = time.perf_counter()
+            time.sleep(servidor.latencia_base_s + prefill_s)
+            base = {"model": pedido.get("model"), "created_at": datetime.now(timezone.utc).isoformat()}
+            final = {
+                **base, "message": {"role": "assistant", "content": ""}, "done": True, "done_reason": "stop",
+                "prompt_eval_count": tokens_prompt, "prompt_eval_duration": int(prefill_s * 1e9),
+                "eval_count": len(pedacos), "load_duration": 0,
+            }
+
+            if pedido.get("stream") is False:
+                time.sleep(len(pedacos) * servidor.latencia_por_token_s)
+                final["message"]["content"] = " ".join(pedacos)
+                final["total_duration"] = int((time.perf_counter() - inicio) * 1e9)
+                return self._json(final)
+
+            # Streaming: NDJSON em blocos chunked, um pedaço por "token"
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, pedaco in enumerate(pedacos):
+                time.sleep(servidor.latencia_por_token_s)
+                texto = pedaco if i == 0 else f" {pedaco}"
+                self._pedaco({**base, "message": {"role": "assistant", "content": texto}, "done": False})
+            final["total_duration"] = int((time.perf_counter() - inicio) * 1e9)
+            self._pedaco(final)
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _pedaco(self, corpo):
+        dados = (json.dumps(corpo, ensure_ascii=False) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(dados):x}\r\n".encode("ascii") + dados + b"\r\n")
+        self.wfile.flush()
+
+def iniciar_servidor(porta=0, latencia_base_s=LATENCIA_BASE_S, latencia_por_token_s=LATENCIA_POR_TOKEN_S,
+                     prefill_por_token_s=PREFILL_POR_TOKEN_S, paralelo=PARALELO):
+    """Sobe o servidor numa thread. Retorna (servidor, url); porta 0 = qualquer porta livre."""
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), _Manipulador)
+    servidor.daemon_threads = True
+    servidor.latencia_base_s = latencia_base_s
+    servidor.latencia_por_token_s = latencia_por_token_s
+    servidor.prefill_por_token_s = prefill_por_token_s
+    servidor.vagas = threading.BoundedSemaphore(paralelo)
+    servidor.chamadas = 0
+    threading.Thread(target=servidor.serve_forever, name="ollama-falso", daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API de chat do Ollama.")
+    parser.add_argument("--porta", type=int, default=11435)
+    parser.add_argument("--latencia-ms", type=float, default=LATENCIA_BASE_S * 1000)
+    parser.add_argument("--ms-por-token", type=float, default=LATENCIA_POR_TOKEN_S * 1000)
+    parser.add_argument("--paralelo", type=int, default=PARALELO)
+    args = parser.parse_args()
+
+    servidor, url = iniciar_servidor(args.porta, args.latencia_ms / 1000, args.ms_por_token / 1000,
+                                     paralelo=args.paralelo)
+    print(f"🤖 Ollama falso em {url} (base {args.latencia_ms:.0f}ms, {args.ms_por_token:.0f}ms/token, "
+          f"{args.paralelo} em paralelo). Ctrl+C para sair.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# --- CONFIGURAÇÕES DAS PASTAS DE TRABALHO ---
+PASTA_BASE = "temp_moderacao_unificada"
+LIMITE_POR_JOB_MB = 500          # Tamanho máximo de mídia que um job pode gravar
+ESPACO_MINIMO_LIVRE_MB = 1024    # Não começa um job novo se o disco estiver abaixo disso
+IDADE_MAX_ORFAO_S = 2 * 60 * 60  # Pastas sem dono mais velhas que isso são apagadas
+INTERVALO_FAXINA_S = 10 * 60
+PREFIXO_JOB = "job_"             # A faxina só mexe em pastas com esse nome
+ARQUIVO_DONO = ".dono"           # Travado pelo processo dono enquanto o job roda
+
+class EspacoInsuficiente(Exception):
+    """O disco ou a cota do job não comportam a mídia."""
+
+_faxineiro = None
+
+def tamanho_pasta_mb(pasta):
+    total = 0
+    for raiz, _, arquivos in os.walk(pasta):
+        for nome in arquivos:
+            try:
+                total += os.path.getsize(os.path.join(raiz, nome))
+            except OSError:
+                pass
+    return total / (1024 * 1024)
+
+def verificar_cota(pasta):
+    """Levanta EspacoInsuficiente se a pasta do job passou da cota."""
+    usado = tamanho_pasta_mb(pasta)
+    if usado > LIMITE_POR_JOB_MB:
+        raise EspacoInsuficiente(f"Job usou {usado:.0f}MB (limite {LIMITE_POR_JOB_MB}MB).")
+
+def _travar(arquivo):
+    """Trava exclusiva e sem espera no arquivo. False se outro processo já tem a trava."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def _tem_dono(pasta):
+    """
+    True se algum processo vivo ainda trabalha na pasta. A trava do sistema
+    operacional some sozinha quando o processo morre, então vale entre vários
+    processos da API e depois de um crash.
+    """
+    try:
+        with open(os.path.join(pasta, ARQUIVO_DONO), "a+b") as arquivo:
+            return not _travar(arquivo)
+    except FileNotFoundError:
+        return False
+
+@contextmanager
+def pasta_trabalho():
+    """
+    Cria uma pasta exclusiva para o job e garante que ela seja apagada no fim,
+    mesmo se a análise der erro. Assim análises simultâneas não se atropelam.
+    """
+    os.makedirs(PASTA_BASE, exist_ok=True)
+    livre_mb = shutil.disk_usage(PASTA_BASE).free / (1024 * 1024)
+    if livre_mb < ESPACO_MINIMO_LIVRE_MB:
+        raise EspacoInsuficiente(f"Só {livre_mb:.0f}MB livres em disco (mínimo {ESPACO_MINIMO_LIVRE_MB}MB).")
+
+    pasta = os.path.join(PASTA_BASE, f"{PREFIXO_JOB}{uuid.uuid4().hex}")
+    os.makedirs(pasta)
+    dono = open(os.path.join(pasta, ARQUIVO_DONO), "a+b")
+    _travar(dono)
+    try:
+        yield pasta
+    finally:
+        dono.close()
+        shutil.rmtree(pasta, ignore_errors=True)
+
+def limpar_orfaos(idade_max_s=IDADE_MAX_ORFAO_S):
+    """
+    Apaga pastas de jobs antigos que ficaram para trás (ex: processo morto no meio).
+    Só pastas job_* sem processo dono; o resto de PASTA_BASE não é tocado.
+    """
+    if not os.path.isdir(PASTA_BASE):
+        return 0
+    agora = time.time()
+    removidas = 0
+    for nome in os.listdir(PASTA_BASE):
+        caminho = os.path.join(PASTA_BASE, nome)
+        if not nome.startswith(PREFIXO_JOB) or not os.path.isdir(caminho):
+            continue
+        try:
+            if agora - os.path.getmtime(caminho) < idade_max_s or _tem_dono(caminho):
+                continue
+            shutil.rmtree(caminho, ignore_errors=True)
+            removidas += 1
+        except OSError:
+            pass
+    if removidas:
+        print(f"🧹 Faxina: {removidas} pasta(s) de job órfã(s) removida(s) de '{PASTA_BASE}'.")
+    return removidas
+
+def iniciar_faxineiro(intervalo_s=INTERVALO_FAXINA_S):
+    """Sobe uma thread em segundo plano que roda limpar_orfaos periodicamente."""
+    global _faxineiro
+    if _faxineiro is not None:
+        return
+
+    def _loop():
+        while True:
+            limpar_orfaos()
+            time.sleep(intervalo_s)
+
+    _faxineiro = threading.Thread(target=_loop, name="faxineiro-temp", daemon=True)
+    _faxineiro.start()
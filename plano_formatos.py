@@ -0,0 +1,84 @@
+import copy
+import glob
+import os
+import yt_dlp
+
+# --- PLANO DE FORMATOS ---
+# Em vez de um único 'best[ext=mp4]', cada análise baixa só o que precisa:
+#   - Áudio: o stream de menor bitrate (o Whisper reamostra para 16 kHz mono de qualquer jeito)
+#   - Vídeo: o menor stream com pelo menos LARGURA_VIDEO px, sem áudio quando possível
+LARGURA_VIDEO = 960
+FORMATO_AUDIO = "worstaudio[acodec!=none]/worst[acodec!=none]"
+# AV1 fica de fora porque nem toda build do OpenCV decodifica
+FORMATO_VIDEO = (
+    f"worstvideo[width>={LARGURA_VIDEO}][vcodec!*=av01]"
+    f"/bestvideo[width<{LARGURA_VIDEO}][vcodec!*=av01]"
+    f"/worst[width>={LARGURA_VIDEO}][vcodec!=none]"
+    f"/best[vcodec!=none]"
+)
+
+def _selecionar(ydl_opcoes, info, formato):
+    """Descobre qual formato o yt-dlp escolheria, sem baixar nada."""
+    with yt_dlp.YoutubeDL({**ydl_opcoes, "format": formato}) as ydl:
+        escolhido = ydl.process_ie_result(copy.deepcopy(info), download=False)
+    return escolhido.get("format_id"), escolhido
+
+def _tem_codec(escolhido, campo):
+    """True se o formato escolhido tem o codec (acodec/vcodec); nos pares vídeo+áudio olha cada parte."""
+    partes = escolhido.get("requested_formats") or [escolhido]
+    return any(p.get(campo) not in (None, "none") for p in partes)
+
+def baixar_formato(ydl_opcoes, info, format_id, caminho_base):
+    """Baixa o formato (id ou seletor do yt-dlp) de um info já extraído. Retorna o caminho ou None."""
+    opcoes = {**ydl_opcoes, "format": format_id, "outtmpl": f"{caminho_base}.%(ext)s"}
+    with yt_dlp.YoutubeDL(opcoes) as ydl:
+        resultado = ydl.process_ie_result(copy.deepcopy(info), download=True)
+    baixados = resultado.get("requested_downloads") or []
+    if baixados and os.path.exists(baixados[0].get("filepath", "")):
+        return baixados[0]["filepath"]
+    arquivos = glob.glob(f"{caminho_base}.*")
+    return arquivos[0] if arquivos else None
+
+def baixar_midia_planejada(url, pasta, ydl_opcoes, info=None):
+    """
+    Consulta os formatos uma vez e baixa o menor áudio e o vídeo no tamanho
+    da análise. Quando a plataforma só oferece arquivos com áudio+vídeo
+    juntos (comum no TikTok), baixa só o arquivo do vídeo e tira o áudio dele.
+
+    `info` é o resultado de uma extração já feita (ex: pelo extrator
+    compartilhado de baixador.py); sem ele, extrai aqui.
+    Retorna {"audio": caminho, "video": caminho, "formatos": {...}, "bytes": total}.
+    Levanta exceção se não conseguir; o chamador cai no download antigo.
+    """
+    ydl_opcoes = {k: v for k, v in ydl_opcoes.items() if k not in ("format", "outtmpl", "postprocessors")}
+    if info is None:
+        with yt_dlp.YoutubeDL(ydl_opcoes) as ydl:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+
+    id_audio, escolhido_audio = _selecionar(ydl_opcoes, info, FORMATO_AUDIO)
+    id_video, escolhido_video = _selecionar(ydl_opcoes, info, FORMATO_VIDEO)
+    if not id_audio or not id_video:
+        raise ValueError("Nenhum formato compatível encontrado.")
+
+    # Sem stream só de áudio, o "áudio" seria outro arquivo completo: o áudio sai
+    # do próprio download de vídeo, se ele tiver áudio.
+    if _tem_codec(escolhido_audio, "vcodec") and _tem_codec(escolhido_video, "acodec"):
+        id_audio = id_video
+
+    if id_audio == id_video:
+        caminho = baixar_formato(ydl_opcoes, info, id_video, os.path.join(pasta, "midia_analise"))
+        caminho_audio = caminho_video = caminho
+    else:
+        caminho_audio = baixar_formato(ydl_opcoes, info, id_audio, os.path.join(pasta, "audio_analise"))
+        caminho_video = baixar_formato(ydl_opcoes, info, id_video, os.path.join(pasta, "video_analise"))
+
+    if not caminho_audio or not caminho_video:
+        raise ValueError("Download planejado não gerou os arquivos esperados.")
+
+    arquivos = {caminho_audio, caminho_video}
+    return {
+        "audio": caminho_audio,
+        "video": caminho_video,
+        "formatos": {"audio": id_audio, "video": id_video},
+        "bytes": sum(os.path.getsize(a) for a in arquivos),
+    }
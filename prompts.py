@@ -0,0 +1,159 @@
+import hashlib
+
+# --- REGISTRO DE PROMPTS ---
+# Cada prompt tem versões numeradas. A partir da v2 o texto fixo (instruções,
+# regras, formato da resposta) vai numa mensagem "system" idêntica em toda
+# requisição e só o que muda (evidências, quantidade de quadros) vai na
+# mensagem "user" depois dele. Assim o Ollama reaproveita o KV-cache do
+# prefixo e só faz o prefill do sufixo.
+# A v1 é o layout antigo (tudo numa mensagem, evidência no meio), mantida
+# para comparação em benchmark_prefixo.py.
+
+FORMATOS_RESPOSTA_JUIZ = {
+    "json": """Responda SOMENTE com um JSON com os campos:
+status ("APROVADO" ou "REPROVADO"), regras_violadas (números das regras, [] se nenhuma),
+evidencias (trechos curtos ou instantes, ex: "transcrição: ..." ou "12.3s: ..."),
+confianca (0 a 1) e motivo (uma frase, no máximo 25 palavras).""",
+    "texto": """Responda no seguinte formato:
+
+STATUS: [APROVADO / REPROVADO]
+MOTIVO: [Explicação curta citando a regra violada e a evidência encontrada]""",
+}
+
+_INSTRUCOES_VISAO = """Atue como um especialista em Moderação de Conteúdo Brasileiro."""
+_ITENS_VISAO = """1. CENA: Descreva quem está na imagem e o que fazem.
+2. TEXTO: Transcreva TODO texto visível na tela (Título e Legendas). Se não houver, diga "Sem texto".
+3. ALERTA: Cite se há nudez, violência ou armas.
+
+Responda APENAS em Português do Brasil."""
+
+MODELOS_PROMPT = {
+    "juiz": {
+        1: {
+            "sistema": None,
+            "usuario": """
+    Você é o Auditor Chefe de uma competição de vídeos.
+    Sua decisão é final. Analise as evidências abaixo e aplique as regras rigorosamente.
+
+    AS REGRAS:
+    {regras}
+
+    EVIDÊNCIAS COLETADAS:
+    ---------------------
+    1. TRANSCRIÇÃO (O que foi falado):
+    "{texto_audio}"
+
+    2. ANÁLISE VISUAL (O que foi visto):
+    {relatorio_visual}
+    ---------------------
+
+    VEREDITO:
+    Baseado nas regras, o vídeo foi APROVADO ou REPROVADO?
+    {formato_resposta}
+    """,
+        },
+        2: {
+            "sistema": """Você é o Auditor Chefe de uma competição de vídeos.
+Sua decisão é final. Analise as evidências enviadas pelo usuário e aplique as regras rigorosamente.
+
+AS REGRAS:
+{regras}
+
+VEREDITO:
+Baseado nas regras, o vídeo foi APROVADO ou REPROVADO?
+{formato_resposta}""",
+            "usuario": """EVIDÊNCIAS COLETADAS:
+1. TRANSCRIÇÃO (O que foi falado):
+"{texto_audio}"
+
+2. ANÁLISE VISUAL (O que foi visto):
+{relatorio_visual}""",
+        },
+        # v3: a pontuação do classificador de texto entra como indício (no sufixo, o prefixo continua igual)
+        3: {
+            "sistema": """Você é o Auditor Chefe de uma competição de vídeos.
+Sua decisão é final. Analise as evidências enviadas pelo usuário e aplique as regras rigorosamente.
+
+AS REGRAS:
+{regras}
+
+VEREDITO:
+Baseado nas regras, o vídeo foi APROVADO ou REPROVADO?
+{formato_resposta}""",
+            "usuario": """EVIDÊNCIAS COLETADAS:
+1. TRANSCRIÇÃO (O que foi falado):
+"{texto_audio}"
+
+2. ANÁLISE VISUAL (O que foi visto):
+{relatorio_visual}
+
+3. INDÍCIOS DO CLASSIFICADOR DE TEXTO (palavras-chave; só uma pista, confira o contexto):
+{indicios}""",
+        },
+    },
+    "visao_frame": {
+        1: {
+            "sistema": None,
+            "usuario": f"""
+        {_INSTRUCOES_VISAO}
+
+        {_ITENS_VISAO}
+        """,
+        },
+        2: {
+            "sistema": f"{_INSTRUCOES_VISAO}\n\nPara a imagem enviada, responda:\n{_ITENS_VISAO}",
+            "usuario": "Analise este quadro do vídeo.",
+        },
+    },
+    "visao_agrupado": {
+        1: {
+            "sistema": None,
+            "usuario": f"""
+        {_INSTRUCOES_VISAO}
+        Você recebeu {{n}} quadros do mesmo vídeo, numerados de #1 a #{{n}} ({{origem}}).
+
+        Para CADA quadro, em ordem, responda com o cabeçalho "QUADRO #N" e:
+        {_ITENS_VISAO}
+        """,
+        },
+        2: {
+            "sistema": f"""{_INSTRUCOES_VISAO}
+Você vai receber vários quadros do mesmo vídeo, numerados a partir de #1.
+
+Para CADA quadro, em ordem, responda com o cabeçalho "QUADRO #N" e:
+{_ITENS_VISAO}""",
+            "usuario": "São {n} quadros, de #1 a #{n} ({origem}).",
+        },
+    },
+    "resumo_transcricao": {
+        1: {
+            "sistema": """Você resume trechos de transcrição de vídeos, em Português do Brasil.
+Mantenha literalmente qualquer menção a dinheiro, promessas financeiras, ofensas, violência, armas ou nudez.""",
+            "usuario": """Resuma o trecho abaixo em no máximo {palavras} palavras.
+
+TRECHO:
+{texto}""",
+        },
+    },
+}
+
+VERSOES_ATIVAS = {"juiz": 3, "visao_frame": 2, "visao_agrupado": 2, "resumo_transcricao": 1}
+
+def montar(nome, versao=None, **variaveis):
+    """
+    Monta as mensagens do prompt `nome` na versão pedida (padrão: VERSOES_ATIVAS).
+    Variáveis que não aparecem numa das partes são ignoradas nela.
+    """
+    modelo = MODELOS_PROMPT[nome][versao or VERSOES_ATIVAS[nome]]
+    mensagens = []
+    if modelo["sistema"]:
+        mensagens.append({'role': 'system', 'content': modelo["sistema"].format(**variaveis)})
+    mensagens.append({'role': 'user', 'content': modelo["usuario"].format(**variaveis)})
+    return mensagens
+
+def assinatura(nome, versao=None):
+    """'nome@vN:hash' — muda se a versão ativa ou o texto do template mudar (usado nas chaves de cache)."""
+    versao = versao or VERSOES_ATIVAS[nome]
+    modelo = MODELOS_PROMPT[nome][versao]
+    digest = hashlib.sha256(f"{modelo['sistema']}\x00{modelo['usuario']}".encode("utf-8")).hexdigest()[:8]
+    return f"{nome}@v{versao}:{digest}"
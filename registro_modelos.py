@@ -0,0 +1,120 @@
+import numpy as np
+import threading
+import time
+import gc
+from collections import OrderedDict
+import transcricao
+
+# --- CONFIGURAÇÕES DO REGISTRO ---
+# Os modelos são guardados por (motor, tamanho); o motor vem de transcricao.MOTOR_TRANSCRICAO.
+# Quantos modelos de transcrição podem ficar na memória ao mesmo tempo.
+# Ao passar do limite, o modelo usado há mais tempo é descarregado (LRU).
+MAX_MODELOS_CARREGADOS = 2
+# Limite opcional de memória (MB) somando os pesos de todos os modelos. None = sem limite.
+LIMITE_MEMORIA_MB = None
+
+_modelos = OrderedDict()      # "motor:tamanho" -> motor carregado (ordem = uso mais recente no fim)
+_tempo_carga = {}             # "motor:tamanho" -> segundos gastos no último carregamento
+_travas_carga = {}            # "motor:tamanho" -> Lock (evita carregar o mesmo modelo 2x em paralelo)
+_trava = threading.Lock()
+
+_estatisticas = {
+    "carregamentos": 0,
+    "reaproveitamentos": 0,
+    "descartes": 0,
+    "tempo_carga_total_s": 0.0,
+    "tempo_economizado_total_s": 0.0,
+}
+
+def _memoria_total_mb():
+    return sum(m.tamanho_mb() for m in _modelos.values())
+
+def _aplicar_limites():
+    """Descarrega os modelos menos usados até respeitar os limites. Chamar com a trava."""
+    while len(_modelos) > 1 and (
+        len(_modelos) > MAX_MODELOS_CARREGADOS
+        or (LIMITE_MEMORIA_MB is not None and _memoria_total_mb() > LIMITE_MEMORIA_MB)
+    ):
+        nome, _ = _modelos.popitem(last=False)
+        _estatisticas["descartes"] += 1
+        print(f"🗑️  Whisper '{nome}' descarregado da memória (limite do registro).")
+
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+def obter_modelo_whisper(tamanho, motor=None):
+    """
+    Devolve o modelo de transcrição já carregado, ou carrega na primeira vez.
+    O motor padrão é transcricao.MOTOR_TRANSCRICAO ("whisper" ou "ctranslate2").
+    Retorna (modelo, segundos_economizados) — a economia é o tempo que a
+    carga teria custado se o modelo não estivesse em memória.
+    """
+    motor = motor or transcricao.MOTOR_TRANSCRICAO
+    nome = f"{motor}:{tamanho}"
+    with _trava:
+        if nome in _modelos:
+            _modelos.move_to_end(nome)
+            economia = _tempo_carga.get(nome, 0.0)
+            _estatisticas["reaproveitamentos"] += 1
+            _estatisticas["tempo_economizado_total_s"] += economia
+            return _modelos[nome], economia
+        trava_modelo = _travas_carga.setdefault(nome, threading.Lock())
+
+    with trava_modelo:
+        # Outra thread pode ter terminado de carregar enquanto esperávamos
+        with _trava:
+            if nome in _modelos:
+                _modelos.move_to_end(nome)
+                _estatisticas["reaproveitamentos"] += 1
+                return _modelos[nome], 0.0
+
+        print(f"🧠 Carregando Whisper '{nome}' no registro...")
+        inicio = time.time()
+        modelo = transcricao.criar_motor(motor, tamanho)
+        duracao = time.time() - inicio
+
+        with _trava:
+            _modelos[nome] = modelo
+            _tempo_carga[nome] = duracao
+            _estatisticas["carregamentos"] += 1
+            _estatisticas["tempo_carga_total_s"] += duracao
+            _aplicar_limites()
+
+        print(f"✅ Whisper '{nome}' pronto em {duracao:.1f}s.")
+        return modelo, 0.0
+
+def aquecer_modelos(nomes):
+    """
+    Carrega os modelos na subida do servidor e roda uma transcrição curta
+    de silêncio, para a primeira requisição não pagar a inicialização.
+    """
+    silencio = np.zeros(16000, dtype=np.float32)  # 1 segundo a 16 kHz
+    for nome in nomes:
+        try:
+            modelo, _ = obter_modelo_whisper(nome)
+            modelo.transcribe(silencio, language="pt", fp16=False)
+            print(f"🔥 Whisper '{nome}' aquecido.")
+        except Exception as e:
+            print(f"⚠️  Falha ao aquecer Whisper '{nome}': {e}")
+
+def descarregar_modelo(tamanho, motor=None):
+    nome = f"{motor or transcricao.MOTOR_TRANSCRICAO}:{tamanho}"
+    with _trava:
+        if _modelos.pop(nome, None) is not None:
+            _estatisticas["descartes"] += 1
+    gc.collect()
+
+def estatisticas_modelos():
+    """Resumo do registro para expor na API."""
+    with _trava:
+        return {
+            **_estatisticas,
+            "carregados": list(_modelos.keys()),
+            "memoria_mb": round(_memoria_total_mb(), 1),
+            "tempo_carga_s": {n: round(t, 2) for n, t in _tempo_carga.items()},
+        }
@@ -0,0 +1,202 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# --- AVALIAÇÃO RÁPIDA (sem LLM) ---
+# Antes de gastar chamadas de visão e do juiz, a transcrição passa por checagens
+# baratas e determinísticas. Se uma regra for claramente violada, o veredito sai
+# na hora e o resto do pipeline é cancelado.
+#
+# 1) Termos entre aspas no texto das regras viram expressões exatas
+#    (ex: "urubu do pix" na regra 1, "bucha" na regra 2). Uma expressão de
+#    EXPRESSOES_INEQUIVOCAS basta; as outras precisam de MIN_TERMOS_DISTINTOS.
+# 2) Um classificador por léxico soma pesos de expressões típicas de cada regra;
+#    passando de LIMIAR_CLASSIFICADOR com pelo menos MIN_TERMOS_DISTINTOS termos
+#    diferentes, a regra é considerada violada.
+# Termos com uma negação por perto ("não existe ficar rico fácil", "cuidado com
+# o urubu do pix") não contam para reprovar. O que aparece sem bastar para
+# reprovar (ex: "pistola" num noticiário) não decide nada: vai para o juiz como
+# indício (ver indicios_para_juiz).
+
+LEXICO_CLASSIFICADOR = {
+    1: {  # Promessas financeiras / enriquecimento fácil
+        "dinheiro facil": 2.0, "lucro garantido": 2.5, "renda extra": 1.0, "ganhe dinheiro": 1.5,
+        "fique rico": 2.0, "enriquecer rapido": 2.5, "retorno garantido": 2.5, "multiplicar seu dinheiro": 2.0,
+        "manda o pix": 1.5, "faz o pix": 1.0, "sem trabalhar": 1.0, "por dia": 0.5, "investimento": 0.5,
+    },
+    3: {  # Armas / violência
+        "arma de fogo": 2.0, "pistola": 1.5, "revolver": 1.5, "fuzil": 2.0, "metralhadora": 2.0,
+        "vou te matar": 3.0, "dar um tiro": 2.0, "esfaquear": 2.5,
+    },
+}
+LIMIAR_CLASSIFICADOR = 3.0
+MAX_OCORRENCIAS_POR_TERMO = 2  # Repetir a mesma palavra não infla a pontuação sem limite
+MIN_TERMOS_DISTINTOS = 2       # Uma palavra só ("pistola" num noticiário) nunca reprova sozinha
+# Expressões das regras que reprovam sozinhas: não têm uso inocente
+EXPRESSOES_INEQUIVOCAS = {"urubu do pix"}
+# Palavras que, até JANELA_NEGACAO palavras antes ou depois do termo, indicam alerta ou crítica
+TERMOS_NEGACAO = ("nao", "nunca", "jamais", "nem", "cuidado com", "golpe", "golpes", "golpista",
+                  "fuja", "mentira", "denuncie")
+JANELA_NEGACAO = 4
+
+def normalizar(texto):
+    """Minúsculas e sem acentos, para 'ganância' casar com 'ganancia'."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def _padrao(termo):
+    return re.compile(r"\b" + r"\s+".join(re.escape(p) for p in normalizar(termo).split()) + r"\b")
+
+@lru_cache(maxsize=8)
+def compilar_regras(texto_regras):
+    """
+    Lê o texto das regras e extrai, de cada linha PROIBIDO, os termos entre
+    aspas. Retorna [{"regra": n, "descricao": ..., "termos": [(termo, regex)]}].
+    O resultado fica em cache enquanto o texto das regras não mudar.
+    """
+    regras = []
+    for linha in texto_regras.strip().splitlines():
+        achado = re.match(r"\s*(\d+)\.\s*PROIBIDO:\s*(.+)", linha)
+        if not achado:
+            continue
+        termos = re.findall(r'"([^"]+)"', achado.group(2))
+        regras.append({
+            "regra": int(achado.group(1)),
+            "descricao": achado.group(2).strip(),
+            "termos": [(t, _padrao(t)) for t in termos],
+        })
+    return regras
+
+_NEGACAO = re.compile(
+    r"\b(?:" + "|".join(r"\s+".join(map(re.escape, t.split())) for t in TERMOS_NEGACAO) + r")\b")
+
+def _negado(normalizado, achado):
+    """True se há uma negação a até JANELA_NEGACAO palavras do trecho encontrado."""
+    antes = normalizado[:achado.start()].split()[-JANELA_NEGACAO:]
+    depois = normalizado[achado.end():].split()[:JANELA_NEGACAO]
+    return bool(_NEGACAO.search(" ".join(antes))) or bool(_NEGACAO.search(" ".join(depois)))
+
+def _ocorrencias(padrao, normalizado):
+    """(afirmativas, negadas) do termo no texto."""
+    afirmativas = negadas = 0
+    for achado in padrao.finditer(normalizado):
+        if _negado(normalizado, achado):
+            negadas += 1
+        else:
+            afirmativas += 1
+    return afirmativas, negadas
+
+_LEXICO_COMPILADO = {
+    regra: [(termo, _padrao(termo), peso) for termo, peso in termos.items()]
+    for regra, termos in LEXICO_CLASSIFICADOR.items()
+}
+
+def padroes_relevantes(regras_compiladas):
+    """Regex de todos os termos das regras e do léxico (para achar os trechos que importam)."""
+    return ([padrao for regra in regras_compiladas for _, padrao in regra["termos"]]
+            + [padrao for termos in _LEXICO_COMPILADO.values() for _, padrao, _ in termos])
+
+def _pontuar(normalizado):
+    """
+    Pontuação do léxico por regra, só com ocorrências sem negação por perto:
+    [{"regra", "pontuacao", "termos", "negados"}] das regras com algum termo.
+    """
+    pontuacoes = []
+    for regra, termos in _LEXICO_COMPILADO.items():
+        pontuacao = 0.0
+        encontrados, negados = [], []
+        for termo, padrao, peso in termos:
+            afirmativas, negadas = _ocorrencias(padrao, normalizado)
+            if afirmativas:
+                pontuacao += peso * min(afirmativas, MAX_OCORRENCIAS_POR_TERMO)
+                encontrados.append(termo)
+            elif negadas:
+                negados.append(termo)
+        if encontrados or negados:
+            pontuacoes.append({"regra": regra, "pontuacao": pontuacao, "termos": encontrados, "negados": negados})
+    return pontuacoes
+
+def _termos_das_regras(normalizado, regras_compiladas):
+    """Termos entre aspas encontrados, por regra: [(regra, afirmativos, negados)]."""
+    achados = []
+    for regra in regras_compiladas:
+        afirmativos, negados = [], []
+        for termo, padrao in regra["termos"]:
+            afirmativas, negadas = _ocorrencias(padrao, normalizado)
+            if afirmativas:
+                afirmativos.append(termo)
+            elif negadas:
+                negados.append(termo)
+        if afirmativos or negados:
+            achados.append((regra["regra"], afirmativos, negados))
+    return achados
+
+def _expressao_decisiva(afirmativos):
+    # Só expressões sem uso inocente reprovam sozinhas ("ficar rico fácil" aparece em alertas contra golpes)
+    return (any(normalizar(t) in EXPRESSOES_INEQUIVOCAS for t in afirmativos)
+            or len(afirmativos) >= MIN_TERMOS_DISTINTOS)
+
+def _pontuacao_decisiva(pontuacao):
+    return pontuacao["pontuacao"] >= LIMIAR_CLASSIFICADOR and len(pontuacao["termos"]) >= MIN_TERMOS_DISTINTOS
+
+def _lista(termos):
+    return ", ".join(f'"{t}"' for t in termos)
+
+def indicios_para_juiz(texto, regras_compiladas):
+    """
+    Termos e pontuações que apareceram mas não bastaram para reprovar, em texto
+    para o prompt do juiz (pista, não prova). String vazia se não houver nenhum.
+    """
+    if not texto:
+        return ""
+    normalizado = normalizar(texto)
+    linhas = []
+    for regra, afirmativos, negados in _termos_das_regras(normalizado, regras_compiladas):
+        if afirmativos and not _expressao_decisiva(afirmativos):
+            linhas.append(f"- Regra {regra}: termo(s) citado(s) na regra encontrado(s): {_lista(afirmativos)}")
+        if negados:
+            linhas.append(f"- Regra {regra}: termo(s) citado(s) na regra perto de negação/alerta: {_lista(negados)}")
+    for p in _pontuar(normalizado):
+        if p["termos"] and not _pontuacao_decisiva(p):
+            linhas.append(f"- Regra {p['regra']}: pontuação {p['pontuacao']:.1f} "
+                          f"(limiar {LIMIAR_CLASSIFICADOR}) com {_lista(p['termos'])}")
+        if p["negados"]:
+            linhas.append(f"- Regra {p['regra']}: palavra(s)-chave perto de negação/alerta: {_lista(p['negados'])}")
+    return "\n".join(linhas)
+
+def _veredito(regra, motivo):
+    return f"STATUS: REPROVADO\nMOTIVO: Regra {regra} — {motivo}"
+
+def avaliar_texto(texto, regras_compiladas, origem="transcrição"):
+    """
+    Roda as checagens baratas sobre um texto. Só decide quando a violação é
+    clara (ver _expressao_decisiva e _pontuacao_decisiva); o resto fica para o juiz.
+    Retorna None (nada conclusivo) ou {"veredito", "motivo", "decidido_por", "regra", "evidencias"}.
+    """
+    if not texto:
+        return None
+    normalizado = normalizar(texto)
+
+    for regra, afirmativos, _ in _termos_das_regras(normalizado, regras_compiladas):
+        if _expressao_decisiva(afirmativos):
+            motivo = f"termo(s) proibido(s) {_lista(afirmativos)} encontrado(s) na {origem}."
+            return {
+                "veredito": _veredito(regra, motivo),
+                "motivo": motivo,
+                "decidido_por": "regras_transcricao",
+                "regra": regra,
+                "evidencias": afirmativos,
+            }
+
+    for p in _pontuar(normalizado):
+        if _pontuacao_decisiva(p):
+            motivo = (f"classificador de texto pontuou {p['pontuacao']:.1f} "
+                      f"(limiar {LIMIAR_CLASSIFICADOR}) com {_lista(p['termos'])} na {origem}.")
+            return {
+                "veredito": _veredito(p["regra"], motivo),
+                "motivo": motivo,
+                "decidido_por": "classificador_transcricao",
+                "regra": p["regra"],
+                "evidencias": p["termos"],
+            }
+    return None
@@ -0,0 +1,278 @@
+import json
+import os
+import queue
+import subprocess
+import threading
+import urllib.request
+import numpy as np
+import yt_dlp
+from amostragem_frames import LARGURA_ANALISE, FPS_DETECCAO
+
+# --- CONFIGURAÇÕES DO STREAMING ---
+SEGUNDOS_BLOCO_AUDIO = 30   # Janela nativa do Whisper
+TAXA_AUDIO = 16000          # O Whisper trabalha em 16 kHz mono
+BYTES_SONDAGEM = 256 * 1024 # Quanto do começo do MP4 é lido para achar o 'moov'
+BYTES_PEDACO_PIPE = 1024 * 1024
+MAX_PEDACOS_VIDEO = 32      # Frames à espera do consumidor (~32MB); o áudio é pequeno e não tem limite
+
+_trava = threading.Lock()
+
+def _cabecalhos_ffmpeg(cabecalhos):
+    if not cabecalhos:
+        return []
+    return ["-headers", "".join(f"{k}: {v}\r\n" for k, v in cabecalhos.items())]
+
+def _moov_no_inicio(url_midia, cabecalhos):
+    """
+    Um MP4 só dá para processar enquanto baixa se o índice ('moov') vier
+    antes dos dados ('mdat'). Lê o começo do arquivo e percorre os átomos.
+    """
+    pedido = urllib.request.Request(url_midia, headers={**cabecalhos, "Range": f"bytes=0-{BYTES_SONDAGEM - 1}"})
+    try:
+        with urllib.request.urlopen(pedido, timeout=15) as resp:
+            dados = resp.read(BYTES_SONDAGEM)
+    except Exception:
+        return False
+
+    pos = 0
+    while pos + 8 <= len(dados):
+        tamanho = int.from_bytes(dados[pos:pos + 4], "big")
+        tipo = dados[pos + 4:pos + 8]
+        if tipo == b"moov":
+            return True
+        if tipo == b"mdat":
+            return False
+        if tamanho == 1 and pos + 16 <= len(dados):
+            tamanho = int.from_bytes(dados[pos + 8:pos + 16], "big")
+        if tamanho < 8:
+            return False
+        pos += tamanho
+    return False
+
+def _sondar(url_midia, cabecalhos):
+    """Largura, altura, duração e se há áudio no stream remoto, pelo ffprobe."""
+    saida = subprocess.run(
+        ["ffprobe", "-v", "error", *_cabecalhos_ffmpeg(cabecalhos),
+         "-show_entries", "stream=codec_type,width,height:format=duration", "-of", "json", url_midia],
+        capture_output=True, text=True, check=True, timeout=60,
+    ).stdout
+    dados = json.loads(saida)
+    streams = dados.get("streams", [])
+    video = next(s for s in streams if s.get("codec_type") == "video")
+    tem_audio = any(s.get("codec_type") == "audio" for s in streams)
+    duracao = dados.get("format", {}).get("duration")
+    return int(video["width"]), int(video["height"]), float(duracao) if duracao else None, tem_audio
+
+def resolver_stream(url, opcoes):
+    """
+    Pede ao yt-dlp só o endereço direto da mídia (sem baixar).
+    Retorna None quando não dá para fazer streaming — formatos separados de
+    áudio/vídeo, protocolos que o ffmpeg não lê em sequência, ou MP4 com o
+    índice no fim — e o chamador deve usar o download completo.
+    """
+    opcoes = {**opcoes, "skip_download": True}
+    opcoes.pop("outtmpl", None)
+    try:
+        with yt_dlp.YoutubeDL(opcoes) as ydl:
+            info = ydl.extract_info(url, download=False)
+            if info.get("requested_formats") or not info.get("url"):
+                return None
+            protocolo = info.get("protocol") or ""
+            if not protocolo.startswith(("http", "m3u8")):
+                return None
+            url_midia = info["url"]
+            cabecalhos = dict(info.get("http_headers") or {})
+            try:
+                cookie = ydl.cookiejar.get_cookie_header(url_midia)
+                if cookie:
+                    cabecalhos["Cookie"] = cookie
+            except Exception:
+                pass
+    except Exception as e:
+        print(f"⚠️  Streaming indisponível ({e}).")
+        return None
+
+    if protocolo.startswith("http") and info.get("ext") == "mp4" and not _moov_no_inicio(url_midia, cabecalhos):
+        print("ℹ️  MP4 sem 'faststart' (índice no fim): usando download completo.")
+        return None
+
+    try:
+        largura, altura, duracao, tem_audio = _sondar(url_midia, cabecalhos)
+    except Exception as e:
+        print(f"⚠️  ffprobe não conseguiu ler o stream ({e}).")
+        return None
+
+    return {
+        "url": url_midia,
+        "cabecalhos": cabecalhos,
+        "largura": largura,
+        "altura": altura,
+        "tem_audio": tem_audio,
+        "duracao_s": duracao or info.get("duration") or 0.0,
+    }
+
+class _Saida:
+    """
+    Uma saída do ffmpeg compartilhado. Uma thread esvazia o pipe numa fila,
+    para que um consumidor lento (o Whisper) não trave a outra saída; depois
+    que o consumidor desiste, os bytes seguintes são descartados.
+    """
+
+    def __init__(self, arquivo, max_pedacos=0):
+        self._fila = queue.Queue(max_pedacos)
+        self._sobra = bytearray()
+        self._fim = False
+        self.fechada = threading.Event()
+        threading.Thread(target=self._bombear, args=(arquivo,), name="ffmpeg-saida", daemon=True).start()
+
+    def _por(self, item):
+        # Espera vaga na fila, mas desiste se o consumidor fechar a saída
+        while not self.fechada.is_set():
+            try:
+                self._fila.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def _bombear(self, arquivo):
+        try:
+            while True:
+                pedaco = arquivo.read1(BYTES_PEDACO_PIPE)
+                if not pedaco:
+                    break
+                self._por(pedaco)
+        except (OSError, ValueError):
+            pass
+        finally:
+            arquivo.close()
+            self._por(None)
+
+    def ler_exato(self, tamanho):
+        """Até `tamanho` bytes; menos que isso só no fim da saída."""
+        while len(self._sobra) < tamanho and not self._fim:
+            pedaco = self._fila.get()
+            if pedaco is None:
+                self._fim = True
+            else:
+                self._sobra += pedaco
+        dados = bytes(self._sobra[:tamanho])
+        del self._sobra[:tamanho]
+        return dados
+
+class _Decodificador:
+    """
+    Um único ffmpeg por stream, com duas saídas: PCM 16 kHz mono para o Whisper
+    e frames BGR em LARGURA_ANALISE px a FPS_DETECCAO para a visão. A mídia
+    remota é baixada uma vez só. No Windows (sem pass_fds) cada saída tem o
+    seu ffmpeg, como antes.
+    """
+
+    def __init__(self, stream):
+        self.altura = int(round(stream["altura"] * LARGURA_ANALISE / stream["largura"] / 2)) * 2
+        entrada = ["ffmpeg", "-nostdin", "-v", "error", *_cabecalhos_ffmpeg(stream["cabecalhos"]),
+                   "-noautorotate", "-i", stream["url"]]
+        saida_audio = ["-map", "0:a:0", "-ac", "1", "-ar", str(TAXA_AUDIO), "-f", "s16le"]
+        saida_video = ["-map", "0:v:0", "-vf", f"fps={FPS_DETECCAO},scale={LARGURA_ANALISE}:{self.altura}",
+                       "-f", "rawvideo", "-pix_fmt", "bgr24"]
+        self.processos = []
+        self.saidas = {}
+        tem_audio = stream.get("tem_audio", True)
+
+        if os.name == "nt":
+            if tem_audio:
+                self.saidas["audio"] = self._abrir(entrada + saida_audio + ["-"])
+            self.saidas["video"] = self._abrir(entrada + saida_video + ["-"], MAX_PEDACOS_VIDEO)
+            return
+
+        leitura, escrita = os.pipe()
+        argumentos = entrada + saida_video + [f"pipe:{escrita}"]
+        if tem_audio:
+            argumentos += saida_audio + ["pipe:1"]
+        proc = subprocess.Popen(argumentos, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, pass_fds=(escrita,))
+        os.close(escrita)
+        self.processos.append(proc)
+        self.saidas["video"] = _Saida(os.fdopen(leitura, "rb"), MAX_PEDACOS_VIDEO)
+        if tem_audio:
+            self.saidas["audio"] = _Saida(proc.stdout)
+        else:
+            proc.stdout.close()
+
+    def _abrir(self, argumentos, max_pedacos=0):
+        proc = subprocess.Popen(argumentos, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.processos.append(proc)
+        return _Saida(proc.stdout, max_pedacos)
+
+    def liberar(self, nome):
+        """O consumidor da saída terminou; com as duas liberadas, o ffmpeg é encerrado."""
+        saida = self.saidas.get(nome)
+        if saida is not None:
+            saida.fechada.set()
+        if all(s.fechada.is_set() for s in self.saidas.values()):
+            for proc in self.processos:
+                if proc.poll() is None:
+                    proc.kill()
+                proc.wait()
+
+def _decodificador(stream):
+    """O ffmpeg do stream, aberto na primeira leitura (de áudio ou de frames)."""
+    with _trava:
+        if "decodificador" not in stream:
+            stream["decodificador"] = _Decodificador(stream)
+        return stream["decodificador"]
+
+def iterar_audio(stream, segundos_bloco=SEGUNDOS_BLOCO_AUDIO):
+    """
+    O ffmpeg decodifica o áudio direto para PCM 16 kHz mono enquanto baixa.
+    Gera blocos float32 de `segundos_bloco` segundos, prontos para o Whisper.
+    """
+    decodificador = _decodificador(stream)
+    saida = decodificador.saidas.get("audio")
+    tamanho = segundos_bloco * TAXA_AUDIO * 2
+    try:
+        while saida is not None:
+            dados = saida.ler_exato(tamanho)
+            if len(dados) < 2:
+                break
+            dados = dados[:len(dados) - len(dados) % 2]
+            yield np.frombuffer(dados, np.int16).astype(np.float32) / 32768.0
+    finally:
+        decodificador.liberar("audio")
+
+def iterar_frames(stream):
+    """
+    Gera (indice, timestamp_s, frame BGR) a FPS_DETECCAO quadros por segundo,
+    já em LARGURA_ANALISE px, conforme os bytes do vídeo chegam.
+    """
+    decodificador = _decodificador(stream)
+    saida = decodificador.saidas["video"]
+    largura, altura = LARGURA_ANALISE, decodificador.altura
+    tamanho = largura * altura * 3
+    indice = 0
+    try:
+        while True:
+            dados = saida.ler_exato(tamanho)
+            if len(dados) < tamanho:
+                break
+            yield indice, indice / FPS_DETECCAO, np.frombuffer(dados, np.uint8).reshape((altura, largura, 3))
+            indice += 1
+    finally:
+        decodificador.liberar("video")
+
+def escolher_pontos(frames, duracao_s, pontos):
+    """Versão em streaming da amostragem fixa: o primeiro frame que passa de cada ponto."""
+    alvos = sorted(duracao_s * p for p in pontos)
+    escolhidos = []
+    proximo = 0
+    try:
+        for indice, ts, frame in frames:
+            if proximo >= len(alvos):
+                break
+            if ts >= alvos[proximo]:
+                escolhidos.append({"indice": indice, "timestamp_s": round(ts, 3), "frame": frame.copy()})
+                while proximo < len(alvos) and alvos[proximo] <= ts:
+                    proximo += 1
+    finally:
+        # Encerra o ffmpeg assim que o último ponto chega
+        if hasattr(frames, "close"):
+            frames.close()
+    return escolhidos
@@ -0,0 +1,166 @@
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# --- TELEMETRIA ---
+# Spans: cada etapa (download, carga do modelo, transcrição, cada chamada ao
+# Ollama, juiz...) vira um registro com duração, RSS no início e no fim
+# (e a diferença entre os dois) e atributos livres
+# (bytes, tokens). Os spans de um job ficam em metricas["spans"] e também
+# alimentam os histogramas expostos em /metrics no formato do Prometheus.
+BALDES_DURACAO_S = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+PREFIXO = "moderador"
+
+_trava = threading.Lock()
+_local = threading.local()
+_histogramas = {}   # (nome, rótulos) -> {"baldes": [...], "soma": s, "total": n}
+_contadores = {}    # (nome, rótulos) -> valor
+_medidores = {}     # nome -> (ajuda, função sem argumentos)
+_ajudas = {
+    f"{PREFIXO}_etapa_duracao_segundos": "Duração de cada etapa do pipeline",
+    f"{PREFIXO}_etapa_erros_total": "Etapas que terminaram com exceção",
+    f"{PREFIXO}_cache_consultas_total": "Consultas ao cache de resultados por nível e resultado",
+    f"{PREFIXO}_ollama_chamadas_total": "Chamadas ao Ollama por modelo e resultado",
+    f"{PREFIXO}_ollama_tokens_total": "Tokens de prompt e gerados no Ollama",
+    f"{PREFIXO}_download_bytes_total": "Bytes de mídia baixados",
+    f"{PREFIXO}_ollama_novas_tentativas_total": "Chamadas ao Ollama repetidas após erro transitório",
+    f"{PREFIXO}_jobs_total": "Jobs da fila finalizados por status",
+}
+
+def _rss_mb():
+    """RSS atual do processo (None onde não há /proc)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def memoria_mb():
+    """
+    RSS atual e os picos desde que o processo subiu (e da GPU, se o PyTorch já
+    estiver carregado). Os picos nunca descem: servem para o processo, não para uma etapa.
+    """
+    memoria = {}
+    rss = _rss_mb()
+    if rss is not None:
+        memoria["rss_mb"] = rss
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa em KB, macOS em bytes
+        memoria["pico_rss_processo_mb"] = round(pico / 1024 if sys.platform != "darwin" else pico / 2**20, 1)
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        memoria["pico_gpu_processo_mb"] = round(torch.cuda.max_memory_allocated() / 2**20, 1)
+    return memoria
+
+def _chave(nome, rotulos):
+    return nome, tuple(sorted(rotulos.items()))
+
+def observar(etapa, duracao_s):
+    """Registra uma duração no histograma da etapa."""
+    chave = _chave(f"{PREFIXO}_etapa_duracao_segundos", {"etapa": etapa})
+    with _trava:
+        h = _histogramas.setdefault(chave, {"baldes": [0] * len(BALDES_DURACAO_S), "soma": 0.0, "total": 0})
+        indice = bisect_left(BALDES_DURACAO_S, duracao_s)
+        if indice < len(BALDES_DURACAO_S):
+            h["baldes"][indice] += 1
+        h["soma"] += duracao_s
+        h["total"] += 1
+
+def contar(nome, valor=1, **rotulos):
+    """Soma `valor` no contador `moderador_<nome>` com os rótulos dados."""
+    chave = _chave(f"{PREFIXO}_{nome}", {k: str(v) for k, v in rotulos.items()})
+    with _trava:
+        _contadores[chave] = _contadores.get(chave, 0) + valor
+
+def registrar_medidor(nome, ajuda, funcao):
+    """Medidor lido na hora da coleta (ex: profundidade da fila)."""
+    with _trava:
+        _medidores[f"{PREFIXO}_{nome}"] = (ajuda, funcao)
+
+@contextmanager
+def span(nome, metricas=None, **atributos):
+    """
+    Mede a etapa `nome`. Dentro do bloco, o dict devolvido aceita atributos
+    extras (ex: s["bytes"] = ...). Spans aninhados na mesma thread guardam o pai.
+    """
+    pilha = getattr(_local, "pilha", None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    registro = {"nome": nome, "pai": pilha[-1] if pilha else None, "thread": threading.current_thread().name,
+                "inicio": round(time.time(), 3), **atributos}
+    pilha.append(nome)
+    rss_inicio = _rss_mb()
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    except Exception as e:
+        registro["erro"] = str(e)
+        contar("etapa_erros_total", etapa=nome)
+        raise
+    finally:
+        pilha.pop()
+        duracao = time.perf_counter() - inicio
+        registro["duracao_s"] = round(duracao, 3)
+        # RSS do processo inteiro: com etapas em paralelo, a diferença inclui o que as outras threads alocaram
+        rss_fim = _rss_mb()
+        if rss_inicio is not None and rss_fim is not None:
+            registro.update(rss_inicio_mb=rss_inicio, rss_fim_mb=rss_fim, rss_delta_mb=round(rss_fim - rss_inicio, 1))
+        observar(nome, duracao)
+        if metricas is not None:
+            metricas.setdefault("spans", []).append(registro)
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _rotulos(rotulos, extra=()):
+    itens = list(rotulos) + list(extra)
+    if not itens:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in itens) + "}"
+
+def exportar_prometheus():
+    """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+    linhas = []
+    with _trava:
+        histogramas = {k: {**v, "baldes": list(v["baldes"])} for k, v in _histogramas.items()}
+        contadores = dict(_contadores)
+        medidores = dict(_medidores)
+
+    declarados = set()
+    def cabecalho(nome, tipo, ajuda=None):
+        if nome not in declarados:
+            declarados.add(nome)
+            linhas.append(f"# HELP {nome} {ajuda or _ajudas.get(nome, nome)}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+
+    for (nome, rotulos), h in sorted(histogramas.items()):
+        cabecalho(nome, "histogram")
+        acumulado = 0
+        for limite, quantidade in zip(BALDES_DURACAO_S, h["baldes"]):
+            acumulado += quantidade
+            linhas.append(f"{nome}_bucket{_rotulos(rotulos, [('le', limite)])} {acumulado}")
+        linhas.append(f"{nome}_bucket{_rotulos(rotulos, [('le', '+Inf')])} {h['total']}")
+        linhas.append(f"{nome}_sum{_rotulos(rotulos)} {h['soma']:.6f}")
+        linhas.append(f"{nome}_count{_rotulos(rotulos)} {h['total']}")
+
+    for (nome, rotulos), valor in sorted(contadores.items()):
+        cabecalho(nome, "counter")
+        linhas.append(f"{nome}{_rotulos(rotulos)} {valor}")
+
+    for nome, (ajuda, funcao) in sorted(medidores.items()):
+        try:
+            valor = funcao()
+        except Exception:
+            continue
+        cabecalho(nome, "gauge", ajuda)
+        linhas.append(f"{nome} {valor}")
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,89 @@
+import os
+import threading
+import telemetria
+
+# --- MOTORES DE TRANSCRIÇÃO ---
+# Todos os motores expõem o mesmo método transcribe(audio, **opcoes) e
+# devolvem o formato do openai-whisper: {"text": ..., "segments": [{"start", "end", "text"}]}.
+# Assim o resto do projeto (VAD, streaming, registro) não muda ao trocar de motor.
+# O mesmo motor é compartilhado pelos workers da fila, pelo lote e pelos ramos
+# paralelos; cada motor cuida de ser seguro para chamadas simultâneas.
+#
+#   "whisper"     -> openai-whisper (PyTorch), o motor original
+#   "ctranslate2" -> faster-whisper (CTranslate2), quantizado em int8 — bem mais leve em CPU
+MOTOR_TRANSCRICAO = "whisper"
+MOTORES_DISPONIVEIS = ("whisper", "ctranslate2")
+
+# Opções do motor CTranslate2
+TIPO_COMPUTACAO_CT2 = "int8"   # "int8", "int8_float16", "float16", "float32"
+DISPOSITIVO_CT2 = "auto"       # "cpu", "cuda" ou "auto"
+THREADS_CT2 = 0                # 0 = o CTranslate2 decide
+BEAM_SIZE_CT2 = 5
+VAD_SILERO_CT2 = True          # Silero VAD do faster-whisper: descarta o que sobrou de música e ruído
+
+class MotorWhisper:
+    """openai-whisper. Aceita caminho de arquivo ou numpy float32 16 kHz."""
+    nome = "whisper"
+
+    def __init__(self, tamanho):
+        import whisper
+        self.tamanho = tamanho
+        self.modelo = whisper.load_model(tamanho)
+        # O decode do openai-whisper instala hooks de kv-cache nos módulos do
+        # decoder compartilhado: duas transcrições ao mesmo tempo se corrompem.
+        self._trava = threading.Lock()
+
+    def transcribe(self, audio, **opcoes):
+        with self._trava:
+            return self.modelo.transcribe(audio, **opcoes)
+
+    def tamanho_mb(self):
+        total = sum(p.numel() * p.element_size() for p in self.modelo.parameters())
+        return total / (1024 * 1024)
+
+class MotorCTranslate2:
+    """faster-whisper (CTranslate2) com quantização int8 por padrão."""
+    nome = "ctranslate2"
+
+    def __init__(self, tamanho):
+        from faster_whisper import WhisperModel
+        self.tamanho = tamanho
+        rss_antes = telemetria.memoria_mb().get("rss_mb")
+        self.modelo = WhisperModel(tamanho, device=DISPOSITIVO_CT2, compute_type=TIPO_COMPUTACAO_CT2,
+                                   cpu_threads=THREADS_CT2)
+        rss_depois = telemetria.memoria_mb().get("rss_mb")
+        self._tamanho_mb = self._tamanho_pesos_mb(tamanho)
+        if self._tamanho_mb is None:
+            # Sem o arquivo dos pesos: quanto o processo cresceu na carga
+            self._tamanho_mb = max(0.0, rss_depois - rss_antes) if rss_antes is not None and rss_depois is not None else 0.0
+
+    @staticmethod
+    def _tamanho_pesos_mb(tamanho):
+        """Tamanho do model.bin (pasta local ou cache do Hugging Face); None se não achar."""
+        try:
+            pasta = tamanho
+            if not os.path.isdir(pasta):
+                from faster_whisper.utils import download_model
+                pasta = download_model(tamanho, local_files_only=True)
+            return os.path.getsize(os.path.join(pasta, "model.bin")) / (1024 * 1024)
+        except Exception:
+            return None
+
+    def transcribe(self, audio, language=None, initial_prompt=None, **_ignoradas):
+        # fp16 e outras opções do openai-whisper não existem aqui; o tipo vem de TIPO_COMPUTACAO_CT2
+        segmentos, _ = self.modelo.transcribe(audio, language=language, initial_prompt=initial_prompt,
+                                              beam_size=BEAM_SIZE_CT2, vad_filter=VAD_SILERO_CT2)
+        segmentos = [{"start": s.start, "end": s.end, "text": s.text} for s in segmentos]
+        return {"text": "".join(s["text"] for s in segmentos), "segments": segmentos}
+
+    def tamanho_mb(self):
+        # Os pesos ficam fora do PyTorch: vale o tamanho do model.bin (ou o RSS medido na carga).
+        # Em int8 na memória o modelo fica menor que o arquivo float16; a estimativa erra para cima.
+        return self._tamanho_mb
+
+def criar_motor(motor, tamanho):
+    if motor == "whisper":
+        return MotorWhisper(tamanho)
+    if motor == "ctranslate2":
+        return MotorCTranslate2(tamanho)
+    raise ValueError(f"Motor de transcrição desconhecido: {motor} (use um de {MOTORES_DISPONIVEIS})")
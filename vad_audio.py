@@ -0,0 +1,195 @@
+import numpy as np
+
+# webrtcvad é opcional: se não estiver instalado, usamos um detector por energia
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+# --- CONFIGURAÇÕES DO VAD ---
+TAXA_AUDIO = 16000
+MS_QUADRO = 30                # webrtcvad aceita quadros de 10, 20 ou 30 ms
+AGRESSIVIDADE_VAD = 3         # 0 (aceita tudo) a 3 (só fala clara; corta mais música)
+PAUSA_MAX_S = 0.5             # Trechos de fala separados por menos que isso viram um só
+FOLGA_S = 0.2                 # Margem antes/depois de cada trecho para não cortar sílabas
+FALA_MIN_S = 0.3              # Trechos menores que isso são descartados (cliques, batidas)
+SILENCIO_ENTRE_TRECHOS_S = 0.3
+
+# --- FILTRO DE MÚSICA ---
+# O webrtcvad dispara com voz cantada e instrumentos, e o detector por energia
+# marca como fala tudo o que for mais alto que o fundo. Por cima dos dois, cada
+# janela de JANELA_MUSICA_S é classificada pelas características clássicas de
+# fala x música: a fala alterna sílabas e pausas (muitos quadros bem abaixo da
+# energia média) e sons vozeados e fricativos (taxa de cruzamentos por zero
+# muito variável); a música é contínua e estável. Janelas com as duas medidas
+# baixas são descartadas como música.
+FILTRAR_MUSICA = True
+JANELA_MUSICA_S = 1.0
+LIMIAR_BAIXA_ENERGIA = 0.15   # Fração mínima de quadros abaixo de metade da energia média (fala fica em 0.3+)
+LIMIAR_VARIACAO_ZCR = 0.04    # Desvio padrão mínimo da taxa de cruzamentos por zero (fala fica em 0.06+)
+
+_avisou_energia = False
+
+def carregar_audio(caminho):
+    """Decodifica qualquer arquivo de mídia para float32 16 kHz mono (ffmpeg)."""
+    try:
+        from whisper.audio import load_audio
+        return load_audio(caminho, sr=TAXA_AUDIO)
+    except ImportError:
+        # Instalação só com o motor CTranslate2
+        from faster_whisper import decode_audio
+        return decode_audio(caminho, sampling_rate=TAXA_AUDIO)
+
+def registrar_metricas(metricas, resultados):
+    """Soma os resultados do VAD (um ou vários blocos) no dict de métricas."""
+    if metricas is None:
+        return
+    fala = sum(r["duracao_fala_s"] for r in resultados)
+    total = sum(r["duracao_total_s"] for r in resultados)
+    metricas["vad_duracao_fala_s"] = round(fala, 2)
+    metricas["vad_duracao_total_s"] = round(total, 2)
+    metricas["vad_proporcao_fala"] = round(fala / total, 3) if total else 0.0
+    metricas["vad_musica_descartada_s"] = round(sum(r.get("duracao_musica_s", 0.0) for r in resultados), 2)
+    if resultados:
+        metricas["vad_detector"] = resultados[0].get("detector")
+        metricas["vad_filtro_musica"] = resultados[0].get("filtro_musica", False)
+    metricas["transcricao_segmentos"] = [seg for r in resultados for seg in r["segmentos"]]
+
+def _quadros_fala_webrtc(audio):
+    vad = webrtcvad.Vad(AGRESSIVIDADE_VAD)
+    tamanho = TAXA_AUDIO * MS_QUADRO // 1000
+    pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+    return [
+        vad.is_speech(pcm[i:i + tamanho].tobytes(), TAXA_AUDIO)
+        for i in range(0, len(pcm) - tamanho + 1, tamanho)
+    ]
+
+def _quadros_fala_energia(audio):
+    """Alternativa sem dependências: energia acima do ruído de fundo estimado (não separa música)."""
+    quadros = _quadros(audio)
+    if len(quadros) == 0:
+        return []
+    energia_db = 10 * np.log10(np.mean(quadros ** 2, axis=1) + 1e-10)
+    limiar = max(np.percentile(energia_db, 20) + 10, -45)
+    return list(energia_db > limiar)
+
+def _quadros(audio):
+    tamanho = TAXA_AUDIO * MS_QUADRO // 1000
+    n = len(audio) // tamanho
+    return audio[:n * tamanho].reshape(n, tamanho)
+
+def _descartar_musica(audio, marcas):
+    """
+    Desmarca as janelas que parecem música (ver FILTRO DE MÚSICA).
+    Retorna (marcas, segundos de "fala" descartados como música).
+    """
+    quadros = _quadros(audio)
+    if len(quadros) == 0:
+        return marcas, 0.0
+    energia = np.mean(quadros ** 2, axis=1)
+    zcr = np.mean(np.abs(np.diff(np.signbit(quadros), axis=1)), axis=1)
+    por_janela = max(1, int(JANELA_MUSICA_S * 1000 / MS_QUADRO))
+    marcas = list(marcas)
+    descartados = 0
+    for ini in range(0, len(quadros), por_janela):
+        fim = min(ini + por_janela, len(quadros), len(marcas))
+        if fim - ini < por_janela // 2 or not any(marcas[ini:fim]):
+            continue
+        janela = energia[ini:fim]
+        baixa_energia = np.mean(janela < 0.5 * np.mean(janela))
+        if baixa_energia < LIMIAR_BAIXA_ENERGIA and np.std(zcr[ini:fim]) < LIMIAR_VARIACAO_ZCR:
+            descartados += sum(marcas[ini:fim])
+            marcas[ini:fim] = [False] * (fim - ini)
+    return marcas, float(descartados * MS_QUADRO / 1000)
+
+def detectar_fala(audio, info=None):
+    """
+    Encontra os trechos com fala num áudio float32 16 kHz mono.
+    Retorna uma lista de (inicio_s, fim_s). Se `info` for um dict, recebe
+    o detector usado e os segundos descartados como música.
+    """
+    global _avisou_energia
+    if webrtcvad:
+        marcas, detector = _quadros_fala_webrtc(audio), "webrtc"
+    else:
+        marcas, detector = _quadros_fala_energia(audio), "energia"
+        if not _avisou_energia:
+            _avisou_energia = True
+            print("⚠️  webrtcvad não instalado: VAD por energia"
+                  + (" + filtro de música." if FILTRAR_MUSICA else " (música NÃO é filtrada)."))
+    musica_s = 0.0
+    if FILTRAR_MUSICA:
+        marcas, musica_s = _descartar_musica(audio, marcas)
+    if info is not None:
+        info.update(detector=detector, filtro_musica=FILTRAR_MUSICA, duracao_musica_s=musica_s)
+    passo = MS_QUADRO / 1000
+    duracao = len(audio) / TAXA_AUDIO
+
+    trechos = []
+    inicio = None
+    for i, fala in enumerate(marcas):
+        if fala and inicio is None:
+            inicio = i * passo
+        elif not fala and inicio is not None:
+            trechos.append([inicio, i * passo])
+            inicio = None
+    if inicio is not None:
+        trechos.append([inicio, len(marcas) * passo])
+
+    # Junta pausas curtas, aplica folga e descarta ruídos curtos
+    unidos = []
+    for ini, fim in trechos:
+        if unidos and ini - unidos[-1][1] < PAUSA_MAX_S:
+            unidos[-1][1] = fim
+        else:
+            unidos.append([ini, fim])
+    return [
+        (max(0.0, ini - FOLGA_S), min(duracao, fim + FOLGA_S))
+        for ini, fim in unidos if fim - ini >= FALA_MIN_S
+    ]
+
+def transcrever_com_vad(modelo, audio, deslocamento_s=0.0, **opcoes_whisper):
+    """
+    Transcreve só os trechos com fala, colados num único áudio (uma chamada
+    ao Whisper), e devolve os segmentos com o tempo do vídeo original.
+
+    Retorna {"texto", "segmentos": [{"inicio", "fim", "texto"}], "duracao_fala_s", "duracao_total_s",
+    "detector", "filtro_musica", "duracao_musica_s"}.
+    """
+    duracao_total = len(audio) / TAXA_AUDIO
+    info = {}
+    trechos = detectar_fala(audio, info)
+    if not trechos:
+        return {"texto": "", "segmentos": [], "duracao_fala_s": 0.0, "duracao_total_s": duracao_total, **info}
+
+    silencio = np.zeros(int(SILENCIO_ENTRE_TRECHOS_S * TAXA_AUDIO), dtype=np.float32)
+    partes = []
+    mapa = []  # (inicio no áudio colado, inicio no original, duração)
+    posicao = 0.0
+    for ini, fim in trechos:
+        pedaco = audio[int(ini * TAXA_AUDIO):int(fim * TAXA_AUDIO)]
+        mapa.append((posicao, ini, len(pedaco) / TAXA_AUDIO))
+        partes += [pedaco, silencio]
+        posicao += (len(pedaco) + len(silencio)) / TAXA_AUDIO
+    colado = np.concatenate(partes).astype(np.float32)
+
+    resultado = modelo.transcribe(colado, **opcoes_whisper)
+
+    def _para_original(t):
+        for ini_colado, ini_orig, dur in reversed(mapa):
+            if t >= ini_colado:
+                return deslocamento_s + ini_orig + min(t - ini_colado, dur)
+        return deslocamento_s
+
+    segmentos = [
+        {"inicio": round(_para_original(s["start"]), 2), "fim": round(_para_original(s["end"]), 2),
+         "texto": s["text"].strip()}
+        for s in resultado.get("segments", [])
+    ]
+    return {
+        "texto": resultado["text"].strip(),
+        "segmentos": segmentos,
+        "duracao_fala_s": sum(fim - ini for ini, fim in trechos),
+        "duracao_total_s": duracao_total,
+        **info,
+    }